@@ -3,18 +3,37 @@ Aplicación principal de Teteu Cueros
 Sistema de personalización de carteras de cuero
 """
 
-from flask import Flask, render_template, request, redirect, url_for, flash, abort
+from flask import (Flask, render_template, stream_template, request, redirect, url_for, flash, abort,
+                   jsonify, Response, stream_with_context)
+import os
+import csv
+import io
+import json
+import hashlib
 import logging
+import ids
 from config import config
-from models import PersonalizacionManager
+from models import PersonalizacionManager, CapacidadExcedida
+from storage import crear_store
+from cache import TTLCache
+from imagenes import IndiceImagenes, ManifiestoImagenes
+from assets import ManifiestoAssets, registrar_assets
+from catalogo import CATALOGO, registrar_catalogo
+from ciclo_vida import registrar_ciclo_vida
+from paginas import CachePaginas
+from metricas import Metricas, registrar_metricas
+from perfilado import registrar_perfilado
 from utils import (
     setup_logging, 
     validar_datos_personalizacion, 
     obtener_datos_formulario,
     manejar_error,
-    verificar_archivo_imagen,
-    obtener_imagen_por_defecto,
-    sanitizar_input
+    sanitizar_input,
+    respuesta_condicional,
+    precalentar_plantillas,
+    crear_cache_bytecode,
+    codificar_cursor,
+    decodificar_cursor
 )
 
 def create_app(config_name='default'):
@@ -23,18 +42,83 @@ def create_app(config_name='default'):
     app.config.from_object(config[config_name])
     config[config_name].init_app(app)
     
+    # Bytecode de plantillas persistente en disco: un worker recién reciclado
+    # no vuelve a compilarlas (debe configurarse antes de usar jinja_env)
+    cache_bytecode = crear_cache_bytecode(app.config['JINJA_BYTECODE_CACHE_DIR'])
+    if cache_bytecode is not None:
+        app.jinja_options = dict(app.jinja_options, bytecode_cache=cache_bytecode)
+    
     # Configurar logging
     logger = setup_logging()
     
+    # Generador de IDs de nuevas personalizaciones
+    ids.establecer_generador(app.config['ID_GENERATOR'])
+    
     # Inicializar gestor de personalizaciones
-    personalizaciones_manager = PersonalizacionManager()
+    # Los backends en memoria ya resuelven en el proceso: la caché solo tiene sentido delante de SQLite
+    cache = None
+    if app.config['STORAGE_BACKEND'] not in ('memory', 'columnar') and app.config['PERSONALIZACION_CACHE_SIZE'] > 0:
+        cache = TTLCache(max_entradas=app.config['PERSONALIZACION_CACHE_SIZE'],
+                         ttl=app.config['PERSONALIZACION_CACHE_TTL'].total_seconds())
+    personalizaciones_manager = PersonalizacionManager(crear_store(app.config), cache=cache)
+    if app.config['PERSONALIZACION_SWEEP_INTERVAL'] > 0:
+        personalizaciones_manager.iniciar_barrido(app.config['PERSONALIZACION_SWEEP_INTERVAL'])
+    
+    # Índice de imágenes de static/ (evita un stat por cada vista)
+    indice_imagenes = IndiceImagenes(app.static_folder,
+                                     intervalo_sondeo=app.config['IMAGENES_POLL_INTERVAL'])
+    
+    # Derivados responsivos (srcset/sizes) generados con `python imagenes.py build`
+    manifiesto_imagenes = ManifiestoImagenes(app.static_folder)
+    app.jinja_env.globals['imagen_derivados'] = manifiesto_imagenes.derivados
+    # Los del formulario también van a main.js: al cambiar color o herrajes
+    # cambia el srcset por el de la variante en lugar de cargar el original
+    app.jinja_env.globals['imagenes_formulario'] = manifiesto_imagenes.derivados_de(
+        [*CATALOGO.imagenes.values(), *(o.muestra for o in CATALOGO.colores + CATALOGO.herrajes),
+         *(modelo.imagen for modelo in CATALOGO.modelos)]
+    )
+    
+    # Assets con huella de contenido y caché inmutable de un año
+    version_assets = ''
+    fecha_assets = CATALOGO.fecha
+    if app.config['ASSETS_FINGERPRINT']:
+        manifiesto_assets = ManifiestoAssets(app.static_folder)
+        registrar_assets(app, manifiesto_assets)
+        version_assets = manifiesto_assets.version
+        fecha_assets = max(fecha_assets, manifiesto_assets.fecha)
+    else:
+        app.jinja_env.filters['asset'] = lambda ruta: ruta
+        app.jinja_env.globals['assets_imagenes'] = {}
+    
+    # Catálogo para las plantillas y su manifiesto JSON versionado para main.js
+    registrar_catalogo(app, CATALOGO)
+    
+    # HTML renderizado por variante para /, /personalizar_form y /ver/<id>
+    paginas = CachePaginas(os.path.join(app.root_path, app.template_folder),
+                           max_entradas=app.config['PAGE_CACHE_SIZE'],
+                           vigilar_plantillas=app.config['DEBUG'])
+    
+    # Latencia, estados, tiempo de DB y cachés por endpoint en /metrics (agregado entre workers)
+    if app.config['METRICS_ENABLED']:
+        registrar_metricas(app, Metricas(app.config['METRICS_DIR'] or None), personalizaciones_manager,
+                           {'personalizaciones': cache, 'paginas': paginas}, app.config['METRICS_TOKEN'])
+    
+    # Perfiles cProfile de una muestra de peticiones y registro de peticiones lentas con desglose
+    if app.config['PROFILE_SAMPLE_RATE'] > 0 or app.config['SLOW_REQUEST_MS'] > 0:
+        registrar_perfilado(app, personalizaciones_manager, app.config['PROFILE_SAMPLE_RATE'],
+                            app.config['PROFILE_DIR'], app.config['SLOW_REQUEST_MS'])
+    
+    # Compilar todas las plantillas ya (con preload_app, en el maestro: los
+    # workers las heredan compiladas al hacer fork)
+    if app.config['JINJA_WARMUP']:
+        precalentar_plantillas(app)
     
     # Rutas de la aplicación
     @app.route('/', methods=['GET'])
     def pagina_principal():
         """Página principal con catálogo de carteras"""
         try:
-            return render_template('index.html')
+            return paginas.render((), 'index.html')
         except Exception as e:
             logger.error(f"Error en página principal: {str(e)}")
             return render_template('error.html', 
@@ -45,14 +129,13 @@ def create_app(config_name='default'):
     def formulario():
         """Formulario de personalización"""
         try:
-            modelo = sanitizar_input(request.args.get('modelo', 'Cartera'))
+            # El parámetro lo elige el cliente: la página (y su entrada en la caché)
+            # es la del modelo del catálogo que le corresponde, no el texto recibido
+            modelo = CATALOGO.modelo_de(request.args.get('modelo', 'Cartera'))
             
-            # Determinar imagen según modelo
-            imagen = obtener_imagen_por_defecto(modelo)
-            
-            return render_template('personalizar.html', 
-                                modelo=modelo, 
-                                imagen=imagen)
+            return paginas.render((modelo.id,), 'personalizar.html', 
+                                  modelo=modelo.nombre, 
+                                  imagen=modelo.imagen)
         except Exception as e:
             logger.error(f"Error en formulario: {str(e)}")
             return render_template('error.html', 
@@ -85,6 +168,11 @@ def create_app(config_name='default'):
             logger.info(f"Personalización creada: {personalizacion.id}")
             return enlace
             
+        except CapacidadExcedida as e:
+            logger.warning(f"Capacidad agotada: {str(e)}")
+            return render_template('error.html', 
+                                 error_code=503, 
+                                 error_message="Servicio saturado, inténtalo de nuevo más tarde"), 503
         except ValueError as e:
             logger.warning(f"Error de validación: {str(e)}")
             flash(str(e), 'error')
@@ -95,6 +183,55 @@ def create_app(config_name='default'):
                                  error_code=500, 
                                  error_message="Error al procesar la personalización")
     
+    @app.route('/api/personalizaciones', methods=['POST'])
+    def crear_personalizaciones_lote():
+        """Crear varias personalizaciones a partir de un array JSON y devolver sus enlaces"""
+        datos = request.get_json(silent=True)
+        if isinstance(datos, dict):
+            datos = datos.get('personalizaciones')
+        if not isinstance(datos, list) or not datos:
+            return jsonify({'error': "Se esperaba un array JSON de personalizaciones"}), 400
+        if len(datos) > app.config['MAX_LOTE_PERSONALIZACIONES']:
+            return jsonify({'error': f"Máximo {app.config['MAX_LOTE_PERSONALIZACIONES']} personalizaciones por petición"}), 413
+        
+        try:
+            resultados = [None] * len(datos)
+            validos, indices = [], []
+            for indice, elemento in enumerate(datos):
+                if not isinstance(elemento, dict):
+                    resultados[indice] = {'indice': indice, 'ok': False, 'error': "Cada elemento debe ser un objeto"}
+                    continue
+                elemento = {
+                    'modelo': sanitizar_input(str(elemento.get('modelo') or 'Cartera')),
+                    'color': str(elemento.get('color') or '').strip(),
+                    'herrajes': str(elemento.get('herrajes') or '').strip()
+                }
+                es_valido, mensaje_error = validar_datos_personalizacion(elemento)
+                if not es_valido:
+                    resultados[indice] = {'indice': indice, 'ok': False, 'error': mensaje_error}
+                    continue
+                validos.append((elemento['modelo'], elemento['color'], elemento['herrajes']))
+                indices.append(indice)
+            
+            # Un único url_for: el resto de enlaces solo cambian en el ID
+            prefijo = url_for('ver_personalizacion', id='_', _external=True)[:-1]
+            for indice, (personalizacion, error) in zip(indices, personalizaciones_manager.crear_personalizaciones(validos)):
+                if personalizacion is None:
+                    resultados[indice] = {'indice': indice, 'ok': False, 'error': error}
+                else:
+                    resultados[indice] = {'indice': indice, 'ok': True, 'id': personalizacion.id,
+                                          'enlace': prefijo + personalizacion.id}
+            
+            creadas = sum(1 for resultado in resultados if resultado['ok'])
+            logger.info(f"Lote de personalizaciones: {creadas} creadas, {len(resultados) - creadas} fallidas")
+            # 201 si se crearon todas, 207 si solo algunas, 422 si ninguna
+            estado = 201 if creadas == len(resultados) else 207 if creadas else 422
+            return jsonify({'creadas': creadas, 'fallidas': len(resultados) - creadas,
+                            'resultados': resultados}), estado
+        except Exception as e:
+            logger.error(f"Error al crear lote de personalizaciones: {str(e)}")
+            return jsonify({'error': "Error al procesar las personalizaciones"}), 500
+    
     @app.route('/ver/<id>')
     def ver_personalizacion(id):
         """Mostrar personalización específica"""
@@ -106,18 +243,31 @@ def create_app(config_name='default'):
                 logger.warning(f"Personalización no encontrada: {id}")
                 return render_template('error.html', 
                                      error_code=404, 
-                                     error_message="Personalización no encontrada")
+                                     error_message="Personalización no encontrada"), 404
+            
+            # Obtener ruta de imagen (índice en memoria, con la imagen por defecto ya aplicada)
+            img_path = indice_imagenes.ruta_imagen(personalizacion)
             
-            # Obtener ruta de imagen
-            img_path = personalizacion.get_imagen_path()
+            # El HTML solo depende de la variante, no del ID
+            variante = (personalizacion.producto, personalizacion.color, personalizacion.herrajes, img_path)
             
-            # Verificar si la imagen existe
-            if not verificar_archivo_imagen(img_path):
-                img_path = obtener_imagen_por_defecto(personalizacion.producto)
+            # ETag fuerte: registro + versión de plantillas, assets y catálogo (sin renderizar)
+            etag = hashlib.sha256('|'.join((
+                personalizacion.id, personalizacion.fecha_creacion.isoformat(), *variante,
+                paginas.version, version_assets, CATALOGO.version
+            )).encode()).hexdigest()[:32]
             
-            return render_template('ver_personalizacion.html', 
-                                personalizacion=personalizacion, 
-                                img_path=img_path)
+            # Last-Modified cubre lo mismo que el ETag: un cliente que solo revalida con
+            # If-Modified-Since no recibe un 304 para HTML con URLs de un build anterior
+            return respuesta_condicional(
+                etag,
+                max(personalizacion.fecha_creacion, paginas.fecha_version, fecha_assets),
+                lambda: paginas.render(variante, 'ver_personalizacion.html', 
+                                       personalizacion=personalizacion, 
+                                       img_path=img_path),
+                cache_control=app.config['VER_CACHE_CONTROL'],
+                vary=app.config['VER_VARY']
+            )
             
         except Exception as e:
             logger.error(f"Error al mostrar personalización {id}: {str(e)}")
@@ -132,14 +282,72 @@ def create_app(config_name='default'):
             abort(404)
         
         try:
-            personalizaciones = personalizaciones_manager.listar_personalizaciones()
-            return render_template('admin.html', personalizaciones=personalizaciones)
+            # Paginación por cursor: una fila de más indica si hay página siguiente
+            limite = app.config['ADMIN_PAGE_SIZE']
+            despues = request.args.get('despues')
+            personalizaciones = personalizaciones_manager.listar_pagina(limite + 1, decodificar_cursor(despues))
+            siguiente = None
+            if len(personalizaciones) > limite:
+                personalizaciones = personalizaciones[:limite]
+                siguiente = codificar_cursor(personalizaciones[-1])
+            
+            # La tabla se envía a medida que se renderiza
+            return stream_template('admin.html', personalizaciones=personalizaciones,
+                                   siguiente=siguiente, primera_pagina=not despues)
         except Exception as e:
             logger.error(f"Error en panel de administración: {str(e)}")
             return render_template('error.html', 
                                  error_code=500, 
                                  error_message="Error en panel de administración")
     
+    @app.route('/admin/exportar')
+    def admin_exportar():
+        """Exportar todas las personalizaciones en NDJSON o CSV, en streaming"""
+        if not app.config['DEBUG']:
+            abort(404)
+        
+        formato = request.args.get('formato', 'ndjson')
+        if formato not in ('ndjson', 'csv'):
+            return jsonify({'error': "Formato no soportado: usa 'ndjson' o 'csv'"}), 400
+        
+        campos = ('id', 'producto', 'color', 'herrajes', 'fecha_creacion')
+        
+        def generar():
+            # Se emite un bloque cada 500 filas: la memoria no depende del tamaño de la tabla
+            buffer = io.StringIO()
+            escritor = csv.writer(buffer) if formato == 'csv' else None
+            if escritor is not None:
+                escritor.writerow(campos)
+            for numero, personalizacion in enumerate(personalizaciones_manager.iterar_personalizaciones(), 1):
+                datos = personalizacion.to_dict()
+                if escritor is not None:
+                    escritor.writerow([datos[campo] for campo in campos])
+                else:
+                    buffer.write(json.dumps({campo: datos[campo] for campo in campos}, ensure_ascii=False))
+                    buffer.write('\n')
+                if numero % 500 == 0:
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+            yield buffer.getvalue()
+        
+        tipo = 'text/csv' if formato == 'csv' else 'application/x-ndjson'
+        return Response(stream_with_context(generar()), mimetype=tipo, headers={
+            'Content-Disposition': f'attachment; filename=personalizaciones.{formato}'
+        })
+    
+    @app.route('/admin/estadisticas')
+    def admin_estadisticas():
+        """Totales actuales y serie diaria de altas y bajas en JSON"""
+        if not app.config['DEBUG']:
+            abort(404)
+        
+        dias = request.args.get('dias', 30, type=int)
+        estadisticas = personalizaciones_manager.obtener_estadisticas(max(1, min(dias, 366)))
+        if estadisticas is None:
+            return jsonify({'error': "El almacenamiento configurado no mantiene estadísticas (usa STORAGE_BACKEND=sqlite)"}), 404
+        return jsonify(estadisticas)
+    
     @app.route('/admin/limpiar')
     def admin_limpiar():
         """Limpiar personalizaciones expiradas"""
@@ -155,19 +363,32 @@ def create_app(config_name='default'):
             flash("Error al limpiar personalizaciones", 'error')
             return redirect(url_for('admin_personalizaciones'))
     
+    @app.route('/admin/estado')
+    def admin_estado():
+        """Contadores internos en JSON (cachés y memoria del almacenamiento)"""
+        if not app.config['DEBUG']:
+            abort(404)
+        
+        store = personalizaciones_manager.store
+        return jsonify({
+            'cache_personalizaciones': cache.estadisticas() if cache is not None else None,
+            'cache_paginas': paginas.estadisticas(),
+            'memoria_store': store.estadisticas_memoria() if hasattr(store, 'estadisticas_memoria') else None
+        })
+    
     # Manejo de errores
     @app.errorhandler(404)
     def not_found_error(error):
         return render_template('error.html', 
                              error_code=404, 
-                             error_message="Página no encontrada")
+                             error_message="Página no encontrada"), 404
     
     @app.errorhandler(500)
     def internal_error(error):
         logger.error(f"Error interno: {str(error)}")
         return render_template('error.html', 
                              error_code=500, 
-                             error_message="Error interno del servidor")
+                             error_message="Error interno del servidor"), 500
     
     # Context processors
     @app.context_processor
@@ -178,10 +399,16 @@ def create_app(config_name='default'):
             'debug': app.config['DEBUG']
         }
     
+    # Hooks pre_fork/post_fork de gunicorn.conf.py y precalentamiento de las
+    # cachés (con preload_app, en el maestro: cada worker nace con ellas llenas)
+    ciclo_vida = registrar_ciclo_vida(app, personalizaciones_manager)
+    if app.config['PRECALENTAR']:
+        ciclo_vida.precalentar(app.config['PRECALENTAR_RECIENTES'])
+    
     return app
 
-# Crear aplicación
-app = create_app()
-
 if __name__ == '__main__':
+    # Solo al ejecutarlo directamente: importar este módulo (wsgi.py, asgi.py)
+    # no debe crear otra aplicación con su barrido, sus métricas y su precalentamiento
+    app = create_app()
     app.run(debug=True, host='0.0.0.0', port=5000)
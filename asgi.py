@@ -0,0 +1,86 @@
+"""
+Archivo ASGI para despliegue en producción (uvicorn o hypercorn)
+
+    uvicorn asgi:app --host 0.0.0.0 --port 10000 --workers 2
+
+El servidor ASGI atiende los sockets en un bucle de eventos: las conexiones
+keep-alive inactivas y los clientes lentos no ocupan ningún hilo. El cuerpo
+de la petición se lee completo en el bucle y solo entonces la vista de Flask
+se ejecuta en un pool de `ASGI_THREADS` hilos, con la misma `create_app`,
+configuración y almacenamientos (seguros con hilos) que `wsgi.py`.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+
+from app import create_app
+
+# Crear aplicación con configuración de producción
+flask_app = create_app('production')
+_hilos_vistas = ThreadPoolExecutor(max_workers=flask_app.config['ASGI_THREADS'],
+                                   thread_name_prefix='vista-asgi')
+
+
+class _InstanciaWsgi(WsgiToAsgiInstance):
+    """
+    Petición WSGI ejecutada en el pool de vistas
+
+    asgiref ejecuta por defecto todas las vistas en un único hilo
+    (thread_sensitive); aquí se reparten entre `_hilos_vistas`. La aplicación
+    se itera en el mismo hilo que llama a `start_response`, como exige WSGI.
+    """
+
+    async def run_wsgi_app(self, body):
+        await sync_to_async(self._ejecutar_wsgi, thread_sensitive=False, executor=_hilos_vistas)(body)
+
+    def _ejecutar_wsgi(self, body):
+        try:
+            environ = self.build_environ(self.scope, body)
+        except ValueError:
+            # Más cabeceras repetidas que `duplicate_header_limit`
+            self.sync_send({'type': 'http.response.start', 'status': 400,
+                            'headers': [(b'content-type', b'text/plain')]})
+            self.sync_send({'type': 'http.response.body', 'body': b'Bad Request: Too many duplicate headers'})
+            return
+
+        enviados = 0
+        respuesta = self.wsgi_application(environ, self.start_response)
+        try:
+            for fragmento in respuesta:
+                if not self.response_started:
+                    self.response_started = True
+                    self.sync_send(self.response_start)
+                # Nunca más bytes de los que anuncia Content-Length
+                if self.response_content_length is not None:
+                    fragmento = fragmento[:self.response_content_length - enviados]
+                self.sync_send({'type': 'http.response.body', 'body': fragmento, 'more_body': True})
+                enviados += len(fragmento)
+                if enviados == self.response_content_length:
+                    break
+        finally:
+            if hasattr(respuesta, 'close'):
+                respuesta.close()
+
+        if not self.response_started:
+            self.response_started = True
+            self.sync_send(self.response_start)
+        self.sync_send({'type': 'http.response.body'})
+
+
+class _AplicacionAsgi(WsgiToAsgi):
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            # Sin tareas de arranque/parada propias: create_app ya se ejecutó al importar
+            while True:
+                mensaje = await receive()
+                if mensaje['type'] == 'lifespan.startup':
+                    await send({'type': 'lifespan.startup.complete'})
+                elif mensaje['type'] == 'lifespan.shutdown':
+                    await send({'type': 'lifespan.shutdown.complete'})
+                    return
+        await _InstanciaWsgi(self.wsgi_application, self.duplicate_header_limit)(scope, receive, send)
+
+
+app = _AplicacionAsgi(flask_app)
@@ -0,0 +1,276 @@
+"""
+Assets estáticos con huella de contenido para Teteu Cueros
+
+Cada archivo de `static/` se sirve también bajo un nombre con el hash de su
+contenido (`css/style.css` -> `css/style.3f2a1b9c0d.css`). Esas URLs no
+cambian nunca mientras el archivo no cambie, así que se sirven con
+`Cache-Control: public, max-age=31536000, immutable` y el navegador no
+vuelve a pedirlas.
+
+`python assets.py build` escribe esas copias en `static/dist/` (con
+hermanos precomprimidos `.gz`/`.br` de CSS/JS) junto a un `manifest.json`,
+y conserva las del build anterior: las páginas que siguen en cachés de
+navegadores o de nginx tras un despliegue apuntan a nombres que todavía
+existen, y nginx puede servir `/static/` directamente. Sin build, la
+aplicación calcula las huellas al arrancar y resuelve cada nombre al
+archivo original.
+"""
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import shutil
+import sys
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from flask import request, send_from_directory
+
+UN_ANO = 365 * 24 * 60 * 60
+EXTENSIONES_COMPRIMIBLES = ('.css', '.js', '.json', '.svg')
+# Copias con huella escritas por `python assets.py build`
+DIRECTORIO_DIST = 'dist'
+# Builds cuyas copias se conservan en static/dist/ (el actual y el anterior)
+CONSERVAR_BUILDS = 2
+# Archivos que ya llevan el hash en el nombre: dist/ y los derivados de `python imagenes.py build`
+DIRECTORIOS_CON_HASH = (f'{DIRECTORIO_DIST}/', 'build/')
+# Huella de 10 hexadecimales antes de la extensión: css/style.3f2a1b9c0d.css
+_PATRON_HUELLA = re.compile(r'^(?:dist/)?(.+)\.[0-9a-f]{10}(\.[^./]+)$')
+
+
+def _codificaciones(ruta: str) -> tuple:
+    """Hermanos precomprimidos existentes de un archivo, por orden de preferencia"""
+    return tuple(
+        codificacion for codificacion, sufijo in (('br', '.br'), ('gzip', '.gz'))
+        if os.path.isfile(ruta + sufijo)
+    )
+
+
+def calcular_huellas(static_dir: str) -> Dict[str, str]:
+    """Nombre con huella (sin directorio dist/) de cada archivo original de `static/`"""
+    huellas = {}
+    for raiz, _, archivos in os.walk(static_dir):
+        for nombre in archivos:
+            ruta = os.path.join(raiz, nombre)
+            relativa = os.path.relpath(ruta, static_dir).replace(os.sep, '/')
+            if relativa.endswith(('.gz', '.br')) or relativa.startswith(DIRECTORIOS_CON_HASH):
+                continue
+            base, extension = os.path.splitext(relativa)
+            with open(ruta, 'rb') as archivo:
+                resumen = hashlib.sha256(archivo.read()).hexdigest()[:10]
+            huellas[relativa] = f"{base}.{resumen}{extension}"
+    return huellas
+
+
+class ManifiestoAssets:
+    """
+    Relación entre nombres originales y nombres con huella
+
+    Con `static/dist/manifest.json` (build) los nombres con huella son
+    archivos reales de `dist/`; sin él se calculan al arrancar y cada uno se
+    resuelve al archivo original.
+    """
+
+    def __init__(self, static_dir: str):
+        self.static_dir = static_dir
+        self.con_huella: Dict[str, str] = {}
+        # Nombre con huella -> archivo de static/ que se envía
+        self.originales: Dict[str, str] = {}
+        self.precomprimidos: Dict[str, tuple] = {}
+
+        try:
+            with open(os.path.join(static_dir, DIRECTORIO_DIST, 'manifest.json'), encoding='utf-8') as archivo:
+                construidos = json.load(archivo)
+        except (OSError, ValueError):
+            construidos = None
+
+        if construidos is not None:
+            for relativa, huella in construidos.items():
+                if os.path.isfile(os.path.join(static_dir, huella)):
+                    self.con_huella[relativa] = huella
+                    self.originales[huella] = huella
+        else:
+            for relativa, huella in calcular_huellas(static_dir).items():
+                self.con_huella[relativa] = huella
+                self.originales[huella] = relativa
+
+        for archivo in self.originales.values():
+            self.precomprimidos[archivo] = _codificaciones(os.path.join(static_dir, archivo))
+
+        # Última modificación del conjunto (UTC): un build nuevo invalida If-Modified-Since
+        mtimes = [os.path.getmtime(os.path.join(static_dir, archivo)) for archivo in self.originales.values()]
+        if construidos is not None:
+            mtimes.append(os.path.getmtime(os.path.join(static_dir, DIRECTORIO_DIST, 'manifest.json')))
+        self.fecha = datetime.utcfromtimestamp(max(mtimes, default=0))
+
+    @property
+    def version(self) -> str:
+        """Hash del conjunto de nombres con huella: cambia si cambia cualquier asset"""
+        resumen = hashlib.sha256()
+        for original, huella in sorted(self.con_huella.items()):
+            resumen.update(f"{original}={huella}\n".encode())
+        return resumen.hexdigest()[:12]
+
+    def nombre(self, filename: str) -> str:
+        """Nombre con huella de un archivo de `static/` (el mismo si no se conoce)"""
+        return self.con_huella.get(filename, filename)
+
+    def url(self, ruta: str) -> str:
+        """Reescribir una URL `/static/...` escrita a mano a su versión con huella"""
+        if not ruta or not ruta.startswith('/static/'):
+            return ruta
+        return '/static/' + self.nombre(ruta[len('/static/'):])
+
+    def original(self, filename: str) -> Optional[str]:
+        """Archivo al que apunta un nombre con huella (None si no lo es)"""
+        return self.originales.get(filename)
+
+    def sin_huella(self, filename: str) -> Optional[str]:
+        """Original de un nombre con huella que ya no existe (build anterior), si se conoce"""
+        coincidencia = _PATRON_HUELLA.match(filename)
+        if coincidencia is None:
+            return None
+        relativa = coincidencia.group(1) + coincidencia.group(2)
+        return relativa if relativa in self.con_huella else None
+
+
+def registrar_assets(app, manifiesto: ManifiestoAssets):
+    """
+    Servir `static/` con nombres con huella y caché inmutable
+
+    Reescribe `url_for('static', ...)`, expone el filtro `asset` para rutas
+    `/static/...` escritas a mano y reemplaza la vista `static` de Flask.
+    """
+
+    @app.url_defaults
+    def huella_en_url_for(endpoint, values):
+        if endpoint == 'static' and 'filename' in values:
+            values['filename'] = manifiesto.nombre(values['filename'])
+
+    app.jinja_env.filters['asset'] = manifiesto.url
+    app.jinja_env.globals['assets_imagenes'] = {
+        f"/static/{original}": f"/static/{huella}"
+        for original, huella in manifiesto.con_huella.items()
+        if original.endswith(('.jpg', '.jpeg', '.png', '.webp')) and not original.startswith(DIRECTORIOS_CON_HASH)
+    }
+
+    def servir_static(filename):
+        original = manifiesto.original(filename)
+        if original is None and filename.startswith(DIRECTORIOS_CON_HASH) and \
+                os.path.isfile(os.path.join(app.static_folder, filename)):
+            # Copia de un build anterior (o derivado de imágenes): también inmutable
+            original = filename
+        if original is None:
+            # Nombre sin huella, o con la huella de un build que ya no está en disco:
+            # el archivo actual con la caché corta por defecto de Flask
+            return app.send_static_file(manifiesto.sin_huella(filename) or filename)
+
+        # Calidades de Accept-Encoding: 'br;q=0' es un rechazo explícito, no una aceptación
+        aceptadas = request.accept_encodings
+        precomprimidos = manifiesto.precomprimidos.get(original)
+        if precomprimidos is None:
+            precomprimidos = _codificaciones(os.path.join(app.static_folder, original))
+        for codificacion in precomprimidos:
+            if aceptadas[codificacion] > 0:
+                sufijo = '.br' if codificacion == 'br' else '.gz'
+                respuesta = send_from_directory(
+                    app.static_folder, original + sufijo, max_age=UN_ANO,
+                    mimetype=mimetypes.guess_type(original)[0] or 'application/octet-stream'
+                )
+                respuesta.headers['Content-Encoding'] = codificacion
+                break
+        else:
+            respuesta = send_from_directory(app.static_folder, original, max_age=UN_ANO)
+
+        respuesta.cache_control.public = True
+        respuesta.cache_control.immutable = True
+        if precomprimidos:
+            respuesta.vary.add('Accept-Encoding')
+        return respuesta
+
+    app.view_functions['static'] = servir_static
+
+
+def precomprimir(static_dir: str) -> int:
+    """
+    Generar hermanos `.gz` (y `.br` si el módulo brotli está instalado) de CSS/JS
+
+    Returns:
+        int: Número de archivos comprimidos
+    """
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+
+    comprimidos = 0
+    for raiz, _, archivos in os.walk(static_dir):
+        for nombre in archivos:
+            if not nombre.endswith(EXTENSIONES_COMPRIMIBLES):
+                continue
+            ruta = os.path.join(raiz, nombre)
+            with open(ruta, 'rb') as archivo:
+                datos = archivo.read()
+            with open(ruta + '.gz', 'wb') as archivo:
+                archivo.write(gzip.compress(datos, compresslevel=9, mtime=0))
+            if brotli is not None:
+                with open(ruta + '.br', 'wb') as archivo:
+                    archivo.write(brotli.compress(datos, quality=11))
+            comprimidos += 1
+    return comprimidos
+
+
+def construir_dist(static_dir: str, conservar: int = CONSERVAR_BUILDS) -> Dict[str, str]:
+    """
+    Escribir las copias con huella en `static/dist/` y su `manifest.json`
+
+    Las copias de los `conservar - 1` builds anteriores se mantienen (la
+    lista de builds está en `dist/builds.json`); las más antiguas se borran.
+
+    Returns:
+        Dict: Nombre original -> ruta con huella dentro de `static/`
+    """
+    salida = os.path.join(static_dir, DIRECTORIO_DIST)
+    os.makedirs(salida, exist_ok=True)
+    manifiesto = {}
+    for relativa, huella in calcular_huellas(static_dir).items():
+        destino = os.path.join(salida, huella)
+        if not os.path.isfile(destino):
+            os.makedirs(os.path.dirname(destino), exist_ok=True)
+            shutil.copy2(os.path.join(static_dir, relativa), destino)
+        manifiesto[relativa] = f"{DIRECTORIO_DIST}/{huella}"
+
+    ruta_builds = os.path.join(salida, 'builds.json')
+    try:
+        with open(ruta_builds, encoding='utf-8') as archivo:
+            builds: List[Dict[str, str]] = json.load(archivo)
+    except (OSError, ValueError):
+        builds = []
+    builds = ([b for b in builds if b != manifiesto] + [manifiesto])[-conservar:]
+
+    vigentes = {os.path.join(static_dir, ruta) for build in builds for ruta in build.values()}
+    for raiz, _, archivos in os.walk(salida):
+        for nombre in archivos:
+            ruta = os.path.join(raiz, nombre)
+            base = ruta[:-3] if ruta.endswith(('.gz', '.br')) else ruta
+            if base not in vigentes and nombre not in ('manifest.json', 'builds.json'):
+                os.remove(ruta)
+
+    with open(ruta_builds, 'w', encoding='utf-8') as archivo:
+        json.dump(builds, archivo, indent=2, sort_keys=True)
+    # El manifiesto se escribe al final: la aplicación nunca lee uno con copias a medio escribir
+    with open(os.path.join(salida, 'manifest.json'), 'w', encoding='utf-8') as archivo:
+        json.dump(manifiesto, archivo, indent=2, sort_keys=True)
+    return manifiesto
+
+
+if __name__ == '__main__':
+    if sys.argv[1:] != ['build']:
+        print("Uso: python assets.py build")
+        sys.exit(1)
+    directorio = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+    print(f"{len(construir_dist(directorio))} archivos con huella en static/{DIRECTORIO_DIST}/")
+    print(f"{precomprimir(directorio)} archivos precomprimidos")
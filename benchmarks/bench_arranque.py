@@ -0,0 +1,78 @@
+"""
+Benchmark de latencia de la primera petición tras (re)arrancar un worker
+
+Cada modo se mide en un proceso nuevo, como un worker recién reciclado por
+`max_requests`: sin caché de bytecode ni precalentamiento, con la caché de
+bytecode en disco ya poblada, y con precalentamiento de plantillas en
+`create_app` (lo que con `preload_app` ya pagó el maestro).
+
+Uso:
+    python benchmarks/bench_arranque.py [--repeticiones 5]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def medir_primera_peticion() -> dict:
+    """Tiempo de create_app y de la primera petición a cada página (ms)"""
+    import logging
+    sys.path.insert(0, RAIZ)
+    os.chdir(RAIZ)
+
+    inicio = time.perf_counter()
+    from app import create_app
+    app = create_app('production')
+    resultado = {'create_app': (time.perf_counter() - inicio) * 1000}
+    logging.disable(logging.INFO)
+
+    cliente = app.test_client()
+    enlace = cliente.post('/personalizar', data={'color': 'negro', 'herrajes': 'plata'}).data.decode()
+    # La primera petición de cada ruta: el fallo de caché de páginas incluye el render
+    for nombre, url in (('/', '/'), ('/personalizar_form', '/personalizar_form?modelo=Cartera'),
+                        ('/ver/<id>', enlace.replace('http://localhost', ''))):
+        inicio = time.perf_counter()
+        cliente.get(url)
+        resultado[nombre] = (time.perf_counter() - inicio) * 1000
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeticiones', type=int, default=5)
+    parser.add_argument('--medir', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.medir:
+        print(json.dumps(medir_primera_peticion()))
+        return
+
+    with tempfile.TemporaryDirectory() as directorio:
+        modos = {
+            'sin caché ni precalentamiento': {'JINJA_BYTECODE_CACHE_DIR': '', 'JINJA_WARMUP': 'False'},
+            'caché de bytecode': {'JINJA_BYTECODE_CACHE_DIR': directorio, 'JINJA_WARMUP': 'False'},
+            'precalentamiento': {'JINJA_BYTECODE_CACHE_DIR': directorio, 'JINJA_WARMUP': 'True'},
+        }
+        for nombre, entorno in modos.items():
+            # Sin precalentamiento de páginas (ciclo_vida.py): la primera petición debe renderizar
+            env = dict(os.environ, SECRET_KEY='bench', STORAGE_BACKEND='memory', PRECALENTAR='False', **entorno)
+            muestras = []
+            for _ in range(args.repeticiones + 1):
+                salida = subprocess.run([sys.executable, __file__, '--medir'], env=env,
+                                        capture_output=True, text=True, check=True)
+                muestras.append(json.loads(salida.stdout.strip().splitlines()[-1]))
+            # La primera ejecución solo puebla la caché de bytecode
+            muestras = muestras[1:]
+            medias = {clave: sum(m[clave] for m in muestras) / len(muestras) for clave in muestras[0]}
+            print(f"{nombre:<31} " + '  '.join(f"{clave}={valor:6.1f} ms" for clave, valor in medias.items()))
+
+
+if __name__ == '__main__':
+    main()
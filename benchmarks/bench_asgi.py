@@ -0,0 +1,151 @@
+"""
+Benchmark de conexiones concurrentes: gunicorn (sync / gthread) frente a ASGI (uvicorn)
+
+Por cada servidor se abren `--lentas` conexiones que envían la cabecera a
+medias y se quedan esperando (clientes móviles lentos), y a la vez
+`--clientes` clientes keep-alive piden `/ver/<id>` sin pausa. Se informa de
+peticiones servidas, fallidas (sin respuesta en `--timeout` s) y latencias
+p50/p99 de las que sí respondieron.
+
+Los tres servidores usan 2 procesos y el backend SQLite compartido, como en
+producción.
+
+Uso:
+    python benchmarks/bench_asgi.py [--lentas 64] [--clientes 32] [--duracion 10]
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import tempfile
+import time
+from typing import List, Optional, Tuple
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PUERTO = 18765
+
+SERVIDORES = {
+    'gunicorn sync': ['gunicorn', '--config', 'gunicorn.conf.py', '--worker-class', 'sync',
+                      '--bind', f'127.0.0.1:{PUERTO}', '--access-logfile', os.devnull, 'wsgi:app'],
+    'gunicorn gthread': ['gunicorn', '--config', 'gunicorn.conf.py',
+                         '--bind', f'127.0.0.1:{PUERTO}', '--access-logfile', os.devnull, 'wsgi:app'],
+    'uvicorn (asgi.py)': ['uvicorn', 'asgi:app', '--host', '127.0.0.1', '--port', str(PUERTO),
+                          '--workers', '2', '--no-access-log', '--log-level', 'warning'],
+}
+
+
+def esperar_puerto(limite: float = 20) -> bool:
+    fin = time.monotonic() + limite
+    while time.monotonic() < fin:
+        try:
+            socket.create_connection(('127.0.0.1', PUERTO), timeout=0.5).close()
+            return True
+        except OSError:
+            time.sleep(0.1)
+    return False
+
+
+async def leer_respuesta(lector: asyncio.StreamReader) -> Tuple[int, bool]:
+    """Leer una respuesta HTTP/1.1 completa; devuelve (estado, conexión cerrada)"""
+    cabecera = await lector.readuntil(b'\r\n\r\n')
+    lineas = cabecera.decode('latin-1').split('\r\n')
+    estado = int(lineas[0].split()[1])
+    campos = {}
+    for linea in lineas[1:]:
+        if ':' in linea:
+            nombre, valor = linea.split(':', 1)
+            campos[nombre.strip().lower()] = valor.strip().lower()
+    await lector.readexactly(int(campos.get('content-length', 0)))
+    return estado, campos.get('connection') == 'close'
+
+
+async def cliente(ruta: str, fin: float, timeout: float, latencias: List[float], fallos: List[int]):
+    conexion: Optional[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = None
+    peticion = f'GET {ruta} HTTP/1.1\r\nHost: localhost\r\n\r\n'.encode()
+    while time.monotonic() < fin:
+        inicio = time.perf_counter()
+        try:
+            if conexion is None:
+                conexion = await asyncio.wait_for(asyncio.open_connection('127.0.0.1', PUERTO), timeout)
+            lector, escritor = conexion
+            escritor.write(peticion)
+            _, cerrada = await asyncio.wait_for(leer_respuesta(lector), timeout)
+            latencias.append(time.perf_counter() - inicio)
+            if cerrada:
+                escritor.close()
+                conexion = None
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+            fallos.append(1)
+            if conexion is not None:
+                conexion[1].close()
+            conexion = None
+
+
+async def medir(ruta: str, lentas: int, clientes: int, duracion: float, timeout: float) -> dict:
+    abiertas = []
+    for _ in range(lentas):
+        try:
+            lector, escritor = await asyncio.open_connection('127.0.0.1', PUERTO)
+        except OSError:
+            break
+        # Cabecera incompleta: el servidor debe esperar el resto
+        escritor.write(f'GET {ruta} HTTP/1.1\r\nHost: localhost\r\n'.encode())
+        abiertas.append(escritor)
+    await asyncio.sleep(0.5)
+
+    latencias: List[float] = []
+    fallos: List[int] = []
+    await asyncio.gather(*(cliente(ruta, time.monotonic() + duracion, timeout, latencias, fallos)
+                           for _ in range(clientes)))
+    for escritor in abiertas:
+        escritor.close()
+
+    latencias.sort()
+
+    def percentil(p: float) -> float:
+        return latencias[min(len(latencias) - 1, int(len(latencias) * p))] * 1000 if latencias else float('nan')
+
+    return {'servidas': len(latencias), 'fallidas': len(fallos), 'rps': len(latencias) / duracion,
+            'p50': percentil(0.50), 'p99': percentil(0.99)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--lentas', type=int, default=64, help='Conexiones con la cabecera a medias')
+    parser.add_argument('--clientes', type=int, default=32, help='Clientes keep-alive activos')
+    parser.add_argument('--duracion', type=float, default=10)
+    parser.add_argument('--timeout', type=float, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        env = dict(os.environ, SECRET_KEY='bench', STORAGE_BACKEND='sqlite', LOG_LEVEL='WARNING',
+                   DATABASE_PATH=os.path.join(directorio, 'bench.db'))
+        for nombre, comando in SERVIDORES.items():
+            servidor = subprocess.Popen(comando, cwd=RAIZ, env=env,
+                                        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                if not esperar_puerto():
+                    print(f"{nombre:<18} no arrancó")
+                    continue
+                with socket.create_connection(('127.0.0.1', PUERTO)) as conexion:
+                    cuerpo = 'color=negro&herrajes=plata'
+                    conexion.sendall((f'POST /personalizar?modelo=Cartera HTTP/1.1\r\nHost: localhost\r\n'
+                                      f'Content-Type: application/x-www-form-urlencoded\r\n'
+                                      f'Content-Length: {len(cuerpo)}\r\nConnection: close\r\n\r\n{cuerpo}').encode())
+                    respuesta = b''
+                    while (bloque := conexion.recv(65536)):
+                        respuesta += bloque
+                ruta = '/ver/' + respuesta.split(b'\r\n\r\n', 1)[1].decode().rsplit('/ver/', 1)[1]
+
+                r = asyncio.run(medir(ruta, args.lentas, args.clientes, args.duracion, args.timeout))
+                print(f"{nombre:<18} servidas={r['servidas']:6d} fallidas={r['fallidas']:4d} "
+                      f"{r['rps']:7.0f} req/s  p50={r['p50']:7.1f} ms  p99={r['p99']:7.1f} ms")
+            finally:
+                servidor.terminate()
+                servidor.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,262 @@
+"""
+Prueba de carga de extremo a extremo de las rutas de la aplicación
+
+Arranca `wsgi:app` con gunicorn y `gunicorn.conf.py` (solo cambian el
+puerto y el log de acceso) sobre una base SQLite con N personalizaciones
+precargadas y lanza una mezcla realista de peticiones:
+
+    GET /                         20 %
+    GET /personalizar_form        15 %
+    POST /personalizar            10 %
+    GET /ver/<id> existente       50 %
+    GET /ver/<id> inexistente      5 %
+
+Para cada tamaño del almacenamiento informa de peticiones por segundo y
+latencias p50/p95/p99 (globales y por ruta) en JSON. Si el servidor cierra
+una conexión keep-alive reutilizada (keepalive vencido o worker reciclado
+por `max_requests`) la petición se reintenta una vez en una conexión nueva,
+como haría un navegador, y se cuenta en `reintentos`. Con `--comparar` se
+contrasta con un resultado anterior y el script sale con código 1 si el
+throughput cae o el p99 sube más de `--tolerancia`.
+
+Uso:
+    python benchmarks/bench_carga.py [--tamanos 1000,10000,100000,1000000]
+                                     [--clientes 16] [--duracion 15]
+                                     [--salida resultado.json] [--comparar base.json]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from bench_asgi import leer_respuesta
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import ids  # noqa: E402
+from database import DatabaseManager  # noqa: E402
+
+PUERTO = 18766
+
+MEZCLA = (
+    ('GET /', 20),
+    ('GET /personalizar_form', 15),
+    ('POST /personalizar', 10),
+    ('GET /ver/<id>', 50),
+    ('GET /ver/<id> inexistente', 5),
+)
+COLORES = ('negro', 'marron', 'marron claro')
+HERRAJES = ('plata', 'dorado')
+MODELOS = ('Cartera', 'Cartera Urbana')
+
+
+def precargar(db: DatabaseManager, actuales: int, objetivo: int) -> List[str]:
+    """Insertar personalizaciones hasta llegar a `objetivo` y devolver una muestra de IDs"""
+    azar = random.Random(actuales)
+    ahora = datetime.utcnow()
+    muestra = []
+    for inicio in range(actuales, objetivo, 10000):
+        filas = []
+        for _ in range(min(10000, objetivo - inicio)):
+            # Repartidas en los últimos 29 días: el barrido no las expira durante la prueba
+            filas.append((ids.generar_id(), azar.choice(MODELOS), azar.choice(COLORES), azar.choice(HERRAJES),
+                          ahora - timedelta(seconds=azar.uniform(0, 29 * 86400))))
+        db.crear_personalizaciones(filas)
+        muestra += [fila[0] for fila in azar.sample(filas, min(len(filas), 200))]
+    return muestra
+
+
+def esperar_puerto(limite: float = 30) -> bool:
+    fin = time.monotonic() + limite
+    while time.monotonic() < fin:
+        try:
+            socket.create_connection(('127.0.0.1', PUERTO), timeout=0.5).close()
+            return True
+        except OSError:
+            time.sleep(0.1)
+    return False
+
+
+def construir_peticion(tipo: str, existentes: List[str], azar: random.Random) -> bytes:
+    if tipo == 'GET /':
+        ruta = '/'
+    elif tipo == 'GET /personalizar_form':
+        ruta = f"/personalizar_form?modelo={azar.choice(MODELOS).replace(' ', '%20')}"
+    elif tipo == 'POST /personalizar':
+        cuerpo = f"color={azar.choice(COLORES).replace(' ', '+')}&herrajes={azar.choice(HERRAJES)}"
+        return (f"POST /personalizar?modelo={azar.choice(MODELOS).replace(' ', '%20')} HTTP/1.1\r\n"
+                f"Host: localhost\r\nContent-Type: application/x-www-form-urlencoded\r\n"
+                f"Content-Length: {len(cuerpo)}\r\n\r\n{cuerpo}").encode()
+    elif tipo == 'GET /ver/<id>':
+        ruta = f"/ver/{azar.choice(existentes)}"
+    else:
+        ruta = f"/ver/{ids.generar_id()}"
+    return f"GET {ruta} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode()
+
+
+async def cliente(semilla: int, fin: float, existentes: List[str], latencias: Dict[str, List[float]],
+                  errores: Dict[str, int], reintentos: List[int]):
+    azar = random.Random(semilla)
+    tipos = [tipo for tipo, _ in MEZCLA]
+    pesos = [peso for _, peso in MEZCLA]
+    conexion = None
+    while time.monotonic() < fin:
+        tipo = azar.choices(tipos, pesos)[0]
+        peticion = construir_peticion(tipo, existentes, azar)
+        inicio = time.perf_counter()
+        for intento in range(2):
+            reutilizada = conexion is not None
+            try:
+                if conexion is None:
+                    conexion = await asyncio.open_connection('127.0.0.1', PUERTO)
+                lector, escritor = conexion
+                escritor.write(peticion)
+                estado, cerrada = await asyncio.wait_for(leer_respuesta(lector), 10)
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError) as e:
+                if conexion is not None:
+                    conexion[1].close()
+                conexion = None
+                # Conexión keep-alive cerrada por el servidor (keepalive vencido o worker
+                # reciclado por max_requests): un navegador reintenta en una conexión nueva
+                if reutilizada and intento == 0 and isinstance(e, (ConnectionError, asyncio.IncompleteReadError)):
+                    reintentos.append(1)
+                    continue
+                errores[tipo] += 1
+                break
+            esperado = 404 if tipo.endswith('inexistente') else 200
+            if estado == esperado:
+                latencias[tipo].append(time.perf_counter() - inicio)
+            else:
+                errores[tipo] += 1
+            if cerrada:
+                escritor.close()
+                conexion = None
+            break
+
+
+def percentiles(valores: List[float]) -> Dict[str, float]:
+    valores = sorted(valores)
+    if not valores:
+        return {'p50': None, 'p95': None, 'p99': None}
+    return {f'p{p}': round(valores[min(len(valores) - 1, int(len(valores) * p / 100))] * 1000, 3)
+            for p in (50, 95, 99)}
+
+
+async def medir(existentes: List[str], clientes: int, duracion: float) -> Dict:
+    latencias: Dict[str, List[float]] = defaultdict(list)
+    errores: Dict[str, int] = defaultdict(int)
+    reintentos: List[int] = []
+    fin = time.monotonic() + duracion
+    await asyncio.gather(*(cliente(semilla, fin, existentes, latencias, errores, reintentos)
+                           for semilla in range(clientes)))
+
+    todas = [valor for valores in latencias.values() for valor in valores]
+    return {
+        'peticiones': len(todas),
+        'errores': sum(errores.values()),
+        'reintentos': len(reintentos),
+        'rps': round(len(todas) / duracion, 1),
+        **percentiles(todas),
+        'por_ruta': {tipo: {'peticiones': len(latencias[tipo]), 'errores': errores[tipo],
+                            **percentiles(latencias[tipo])} for tipo, _ in MEZCLA},
+    }
+
+
+def comparar(actual: Dict, base: Dict, tolerancia: float) -> List[str]:
+    """Regresiones de throughput o p99 respecto a `base`, por tamaño"""
+    anteriores = {r['registros']: r for r in base['resultados']}
+    regresiones = []
+    for resultado in actual['resultados']:
+        anterior = anteriores.get(resultado['registros'])
+        if anterior is None:
+            continue
+        if resultado['rps'] < anterior['rps'] * (1 - tolerancia):
+            regresiones.append(f"{resultado['registros']} registros: {anterior['rps']} -> {resultado['rps']} req/s")
+        if anterior['p99'] and resultado['p99'] and resultado['p99'] > anterior['p99'] * (1 + tolerancia):
+            regresiones.append(f"{resultado['registros']} registros: p99 {anterior['p99']} -> {resultado['p99']} ms")
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--tamanos', default='1000,10000,100000,1000000',
+                        help='Personalizaciones precargadas, separadas por comas')
+    parser.add_argument('--clientes', type=int, default=16, help='Clientes keep-alive concurrentes')
+    parser.add_argument('--duracion', type=float, default=15, help='Segundos de carga por tamaño')
+    parser.add_argument('--calentamiento', type=float, default=2, help='Segundos de carga descartados')
+    parser.add_argument('--salida', help='Archivo JSON de resultados (por defecto, stdout)')
+    parser.add_argument('--comparar', help='Resultado JSON anterior con el que comparar')
+    parser.add_argument('--tolerancia', type=float, default=0.10, help='Empeoramiento admitido (0.10 = 10 %%)')
+    args = parser.parse_args()
+    tamanos = sorted(int(tamano) for tamano in args.tamanos.split(','))
+
+    informe = {
+        'fecha': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+        'configuracion': {'clientes': args.clientes, 'duracion': args.duracion,
+                          'mezcla': dict(MEZCLA), 'cpus': os.cpu_count()},
+        'resultados': [],
+    }
+
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta_db = os.path.join(directorio, 'carga.db')
+        db = DatabaseManager(ruta_db)
+        env = dict(os.environ, SECRET_KEY='bench', STORAGE_BACKEND='sqlite', DATABASE_PATH=ruta_db,
+                   LOG_LEVEL='WARNING', METRICS_DIR=os.path.join(directorio, 'metricas'))
+        existentes: List[str] = []
+        actuales = 0
+
+        for tamano in tamanos:
+            inicio = time.perf_counter()
+            existentes += precargar(db, actuales, tamano)
+            actuales = tamano
+            print(f"{tamano} registros precargados en {time.perf_counter() - inicio:.1f} s", file=sys.stderr)
+
+            servidor = subprocess.Popen(
+                ['gunicorn', '--config', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{PUERTO}',
+                 '--access-logfile', os.devnull, 'wsgi:app'],
+                cwd=RAIZ, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+            try:
+                if not esperar_puerto():
+                    raise RuntimeError("gunicorn no arrancó")
+                if args.calentamiento > 0:
+                    asyncio.run(medir(existentes, args.clientes, args.calentamiento))
+                resultado = asyncio.run(medir(existentes, args.clientes, args.duracion))
+            finally:
+                servidor.terminate()
+                servidor.wait()
+
+            informe['resultados'].append({'registros': tamano, **resultado})
+            print(f"{tamano:>8} registros: {resultado['rps']:8.1f} req/s  p50={resultado['p50']} ms  "
+                  f"p95={resultado['p95']} ms  p99={resultado['p99']} ms  errores={resultado['errores']}",
+                  file=sys.stderr)
+
+    texto = json.dumps(informe, indent=2, ensure_ascii=False)
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as archivo:
+            archivo.write(texto + '\n')
+    else:
+        print(texto)
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as archivo:
+            regresiones = comparar(informe, json.load(archivo), args.tolerancia)
+        for regresion in regresiones:
+            print(f"REGRESIÓN {regresion}", file=sys.stderr)
+        if regresiones:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
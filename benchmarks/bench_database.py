@@ -0,0 +1,57 @@
+"""
+Benchmark de latencia de DatabaseManager con y sin pool de conexiones
+
+Uso:
+    python benchmarks/bench_database.py [--operaciones 2000]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import DatabaseManager
+
+
+def medir(db: DatabaseManager, operaciones: int) -> dict:
+    """Medir la latencia media (µs) de crear y obtener personalizaciones"""
+    ids = [str(uuid.uuid4()) for _ in range(operaciones)]
+
+    inicio = time.perf_counter()
+    for id_personalizacion in ids:
+        db.crear_personalizacion(id_personalizacion, 'Cartera', 'negro', 'plata')
+    crear = (time.perf_counter() - inicio) / operaciones
+
+    inicio = time.perf_counter()
+    for id_personalizacion in ids:
+        db.obtener_personalizacion(id_personalizacion)
+    obtener = (time.perf_counter() - inicio) / operaciones
+
+    return {
+        'crear_personalizacion_us': round(crear * 1e6, 1),
+        'obtener_personalizacion_us': round(obtener * 1e6, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--operaciones', type=int, default=2000)
+    parser.add_argument('--synchronous', default='NORMAL')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        for pool in (False, True):
+            db = DatabaseManager(os.path.join(directorio, f'bench_{pool}.db'),
+                                 pool=pool, synchronous=args.synchronous)
+            resultado = medir(db, args.operaciones)
+            print(f"pool={'si' if pool else 'no':<3} "
+                  f"crear={resultado['crear_personalizacion_us']:>8} µs  "
+                  f"obtener={resultado['obtener_personalizacion_us']:>8} µs")
+
+
+if __name__ == '__main__':
+    main()
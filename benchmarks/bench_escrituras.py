@@ -0,0 +1,77 @@
+"""
+Benchmark de POST /personalizar por segundo con y sin write-behind
+
+Cada modo se ejecuta en un subproceso con su propia configuración de
+entorno y una base de datos SQLite temporal.
+
+Uso:
+    python benchmarks/bench_escrituras.py [--peticiones 2000] [--hilos 16]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODOS = {
+    'sin write-behind': {'DB_WRITE_BEHIND': 'False'},
+    'write-behind grupo': {'DB_WRITE_BEHIND': 'True', 'DB_WRITE_BEHIND_DURABILIDAD': 'grupo'},
+    'write-behind asincrona': {'DB_WRITE_BEHIND': 'True', 'DB_WRITE_BEHIND_DURABILIDAD': 'asincrona'},
+}
+
+
+def ejecutar_modo(peticiones: int, hilos: int) -> float:
+    """Lanzar las peticiones desde varios hilos y devolver POSTs por segundo"""
+    import logging
+    sys.path.insert(0, RAIZ)
+    from app import create_app
+
+    app = create_app('production')
+    logging.disable(logging.INFO)
+    por_hilo = peticiones // hilos
+
+    def trabajador():
+        cliente = app.test_client()
+        for _ in range(por_hilo):
+            cliente.post('/personalizar?modelo=Cartera', data={'color': 'negro', 'herrajes': 'plata'})
+
+    trabajadores = [threading.Thread(target=trabajador) for _ in range(hilos)]
+    inicio = time.perf_counter()
+    for t in trabajadores:
+        t.start()
+    for t in trabajadores:
+        t.join()
+    return por_hilo * hilos / (time.perf_counter() - inicio)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--peticiones', type=int, default=2000)
+    parser.add_argument('--hilos', type=int, default=16)
+    parser.add_argument('--modo', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.modo:
+        print(f"{ejecutar_modo(args.peticiones, args.hilos):.0f}")
+        return
+
+    with tempfile.TemporaryDirectory() as directorio:
+        for nombre, entorno in MODOS.items():
+            env = dict(os.environ, SECRET_KEY='bench', STORAGE_BACKEND='sqlite',
+                       DATABASE_PATH=os.path.join(directorio, f"{nombre.replace(' ', '_')}.db"),
+                       **entorno)
+            salida = subprocess.run(
+                [sys.executable, __file__, '--modo', nombre,
+                 '--peticiones', str(args.peticiones), '--hilos', str(args.hilos)],
+                env=env, cwd=RAIZ, capture_output=True, text=True, check=True
+            )
+            print(f"{nombre:<24} {salida.stdout.strip().splitlines()[-1]:>8} POST/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,206 @@
+"""
+Micro-benchmarks de las funciones auxiliares que se ejecutan en cada petición
+
+Mide `utils.sanitizar_input`, `utils.validar_datos_personalizacion`,
+`Personalizacion.get_imagen_path` y `Personalizacion.is_valid` frente a sus
+implementaciones originales (copiadas aquí como referencia). Antes de medir
+comprueba que la versión actual devuelve exactamente lo mismo que la
+original para un conjunto de entradas fijas y aleatorias.
+
+Cada medición se guarda como nanosegundos por llamada y como proporción
+respecto a la referencia medida en la misma ejecución. La proporción apenas
+depende de la máquina, así que es la que se compara con la línea base
+(`baseline_funciones.json`): el script sale con código 1 si alguna función
+empeora más de `--tolerancia`.
+
+Uso:
+    python benchmarks/bench_funciones.py [--guardar] [--tolerancia 0.25]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import timeit
+from typing import Any, Callable, Dict, List, Tuple
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from catalogo import CATALOGO  # noqa: E402
+from models import Personalizacion  # noqa: E402
+from utils import sanitizar_input, validar_datos_personalizacion  # noqa: E402
+
+LINEA_BASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline_funciones.json')
+
+
+# Implementaciones originales, tal como estaban antes de optimizarlas
+
+def sanitizar_input_original(texto):
+    if not texto:
+        return ""
+    caracteres_peligrosos = ['<', '>', '"', "'", '&']
+    for char in caracteres_peligrosos:
+        texto = texto.replace(char, '')
+    return texto.strip()
+
+
+class ConfigOriginal:
+    """Opciones tal como estaban en Config antes de pasar a catalogo.json"""
+    COLORES_DISPONIBLES = ['negro', 'marron', 'marron claro']
+    HERRAJES_DISPONIBLES = ['plata', 'dorado']
+
+
+def validar_datos_personalizacion_original(data):
+    from config import Config  # noqa: F401 (el original importaba en cada llamada)
+    campos_requeridos = ['color', 'herrajes']
+    for campo in campos_requeridos:
+        if not data.get(campo):
+            return False, f"El campo {campo} es requerido"
+    color = data.get('color')
+    if color not in ConfigOriginal.COLORES_DISPONIBLES:
+        return False, f"Color '{color}' no es válido. Colores disponibles: {', '.join(ConfigOriginal.COLORES_DISPONIBLES)}"
+    herrajes = data.get('herrajes')
+    if herrajes not in ConfigOriginal.HERRAJES_DISPONIBLES:
+        return False, f"Herrajes '{herrajes}' no son válidos. Herrajes disponibles: {', '.join(ConfigOriginal.HERRAJES_DISPONIBLES)}"
+    return True, None
+
+
+def _map_color_to_file_original(self, color):
+    color_map = {'negro': 'negro', 'marron': 'marron', 'marron claro': 'marron_claro'}
+    return color_map.get(color, 'negro')
+
+
+def _map_herrajes_to_file_original(self, herrajes):
+    herrajes_map = {'plata': 'plata', 'dorado': 'dorado'}
+    return herrajes_map.get(herrajes, 'plata')
+
+
+def get_imagen_path_original(self):
+    modelo = 'modelo1'
+    if self.producto and 'urbana' in self.producto.lower():
+        modelo = 'modelo2'
+    color_file = _map_color_to_file_original(self, self.color)
+    herrajes_file = _map_herrajes_to_file_original(self, self.herrajes)
+    return f"/static/{modelo}_{color_file}_{herrajes_file}.jpg"
+
+
+def is_valid_original(self):
+    from config import Config  # noqa: F401
+    return (
+        self.producto and
+        self.color in ConfigOriginal.COLORES_DISPONIBLES and
+        self.herrajes in ConfigOriginal.HERRAJES_DISPONIBLES
+    )
+
+
+# Entradas de prueba
+
+def textos(azar: random.Random) -> List[Any]:
+    fijos = ['', None, 'Cartera', 'Cartera Urbana', '  Cartera  ', '<script>alert("x")</script>',
+             "O'Brien & Co", '&amp;&lt;', '<<>>""\'\'&&', ' < > ', 'ñandú <b>ü</b>', '\t\n<x>\n']
+    alfabeto = 'ab <>"\'&\t\nñ'
+    return fijos + [''.join(azar.choice(alfabeto) for _ in range(azar.randrange(30))) for _ in range(2000)]
+
+
+def formularios(azar: random.Random) -> List[Dict[str, Any]]:
+    valores = [*CATALOGO.valores_colores, *CATALOGO.valores_herrajes, '', 'rojo', 'Negro', 0, 1, None, ['negro'], {}]
+    datos = [{}, {'color': 'negro'}, {'herrajes': 'plata'}]
+    for _ in range(2000):
+        datos.append({campo: azar.choice(valores) for campo in ('color', 'herrajes') if azar.random() < 0.9})
+    return datos
+
+
+def personalizaciones(azar: random.Random) -> List[Personalizacion]:
+    productos = ['Cartera', 'Cartera Urbana', 'CARTERA URBANA', '', None]
+    colores = [*CATALOGO.valores_colores, 'rojo', '', None]
+    herrajes = [*CATALOGO.valores_herrajes, 'oro', '', None]
+    return [Personalizacion(azar.choice(productos), azar.choice(colores), azar.choice(herrajes))
+            for _ in range(2000)]
+
+
+def comprobar_equivalencia(azar: random.Random) -> List[str]:
+    """Diferencias entre la implementación actual y la original"""
+    diferencias = []
+    casos = [
+        ('sanitizar_input', sanitizar_input, sanitizar_input_original, textos(azar)),
+        ('validar_datos_personalizacion', validar_datos_personalizacion, validar_datos_personalizacion_original,
+         formularios(azar)),
+        ('get_imagen_path', Personalizacion.get_imagen_path, get_imagen_path_original, personalizaciones(azar)),
+        ('is_valid', Personalizacion.is_valid, is_valid_original, personalizaciones(azar)),
+    ]
+    for nombre, actual, original, entradas in casos:
+        for entrada in entradas:
+            if actual(entrada) != original(entrada):
+                diferencias.append(f"{nombre}({entrada!r}): {actual(entrada)!r} != {original(entrada)!r}")
+    return diferencias
+
+
+def medir(actual: Callable, original: Callable, argumento: Any, repeticiones: int) -> Tuple[float, float]:
+    """Nanosegundos por llamada (actual, original), mejor de 7 series alternadas"""
+    temporizadores = (timeit.Timer(lambda: actual(argumento)), timeit.Timer(lambda: original(argumento)))
+    mejores = [float('inf'), float('inf')]
+    # Alternar las series reparte entre ambas el ruido de la máquina
+    for _ in range(7):
+        for indice, temporizador in enumerate(temporizadores):
+            mejores[indice] = min(mejores[indice], temporizador.timeit(repeticiones))
+    return mejores[0] / repeticiones * 1e9, mejores[1] / repeticiones * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeticiones', type=int, default=100000)
+    parser.add_argument('--tolerancia', type=float, default=0.25, help='Empeoramiento admitido (0.25 = 25 %%)')
+    parser.add_argument('--guardar', action='store_true', help='Guardar esta ejecución como línea base')
+    args = parser.parse_args()
+
+    diferencias = comprobar_equivalencia(random.Random(0))
+    for diferencia in diferencias[:20]:
+        print(f"DIFERENCIA {diferencia}")
+    if diferencias:
+        print(f"{len(diferencias)} resultados distintos de la implementación original")
+        sys.exit(1)
+
+    p = Personalizacion('Cartera Urbana', 'marron claro', 'dorado')
+    casos = {
+        'sanitizar_input': (sanitizar_input, sanitizar_input_original, 'Cartera Urbana'),
+        'validar_datos_personalizacion': (validar_datos_personalizacion, validar_datos_personalizacion_original,
+                                          {'color': 'marron claro', 'herrajes': 'dorado', 'modelo': 'Cartera'}),
+        'get_imagen_path': (Personalizacion.get_imagen_path, get_imagen_path_original, p),
+        'is_valid': (Personalizacion.is_valid, is_valid_original, p),
+    }
+
+    resultados = {}
+    for nombre, (actual, original, argumento) in casos.items():
+        ns_actual, ns_original = medir(actual, original, argumento, args.repeticiones)
+        resultados[nombre] = {'ns_original': round(ns_original, 1), 'ns': round(ns_actual, 1),
+                              'relativo': round(ns_actual / ns_original, 3)}
+        print(f"{nombre:<30} original {ns_original:7.1f} ns  actual {ns_actual:7.1f} ns  "
+              f"({ns_actual / ns_original:.2f}x)")
+
+    if args.guardar:
+        with open(LINEA_BASE, 'w', encoding='utf-8') as archivo:
+            json.dump(resultados, archivo, indent=2)
+            archivo.write('\n')
+        print(f"Línea base guardada en {os.path.relpath(LINEA_BASE, RAIZ)}")
+        return
+
+    if not os.path.exists(LINEA_BASE):
+        return
+    with open(LINEA_BASE, encoding='utf-8') as archivo:
+        base = json.load(archivo)
+    regresiones = [
+        f"{nombre}: {base[nombre]['relativo']:.2f}x -> {resultado['relativo']:.2f}x de la referencia"
+        for nombre, resultado in resultados.items()
+        if nombre in base and resultado['relativo'] > base[nombre]['relativo'] * (1 + args.tolerancia)
+    ]
+    for regresion in regresiones:
+        print(f"REGRESIÓN {regresion}")
+    if regresiones:
+        sys.exit(1)
+    print("Sin regresiones respecto a la línea base")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""
+Benchmark de bytes por registro de los almacenamientos en memoria
+
+Uso:
+    python benchmarks/bench_memoria.py [--registros 200000]
+"""
+
+import argparse
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalogo import CATALOGO
+from models import Personalizacion
+from storage import MemoryStore, ColumnarStore
+
+
+def medir(fabrica, registros: int) -> float:
+    """Bytes asignados por registro al llenar un almacenamiento"""
+    colores = CATALOGO.valores_colores
+    herrajes = CATALOGO.valores_herrajes
+
+    tracemalloc.start()
+    store = fabrica()
+    inicial = tracemalloc.get_traced_memory()[0]
+    for i in range(registros):
+        # Los valores llegan como cadenas nuevas en cada petición, igual que desde el formulario
+        store.guardar(Personalizacion(
+            ''.join(['Cartera ', 'Clásica']),
+            ''.join(colores[i % len(colores)]),
+            ''.join(herrajes[i % len(herrajes)])
+        ))
+    final = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (final - inicial) / registros
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--registros', type=int, default=200000)
+    args = parser.parse_args()
+
+    for nombre, fabrica in (('memory', MemoryStore), ('columnar', ColumnarStore)):
+        print(f"{nombre:<9} {medir(fabrica, args.registros):>8.1f} bytes/registro")
+
+
+if __name__ == '__main__':
+    main()
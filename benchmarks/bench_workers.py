@@ -0,0 +1,211 @@
+"""
+Memoria por worker y latencia de la primera petición según los hooks de ciclo de vida
+
+Arranca `wsgi:app` con gunicorn y `gunicorn.conf.py` en tres modos:
+
+    sin_hooks         PRECALENTAR=False  GUNICORN_GC_FREEZE=False
+    precalentado      PRECALENTAR=True   GUNICORN_GC_FREEZE=False
+    precalentado_gc   PRECALENTAR=True   GUNICORN_GC_FREEZE=True  (por defecto)
+
+Para cada modo mide la latencia de la primera petición a `/`, al formulario
+y a `/ver/<id>` de una personalización reciente, recién arrancado el
+servidor y tras reciclar los workers con SIGHUP como hace `max_requests`
+(mediana de `--reciclajes` ciclos). Después aplica la carga de
+`bench_carga.py` y lee de `/proc/<pid>/smaps_rollup` la memoria de cada
+worker: RSS, PSS (la parte compartida se reparte entre los procesos que la
+usan) y privada (páginas ya copiadas por copy-on-write). Solo funciona en
+Linux.
+
+Uso:
+    python benchmarks/bench_workers.py [--registros 10000] [--duracion 10]
+                                       [--reciclajes 5] [--modos sin_hooks,precalentado,precalentado_gc]
+                                       [--salida resultado.json]
+"""
+
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from bench_carga import PUERTO, esperar_puerto, medir, precargar
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from database import DatabaseManager  # noqa: E402
+
+MODOS = {
+    'sin_hooks': {'PRECALENTAR': 'False', 'GUNICORN_GC_FREEZE': 'False'},
+    'precalentado': {'PRECALENTAR': 'True', 'GUNICORN_GC_FREEZE': 'False'},
+    'precalentado_gc': {'PRECALENTAR': 'True', 'GUNICORN_GC_FREEZE': 'True'},
+}
+
+
+def hijos(pid: int) -> List[int]:
+    """PIDs de los procesos hijos de `pid` (los workers del maestro)"""
+    encontrados = []
+    for entrada in os.listdir('/proc'):
+        if not entrada.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entrada}/stat') as archivo:
+                # El nombre del proceso va entre paréntesis y puede contener espacios
+                campos = archivo.read().rsplit(')', 1)[1].split()
+        except OSError:
+            continue
+        if int(campos[1]) == pid:
+            encontrados.append(int(entrada))
+    return sorted(encontrados)
+
+
+def memoria(pid: int) -> Dict[str, float]:
+    """RSS, PSS y memoria privada de un proceso en MiB"""
+    valores = {}
+    with open(f'/proc/{pid}/smaps_rollup') as archivo:
+        for linea in archivo:
+            partes = linea.split()
+            if len(partes) == 3 and partes[2] == 'kB':
+                valores[partes[0].rstrip(':')] = int(partes[1])
+    return {
+        'rss': round(valores.get('Rss', 0) / 1024, 1),
+        'pss': round(valores.get('Pss', 0) / 1024, 1),
+        'privada': round((valores.get('Private_Clean', 0) + valores.get('Private_Dirty', 0)) / 1024, 1),
+    }
+
+
+def esperar_workers(maestro: int, cantidad: int, anteriores: List[int], limite: float = 30) -> List[int]:
+    """Esperar a que el maestro tenga `cantidad` workers, ninguno de `anteriores`"""
+    fin = time.monotonic() + limite
+    while time.monotonic() < fin:
+        actuales = hijos(maestro)
+        if len(actuales) == cantidad and not set(actuales) & set(anteriores):
+            return actuales
+        time.sleep(0.1)
+    raise RuntimeError("los workers no arrancaron")
+
+
+def primera_peticion(rutas: Dict[str, str]) -> Dict[str, Optional[float]]:
+    """Milisegundos de una petición por ruta, cada una en una conexión nueva"""
+    resultado = {}
+    for nombre, ruta in rutas.items():
+        conexion = http.client.HTTPConnection('127.0.0.1', PUERTO, timeout=10)
+        inicio = time.perf_counter()
+        try:
+            conexion.request('GET', ruta)
+            respuesta = conexion.getresponse()
+            respuesta.read()
+            resultado[nombre] = round((time.perf_counter() - inicio) * 1000, 2) if respuesta.status == 200 else None
+        except OSError:
+            resultado[nombre] = None
+        finally:
+            conexion.close()
+    return resultado
+
+
+def medir_modo(env: Dict[str, str], rutas: Dict[str, str], existentes: List[str], args) -> Dict:
+    servidor = subprocess.Popen(
+        ['gunicorn', '--config', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{PUERTO}',
+         '--access-logfile', os.devnull, 'wsgi:app'],
+        cwd=RAIZ, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        if not esperar_puerto(60):
+            raise RuntimeError("gunicorn no arrancó")
+        workers = esperar_workers(servidor.pid, args.workers, [])
+        arranque = primera_peticion(rutas)
+
+        # Reciclar los workers como hace max_requests: el maestro hace fork de nuevo
+        ciclos = []
+        for _ in range(args.reciclajes):
+            servidor.send_signal(signal.SIGHUP)
+            workers = esperar_workers(servidor.pid, args.workers, workers)
+            esperar_puerto()
+            ciclos.append(primera_peticion(rutas))
+        reciclado = {}
+        for ruta in rutas:
+            tiempos = [ciclo[ruta] for ciclo in ciclos if ciclo[ruta] is not None]
+            reciclado[ruta] = round(statistics.median(tiempos), 2) if tiempos else None
+
+        carga = asyncio.run(medir(existentes, args.clientes, args.duracion))
+        por_worker = [memoria(pid) for pid in hijos(servidor.pid)]
+        maestro = memoria(servidor.pid)
+    finally:
+        servidor.terminate()
+        servidor.wait()
+
+    return {
+        'primera_peticion_ms': {'arranque': arranque, 'reciclado': reciclado},
+        'memoria_mib': {
+            'maestro': maestro,
+            'workers': por_worker,
+            **{f'{clave}_media_worker': round(sum(m[clave] for m in por_worker) / len(por_worker), 1)
+               for clave in ('rss', 'pss', 'privada')},
+        },
+        'carga': {clave: carga[clave] for clave in ('peticiones', 'errores', 'rps', 'p50', 'p95', 'p99')},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--registros', type=int, default=10000, help='Personalizaciones precargadas')
+    parser.add_argument('--clientes', type=int, default=16, help='Clientes keep-alive concurrentes')
+    parser.add_argument('--duracion', type=float, default=10, help='Segundos de carga antes de medir la memoria')
+    parser.add_argument('--reciclajes', type=int, default=5, help='Ciclos SIGHUP para la mediana tras reciclar')
+    parser.add_argument('--workers', type=int, default=2, help='Workers de gunicorn.conf.py')
+    parser.add_argument('--modos', default=','.join(MODOS), help='Modos a medir, separados por comas')
+    parser.add_argument('--salida', help='Archivo JSON de resultados (por defecto, stdout)')
+    args = parser.parse_args()
+    modos = args.modos.split(',')
+
+    informe = {
+        'fecha': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+        'configuracion': {'registros': args.registros, 'clientes': args.clientes, 'duracion': args.duracion,
+                          'reciclajes': args.reciclajes, 'cpus': os.cpu_count()},
+        'resultados': {},
+    }
+
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta_db = os.path.join(directorio, 'workers.db')
+        db = DatabaseManager(ruta_db)
+        existentes = precargar(db, 0, args.registros)
+        reciente = db.listar_pagina(1)[0]['id']
+        db.cerrar()
+        rutas = {
+            'GET /': '/',
+            'GET /personalizar_form': '/personalizar_form?modelo=Cartera%20Urbana',
+            'GET /ver/<id> reciente': f'/ver/{reciente}',
+        }
+
+        for modo in modos:
+            env = dict(os.environ, SECRET_KEY='bench', STORAGE_BACKEND='sqlite', DATABASE_PATH=ruta_db,
+                       LOG_LEVEL='WARNING', METRICS_DIR=os.path.join(directorio, f'metricas-{modo}'),
+                       **MODOS[modo])
+            resultado = medir_modo(env, rutas, existentes, args)
+            informe['resultados'][modo] = resultado
+            memoria_media = resultado['memoria_mib']
+            print(f"{modo:<16} primera petición (arranque/reciclado): "
+                  + ', '.join(f"{ruta} {resultado['primera_peticion_ms']['arranque'][ruta]}/"
+                              f"{resultado['primera_peticion_ms']['reciclado'][ruta]} ms" for ruta in rutas)
+                  + f"  worker: RSS {memoria_media['rss_media_worker']} MiB, "
+                    f"PSS {memoria_media['pss_media_worker']} MiB, privada {memoria_media['privada_media_worker']} MiB",
+                  file=sys.stderr)
+
+    texto = json.dumps(informe, indent=2, ensure_ascii=False)
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as archivo:
+            archivo.write(texto + '\n')
+    else:
+        print(texto)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Prueba de estrés de concurrencia del gestor de personalizaciones
+
+Lanza muchos hilos que crean, leen, listan, eliminan y expiran
+personalizaciones contra el mismo `PersonalizacionManager`, como las
+peticiones simultáneas de un worker gthread. Con un intervalo de cambio de
+hilo muy corto fuerza intercalados que en un servidor real serían raros.
+
+Comprueba que no se pierde ninguna escritura (todo ID creado y no eliminado
+sigue legible), que no se lanzan excepciones como `RuntimeError:
+OrderedDict mutated during iteration` y que los contadores cuadran.
+
+Uso:
+    python benchmarks/stress_concurrencia.py [--store memory] [--hilos 16] [--operaciones 2000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cache import TTLCache  # noqa: E402
+from models import PersonalizacionManager  # noqa: E402
+from storage import ColumnarStore, MemoryStore, SQLiteStore  # noqa: E402
+
+
+def crear_manager(tipo: str, directorio: str) -> PersonalizacionManager:
+    if tipo == 'memory':
+        return PersonalizacionManager(MemoryStore(politica='lru'))
+    if tipo == 'columnar':
+        return PersonalizacionManager(ColumnarStore())
+    from database import DatabaseManager
+    db = DatabaseManager(os.path.join(directorio, 'stress.db'))
+    return PersonalizacionManager(SQLiteStore(db), cache=TTLCache(max_entradas=1000, ttl=60))
+
+
+def trabajador(manager: PersonalizacionManager, operaciones: int, vivos: dict, errores: list,
+               semilla: int):
+    azar = random.Random(semilla)
+    propios = []
+    try:
+        for _ in range(operaciones):
+            operacion = azar.random()
+            if operacion < 0.45 or not propios:
+                personalizacion = manager.crear_personalizacion('Cartera', 'negro', 'plata')
+                propios.append(personalizacion.id)
+            elif operacion < 0.85:
+                id_personalizacion = azar.choice(propios)
+                if manager.obtener_personalizacion(id_personalizacion) is None:
+                    errores.append(f"Escritura perdida: {id_personalizacion}")
+            elif operacion < 0.95:
+                id_personalizacion = propios.pop(azar.randrange(len(propios)))
+                if not manager.eliminar_personalizacion(id_personalizacion):
+                    errores.append(f"No se pudo eliminar: {id_personalizacion}")
+            elif operacion < 0.99:
+                manager.listar_personalizaciones()
+            else:
+                manager.limpiar_personalizaciones_expiradas()
+    except Exception as e:
+        errores.append(f"{type(e).__name__}: {e}")
+    vivos[semilla] = propios
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--store', choices=('memory', 'columnar', 'sqlite'), default='memory')
+    parser.add_argument('--hilos', type=int, default=16)
+    parser.add_argument('--operaciones', type=int, default=2000)
+    args = parser.parse_args()
+
+    sys.setswitchinterval(1e-6)
+    with tempfile.TemporaryDirectory() as directorio:
+        manager = crear_manager(args.store, directorio)
+        vivos, errores = {}, []
+        hilos = [
+            threading.Thread(target=trabajador, args=(manager, args.operaciones, vivos, errores, semilla))
+            for semilla in range(args.hilos)
+        ]
+        inicio = time.perf_counter()
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        duracion = time.perf_counter() - inicio
+
+        if hasattr(manager.store, 'db'):
+            manager.store.db.vaciar_cola()
+        esperados = {id_personalizacion for propios in vivos.values() for id_personalizacion in propios}
+        listados = {p.id for p in manager.listar_personalizaciones()}
+        for id_personalizacion in esperados:
+            if manager.obtener_personalizacion(id_personalizacion) is None:
+                errores.append(f"Escritura perdida al final: {id_personalizacion}")
+        if listados - esperados:
+            errores.append(f"listar() devuelve {len(listados - esperados)} registros eliminados")
+        # SQLite limita el listado a los más recientes (página de administración)
+        if args.store != 'sqlite' and listados != esperados:
+            errores.append(f"listar() devuelve {len(listados)} registros, se esperaban {len(esperados)}")
+        # Nada ha expirado todavía: el barrido no debe eliminar nada
+        if manager.store.limpiar_expiradas(timedelta(hours=1)):
+            errores.append("limpiar_expiradas eliminó registros vigentes")
+
+    total = args.hilos * args.operaciones
+    print(f"{args.store}: {total} operaciones en {args.hilos} hilos, {duracion:.2f} s "
+          f"({total / duracion:.0f} ops/s), {len(esperados)} registros vivos")
+    for error in errores[:20]:
+        print(f"  ERROR {error}")
+    if errores:
+        print(f"{len(errores)} errores")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Caché en memoria con expiración (TTL) y desalojo LRU para Teteu Cueros
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+
+class TTLCache:
+    """Caché acotada con expiración por entrada y desalojo del menos usado"""
+
+    def __init__(self, max_entradas: int = 10000, ttl: float = 300.0):
+        """
+        Args:
+            max_entradas: Número máximo de entradas antes de desalojar
+            ttl: Segundos de vida por defecto de cada entrada
+        """
+        if max_entradas <= 0:
+            raise ValueError("max_entradas debe ser mayor que cero")
+
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self._datos: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+        self.expiraciones = 0
+        self.invalidaciones = 0
+
+    def get(self, clave: Hashable) -> Optional[Any]:
+        """Obtener un valor vigente (None si no existe o expiró)"""
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                self.fallos += 1
+                return None
+
+            valor, expira_en = entrada
+            if expira_en <= time.monotonic():
+                del self._datos[clave]
+                self.expiraciones += 1
+                self.fallos += 1
+                return None
+
+            self._datos.move_to_end(clave)
+            self.aciertos += 1
+            return valor
+
+    def set(self, clave: Hashable, valor: Any, ttl: Optional[float] = None):
+        """Guardar un valor; `ttl` sobrescribe la vida por defecto"""
+        expira_en = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._datos[clave] = (valor, expira_en)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+                self.desalojos += 1
+
+    def invalidar(self, clave: Hashable) -> bool:
+        """Eliminar una entrada; devuelve True si existía"""
+        with self._lock:
+            if self._datos.pop(clave, None) is None:
+                return False
+            self.invalidaciones += 1
+            return True
+
+    def purgar(self) -> int:
+        """Eliminar todas las entradas expiradas"""
+        ahora = time.monotonic()
+        with self._lock:
+            expiradas = [clave for clave, (_, expira_en) in self._datos.items() if expira_en <= ahora]
+            for clave in expiradas:
+                del self._datos[clave]
+            self.expiraciones += len(expiradas)
+            return len(expiradas)
+
+    def limpiar(self):
+        """Vaciar la caché"""
+        with self._lock:
+            self._datos.clear()
+
+    def __len__(self) -> int:
+        return len(self._datos)
+
+    def estadisticas(self) -> Dict[str, Any]:
+        """Contadores para dimensionar la caché"""
+        consultas = self.aciertos + self.fallos
+        return {
+            'entradas': len(self._datos),
+            'max_entradas': self.max_entradas,
+            'aciertos': self.aciertos,
+            'fallos': self.fallos,
+            'tasa_aciertos': round(self.aciertos / consultas, 4) if consultas else 0.0,
+            'desalojos': self.desalojos,
+            'expiraciones': self.expiraciones,
+            'invalidaciones': self.invalidaciones
+        }
@@ -0,0 +1,188 @@
+"""
+Catálogo de modelos, colores y herrajes para Teteu Cueros
+
+El catálogo se lee una vez al arrancar desde `catalogo.json` (o el archivo
+de `CATALOGO_PATH`) y se congela en tablas de consulta: validación de
+opciones, resolución de la imagen de cada variante y muestras del
+formulario. El servidor, las plantillas y `main.js` usan las mismas tablas;
+el navegador las recibe como manifiesto JSON en `/catalogo.<version>.json`,
+con caché inmutable porque la versión es el hash de su contenido.
+
+Añadir un modelo o un color es editar el archivo de datos y reiniciar.
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime
+from types import MappingProxyType
+from typing import Any, Dict, FrozenSet, Mapping, Optional, Tuple
+
+from flask import Response
+
+from assets import UN_ANO
+from config import Config
+
+
+class Modelo:
+    """Modelo de cartera del catálogo"""
+
+    __slots__ = ('id', 'nombre', 'imagen', 'medidas', 'caracteristicas', 'palabras_clave')
+
+    def __init__(self, id: str, nombre: str, imagen: str, medidas: str = '', caracteristicas: str = '',
+                 palabras_clave: Tuple[str, ...] = ()):
+        self.id = id
+        self.nombre = nombre
+        self.imagen = imagen
+        self.medidas = medidas
+        self.caracteristicas = caracteristicas
+        self.palabras_clave = tuple(palabra.lower() for palabra in palabras_clave)
+
+
+class Opcion:
+    """Color o herraje seleccionable"""
+
+    __slots__ = ('valor', 'nombre', 'archivo', 'muestra')
+
+    def __init__(self, valor: str, nombre: str, archivo: str, muestra: str):
+        self.valor = valor
+        self.nombre = nombre
+        self.archivo = archivo
+        self.muestra = muestra
+
+
+class Catalogo:
+    """
+    Tablas de consulta inmutables construidas a partir de los datos del catálogo
+
+    El primer modelo es el de por defecto (productos sin palabra clave) y el
+    primer color y el primer herraje son los que se usan en la imagen cuando
+    el valor no es conocido.
+    """
+
+    def __init__(self, datos: Dict[str, Any], fecha: Optional[datetime] = None):
+        """
+        Args:
+            datos: Diccionario con las listas `modelos`, `colores` y `herrajes`
+            fecha: Última modificación de los datos (UTC; por defecto, ahora)
+        """
+        # Entra en el Last-Modified de las páginas que dependen del catálogo
+        self.fecha = fecha or datetime.utcnow()
+        self.modelos: Tuple[Modelo, ...] = tuple(Modelo(**modelo) for modelo in datos['modelos'])
+        self.colores: Tuple[Opcion, ...] = tuple(Opcion(**opcion) for opcion in datos['colores'])
+        self.herrajes: Tuple[Opcion, ...] = tuple(Opcion(**opcion) for opcion in datos['herrajes'])
+        if not self.modelos or not self.colores or not self.herrajes:
+            raise ValueError("El catálogo necesita al menos un modelo, un color y un herraje")
+
+        # Validación: valores en el orden del catálogo y conjuntos para pertenencia
+        self.valores_colores: Tuple[str, ...] = tuple(opcion.valor for opcion in self.colores)
+        self.valores_herrajes: Tuple[str, ...] = tuple(opcion.valor for opcion in self.herrajes)
+        self.colores_validos: FrozenSet[str] = frozenset(self.valores_colores)
+        self.herrajes_validos: FrozenSet[str] = frozenset(self.valores_herrajes)
+
+        # Resolución de imágenes y muestras
+        self.modelo_por_defecto = self.modelos[0]
+        self._por_id: Mapping[str, Modelo] = MappingProxyType({modelo.id: modelo for modelo in self.modelos})
+        self._palabras_clave = tuple((palabra, modelo) for modelo in self.modelos for palabra in modelo.palabras_clave)
+        self._archivo_color = {o.valor: o.archivo for o in self.colores}
+        self._archivo_herrajes = {o.valor: o.archivo for o in self.herrajes}
+        self.imagenes: Mapping[Tuple[str, str, str], str] = MappingProxyType({
+            (modelo.id, color.valor, herraje.valor): f"/static/{modelo.id}_{color.archivo}_{herraje.archivo}.jpg"
+            for modelo in self.modelos for color in self.colores for herraje in self.herrajes
+        })
+        # Las mismas rutas anidadas por modelo -> color -> herrajes: cada nivel es
+        # una consulta por una cadena con el hash ya calculado, sin construir tuplas
+        self._rutas: Dict[str, Dict[str, Dict[str, str]]] = {}
+        for (id_modelo, color, herraje), ruta in self.imagenes.items():
+            self._rutas.setdefault(id_modelo, {}).setdefault(color, {})[herraje] = ruta
+        self._rutas_por_defecto = (self.modelo_por_defecto.id, self._rutas[self.modelo_por_defecto.id])
+        self._rutas_por_palabra = tuple((palabra, (modelo.id, self._rutas[modelo.id]))
+                                        for palabra, modelo in self._palabras_clave)
+
+        # Manifiesto para el navegador, serializado una sola vez
+        manifiesto = {
+            'modelos': [{'id': modelo.id, 'nombre': modelo.nombre, 'imagen': modelo.imagen,
+                         'palabras_clave': list(modelo.palabras_clave)} for modelo in self.modelos],
+            'colores': [{'valor': o.valor, 'nombre': o.nombre, 'muestra': o.muestra} for o in self.colores],
+            'herrajes': [{'valor': o.valor, 'nombre': o.nombre, 'muestra': o.muestra} for o in self.herrajes],
+            'imagenes': {'|'.join(clave): ruta for clave, ruta in self.imagenes.items()},
+        }
+        contenido = json.dumps(manifiesto, ensure_ascii=False, sort_keys=True)
+        self.version = hashlib.sha256(contenido.encode()).hexdigest()[:12]
+        self.manifiesto_json = json.dumps({'version': self.version, **manifiesto},
+                                          ensure_ascii=False, separators=(',', ':')).encode()
+
+    def modelo(self, id_modelo: str) -> Optional[Modelo]:
+        """Modelo por su identificador (None si no existe)"""
+        return self._por_id.get(id_modelo)
+
+    def modelo_de(self, producto: Optional[str]) -> Modelo:
+        """Modelo al que corresponde el nombre de producto de una personalización"""
+        if producto:
+            texto = producto.lower()
+            for palabra, modelo in self._palabras_clave:
+                if palabra in texto:
+                    return modelo
+        return self.modelo_por_defecto
+
+    def ruta_imagen(self, producto: Optional[str], color: str, herrajes: str) -> str:
+        """URL de la imagen de una variante (sin comprobar que el archivo exista)"""
+        # Igual que modelo_de(), pero en línea: se ejecuta en cada resolución de imagen
+        id_modelo, rutas = self._rutas_por_defecto
+        if producto:
+            texto = producto.lower()
+            for palabra, destino in self._rutas_por_palabra:
+                if palabra in texto:
+                    id_modelo, rutas = destino
+                    break
+        por_herrajes = rutas.get(color)
+        if por_herrajes is not None:
+            ruta = por_herrajes.get(herrajes)
+            if ruta is not None:
+                return ruta
+        # Valor fuera del catálogo: primer color / primer herraje
+        color_file = self._archivo_color.get(color, self.colores[0].archivo)
+        herrajes_file = self._archivo_herrajes.get(herrajes, self.herrajes[0].archivo)
+        return f"/static/{id_modelo}_{color_file}_{herrajes_file}.jpg"
+
+
+def cargar_catalogo(ruta: str) -> Catalogo:
+    """
+    Leer el catálogo desde un archivo JSON
+
+    Args:
+        ruta: Ruta del archivo de datos
+
+    Returns:
+        Catalogo: Catálogo congelado
+    """
+    with open(ruta, encoding='utf-8') as archivo:
+        return Catalogo(json.load(archivo), fecha=datetime.utcfromtimestamp(os.fstat(archivo.fileno()).st_mtime))
+
+
+# Catálogo del proceso: se construye al importar (con preload_app, en el maestro)
+CATALOGO = cargar_catalogo(Config.CATALOGO_PATH)
+
+
+def registrar_catalogo(app, catalogo: Catalogo = CATALOGO):
+    """
+    Exponer el catálogo a las plantillas y servir su manifiesto JSON versionado
+
+    Las plantillas reciben `catalogo`; `/catalogo.<version>.json` se sirve con
+    caché inmutable de un año. Una versión distinta de la actual (una página
+    cacheada de antes de un despliegue) recibe el catálogo actual sin caché.
+    """
+    app.jinja_env.globals['catalogo'] = catalogo
+
+    @app.route('/catalogo.<version>.json')
+    def catalogo_json(version):
+        """Manifiesto del catálogo para main.js"""
+        respuesta = Response(catalogo.manifiesto_json, mimetype='application/json')
+        respuesta.set_etag(catalogo.version)
+        if version == catalogo.version:
+            respuesta.cache_control.public = True
+            respuesta.cache_control.max_age = UN_ANO
+            respuesta.cache_control.immutable = True
+        else:
+            respuesta.cache_control.no_cache = True
+        return respuesta
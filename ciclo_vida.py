@@ -0,0 +1,116 @@
+"""
+Ciclo de vida de los workers de gunicorn para Teteu Cueros
+
+Con `preload_app = True` el maestro ejecuta `create_app` una sola vez y cada
+worker, también los que se reciclan por `max_requests`, es un fork suyo.
+Todo lo que el maestro prepare antes del fork llega gratis a los workers y
+sus páginas de memoria se comparten mientras nadie las escriba
+(copy-on-write):
+
+- `precalentar()` recorre en el maestro las páginas más pedidas (`/`, el
+  formulario de cada modelo y `/ver/<id>` de las personalizaciones más
+  recientes): caché de páginas, caché de lectura e índice de imágenes
+  quedan llenos antes del primer fork.
+- `antes_de_fork()` (hook `pre_fork`) cierra la conexión SQLite del maestro,
+  detiene su hilo de barrido (ningún hilo suyo tiene un cerrojo tomado
+  durante el fork) y congela el heap con `gc.freeze()`: el recolector del
+  worker no recorre esos objetos ni escribe en sus cabeceras, así que sus
+  páginas no se copian.
+- `despues_de_fork()` (hook `post_fork`) deja el recolector activo en el
+  worker (el maestro ya lo reactivó en `when_ready`, al terminar de cargar).
+
+Las conexiones SQLite por hilo, el write-behind, el barrido y las métricas
+ya se reabren solos en el worker (`os.register_at_fork` y conexiones
+asociadas al PID).
+"""
+
+import gc
+import logging
+import time
+from typing import Dict, Optional
+
+from flask import url_for
+
+from catalogo import CATALOGO
+
+# Clave del entorno WSGI que marca las peticiones internas del precalentamiento
+# (no cuentan en /metrics ni en el registro de peticiones lentas)
+PRECALENTAMIENTO = 'teteu_cueros.precalentamiento'
+
+
+class CicloVida:
+    """Precalentamiento y preparación del proceso para el fork de gunicorn"""
+
+    def __init__(self, app, manager):
+        """
+        Args:
+            app: Aplicación Flask ya configurada, con sus rutas
+            manager: `PersonalizacionManager` de la aplicación
+        """
+        self.app = app
+        self.manager = manager
+        self.db = getattr(manager.store, 'db', None)
+
+    def precalentar(self, recientes: int = 100) -> Dict[str, float]:
+        """
+        Servir internamente las páginas más probables para llenar las cachés
+
+        Args:
+            recientes: Personalizaciones más recientes cuyo `/ver/<id>` se visita
+
+        Returns:
+            Dict: Páginas visitadas y milisegundos empleados
+        """
+        logger = logging.getLogger(__name__)
+        inicio = time.perf_counter()
+
+        with self.app.test_request_context():
+            urls = [url_for('pagina_principal'), url_for('formulario')]
+            urls += [url_for('formulario', modelo=modelo.nombre) for modelo in CATALOGO.modelos]
+            if recientes > 0:
+                urls += [url_for('ver_personalizacion', id=personalizacion.id)
+                         for personalizacion in self.manager.listar_pagina(recientes)]
+
+        cliente = self.app.test_client()
+        errores = 0
+        for url in urls:
+            try:
+                if cliente.get(url, environ_base={PRECALENTAMIENTO: True}).status_code >= 500:
+                    errores += 1
+            except Exception as e:
+                errores += 1
+                logger.warning(f"Precalentamiento de {url}: {str(e)}")
+
+        milisegundos = (time.perf_counter() - inicio) * 1000
+        logger.info(f"Precalentamiento: {len(urls)} páginas en {milisegundos:.0f} ms"
+                    + (f" ({errores} con error)" if errores else ""))
+        return {'paginas': len(urls), 'errores': errores, 'ms': milisegundos}
+
+    def antes_de_fork(self, congelar: bool = True):
+        """Preparar el maestro para hacer fork (se repite antes de cada worker)"""
+        self.manager.pausar_barrido()
+        if self.db is not None:
+            self.db.vaciar_cola()
+            self.db.cerrar()
+        if congelar:
+            gc.freeze()
+
+    def despues_de_fork(self):
+        """Preparar el worker recién creado, antes de que acepte conexiones"""
+        gc.enable()
+
+
+def registrar_ciclo_vida(app, manager) -> CicloVida:
+    """
+    Crear el `CicloVida` de la aplicación y dejarlo en `app.extensions['ciclo_vida']`
+
+    `gunicorn.conf.py` lo recupera desde sus hooks `pre_fork` y `post_fork`.
+    """
+    ciclo = CicloVida(app, manager)
+    app.extensions['ciclo_vida'] = ciclo
+    return ciclo
+
+
+def ciclo_vida_de(app) -> Optional[CicloVida]:
+    """`CicloVida` registrado en una aplicación (None si no lo tiene)"""
+    return getattr(app, 'extensions', {}).get('ciclo_vida')
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from datetime import timedelta
 
 class Config:
@@ -12,15 +13,90 @@ class Config:
     DEBUG = os.environ.get('FLASK_DEBUG', 'True').lower() == 'true'
     
     # Configuración de personalizaciones
-    MAX_PERSONALIZACIONES = 1000
+    MAX_PERSONALIZACIONES = int(os.environ.get('MAX_PERSONALIZACIONES', 1000))  # Por worker (backend 'memory')
+    # Al llenarse: 'antiguas' (desaloja la más antigua), 'lru' (la menos vista) o 'rechazar' (503)
+    PERSONALIZACION_EVICTION_POLICY = os.environ.get('PERSONALIZACION_EVICTION_POLICY', 'antiguas')
     PERSONALIZACION_EXPIRY = timedelta(days=30)  # Las personalizaciones expiran en 30 días
     
-    # Opciones de personalización
-    COLORES_DISPONIBLES = ['negro', 'marron', 'marron claro']
-    HERRAJES_DISPONIBLES = ['plata', 'dorado']
+    # Generador de IDs de nuevas personalizaciones: 'ulid' (base62 ordenado por tiempo) o 'uuid4'
+    ID_GENERATOR = os.environ.get('ID_GENERATOR', 'ulid')
+    
+    # Barrido en segundo plano de personalizaciones expiradas (segundos; 0 lo desactiva)
+    PERSONALIZACION_SWEEP_INTERVAL = int(os.environ.get('PERSONALIZACION_SWEEP_INTERVAL', 300))
+    
+    # Caché de lectura de personalizaciones (0 la desactiva). El TTL nunca supera
+    # PERSONALIZACION_EXPIRY y acota cuánto tarda un worker en ver una baja hecha en otro
+    PERSONALIZACION_CACHE_SIZE = int(os.environ.get('PERSONALIZACION_CACHE_SIZE', 10000))
+    PERSONALIZACION_CACHE_TTL = min(
+        timedelta(seconds=int(os.environ.get('PERSONALIZACION_CACHE_TTL', 300))),
+        PERSONALIZACION_EXPIRY
+    )
+    
+    # Configuración de almacenamiento ('memory', 'columnar' compacto o 'sqlite', compartido entre workers)
+    STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'memory')
+    DATABASE_PATH = os.environ.get('DATABASE_PATH', 'tetey_cueros.db')
+    DB_POOL = os.environ.get('DB_POOL', 'True').lower() == 'true'  # Una conexión por hilo/worker
+    DB_SYNCHRONOUS = os.environ.get('DB_SYNCHRONOUS', 'NORMAL')  # OFF, NORMAL, FULL o EXTRA
+    DB_MMAP_SIZE = int(os.environ.get('DB_MMAP_SIZE', 64 * 1024 * 1024))
+    DB_CACHE_SIZE = int(os.environ.get('DB_CACHE_SIZE', -8000))  # Negativo = KiB
+    
+    # Write-behind: agrupar inserciones en una transacción cada N ms o M filas
+    DB_WRITE_BEHIND = os.environ.get('DB_WRITE_BEHIND', 'False').lower() == 'true'
+    DB_WRITE_BEHIND_INTERVALO_MS = int(os.environ.get('DB_WRITE_BEHIND_INTERVALO_MS', 5))
+    DB_WRITE_BEHIND_MAX_FILAS = int(os.environ.get('DB_WRITE_BEHIND_MAX_FILAS', 200))
+    DB_WRITE_BEHIND_DURABILIDAD = os.environ.get('DB_WRITE_BEHIND_DURABILIDAD', 'grupo')  # 'grupo' o 'asincrona'
+    
+    # Personalizaciones por página del panel de administración
+    ADMIN_PAGE_SIZE = int(os.environ.get('ADMIN_PAGE_SIZE', 50))
+    
+    # Máximo de elementos por petición a POST /api/personalizaciones
+    MAX_LOTE_PERSONALIZACIONES = int(os.environ.get('MAX_LOTE_PERSONALIZACIONES', 500))
+    
+    # Modelos, colores y herrajes disponibles (ver catalogo.py)
+    CATALOGO_PATH = os.environ.get('CATALOGO_PATH') or os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                                    'catalogo.json')
+    
+    # Cabeceras de caché HTTP de /ver/<id> (ETag/Last-Modified siempre se envían).
+    # s-maxage deja que un proxy_cache de nginx absorba las lecturas repetidas
+    VER_CACHE_CONTROL = os.environ.get('VER_CACHE_CONTROL', 'public, max-age=60, s-maxage=300')
+    VER_VARY = os.environ.get('VER_VARY', 'Accept-Encoding')
+    
+    # Plantillas: caché de bytecode en disco y compilación al arrancar. Sin definir, Jinja usa
+    # su directorio privado por usuario; '' la desactiva; una ruta propia debe ser 0700
+    JINJA_BYTECODE_CACHE_DIR = os.environ.get('JINJA_BYTECODE_CACHE_DIR')
+    JINJA_WARMUP = os.environ.get('JINJA_WARMUP', 'True').lower() == 'true'
+    
+    # Servir al arrancar /, los formularios y /ver/<id> de las N personalizaciones más
+    # recientes (con preload_app, en el maestro: los workers heredan las cachés llenas)
+    PRECALENTAR = os.environ.get('PRECALENTAR', 'True').lower() == 'true'
+    PRECALENTAR_RECIENTES = int(os.environ.get('PRECALENTAR_RECIENTES', 100))
+    
+    # Páginas renderizadas distintas a cachear por worker (0 desactiva la caché)
+    PAGE_CACHE_SIZE = int(os.environ.get('PAGE_CACHE_SIZE', 256))
+    
+    # Hilos por proceso que ejecutan las vistas bajo ASGI (asgi.py); las conexiones
+    # inactivas y los clientes lentos los atiende el bucle de eventos sin ocupar ninguno
+    ASGI_THREADS = int(os.environ.get('ASGI_THREADS', 32))
     
     # Configuración de archivos estáticos
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB máximo para archivos
+    # Segundos entre comprobaciones de cambios en static/ para el índice de imágenes (0 = nunca)
+    IMAGENES_POLL_INTERVAL = float(os.environ.get('IMAGENES_POLL_INTERVAL', 2))
+    # Servir static/ con nombres con hash y Cache-Control inmutable (las huellas se calculan al arrancar)
+    ASSETS_FINGERPRINT = os.environ.get('ASSETS_FINGERPRINT', 'False').lower() == 'true'
+    
+    # Métricas de Prometheus en /metrics; los workers las comparten a través de archivos
+    # en METRICS_DIR ('' = solo las del worker que responde). Sin METRICS_TOKEN solo
+    # responden a peticiones desde la propia máquina; con él, exigen `Authorization: Bearer`
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'True').lower() == 'true'
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN') or None
+    METRICS_DIR = os.environ.get('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'teteu-cueros-metricas'))
+    
+    # Perfilado opcional: fracción de peticiones a perfilar con cProfile (0 = ninguna),
+    # dónde guardar los .prof y umbral del registro de peticiones lentas (ms; 0 = desactivado)
+    PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+    PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'teteu-cueros-perfiles'))
+    SLOW_REQUEST_MS = float(os.environ.get('SLOW_REQUEST_MS', 0))
     
     # Configuración de logging
     LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
@@ -38,6 +114,10 @@ class ProductionConfig(Config):
     """Configuración para producción"""
     DEBUG = False
     SECRET_KEY = os.environ.get('SECRET_KEY')
+    STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'sqlite')
+    IMAGENES_POLL_INTERVAL = float(os.environ.get('IMAGENES_POLL_INTERVAL', 0))
+    ASSETS_FINGERPRINT = os.environ.get('ASSETS_FINGERPRINT', 'True').lower() == 'true'
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'False').lower() == 'true'
     
     def __init__(self):
         super().__init__()
@@ -4,20 +4,157 @@ Configuración de base de datos para Tetey Cueros
 
 import sqlite3
 import json
+import threading
+import time
+import atexit
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Optional, List, Dict, Any
+from typing import Callable, Optional, List, Dict, Any, Iterable, Iterator, Tuple
 import os
 
+SYNCHRONOUS_VALIDOS = ('OFF', 'NORMAL', 'FULL', 'EXTRA')
+DURABILIDADES_VALIDAS = ('grupo', 'asincrona')
+# Las estadísticas por producto solo distinguen los productos del catálogo: el
+# nombre llega del cliente y el resto se cuenta junto, en una sola fila
+OTROS_PRODUCTOS = 'otros'
+
+
+def _producto_estadisticas(columna: str) -> str:
+    """Expresión SQL con el valor de `columna` que cuentan las estadísticas por producto"""
+    return (f"CASE WHEN {columna} IN (SELECT valor FROM estadisticas_productos) "
+            f"THEN {columna} ELSE '{OTROS_PRODUCTOS}' END")
+
+class _Lote:
+    """Grupo de inserciones que se confirman en la misma transacción"""
+    
+    def __init__(self):
+        self.filas: List[tuple] = []
+        self.confirmado = threading.Event()
+        # Resultado de cada fila, en el mismo orden que `filas` (False hasta confirmarla)
+        self.resultados: List[bool] = []
+
 class DatabaseManager:
     """Gestor de base de datos SQLite"""
     
-    def __init__(self, db_path: str = "tetey_cueros.db"):
+    def __init__(self, db_path: str = "tetey_cueros.db", pool: bool = True,
+                 synchronous: str = 'NORMAL', mmap_size: int = 64 * 1024 * 1024,
+                 cache_size: int = -8000, cached_statements: int = 128,
+                 write_behind: bool = False, write_behind_intervalo_ms: int = 5,
+                 write_behind_max_filas: int = 200, write_behind_durabilidad: str = 'grupo',
+                 productos: Optional[Iterable[str]] = None):
+        """
+        Args:
+            db_path: Ruta del archivo SQLite
+            pool: Reutilizar una conexión por hilo y proceso en lugar de abrir una por operación
+            synchronous: Nivel de PRAGMA synchronous (OFF, NORMAL, FULL, EXTRA)
+            mmap_size: Bytes a mapear en memoria (PRAGMA mmap_size)
+            cache_size: Caché de páginas (PRAGMA cache_size; negativo = KiB)
+            cached_statements: Sentencias preparadas a cachear por conexión
+            write_behind: Agrupar las inserciones en transacciones por lotes
+            write_behind_intervalo_ms: Espera máxima antes de confirmar un lote
+            write_behind_max_filas: Filas que fuerzan la confirmación inmediata del lote
+            write_behind_durabilidad: 'grupo' (crear espera al commit de su lote) o
+                'asincrona' (crear retorna al encolar; un fallo del proceso puede
+                perder el último lote)
+            productos: Productos con fila propia en las estadísticas (None = los
+                modelos del catálogo); los demás se cuentan como `OTROS_PRODUCTOS`
+        """
+        synchronous = synchronous.upper()
+        if synchronous not in SYNCHRONOUS_VALIDOS:
+            raise ValueError(f"Nivel synchronous inválido: {synchronous}")
+        if write_behind_durabilidad not in DURABILIDADES_VALIDAS:
+            raise ValueError(f"Durabilidad de write-behind inválida: {write_behind_durabilidad}")
+        
         self.db_path = db_path
+        self.pool = pool
+        self.synchronous = synchronous
+        self.mmap_size = mmap_size
+        self.cache_size = cache_size
+        self.cached_statements = cached_statements
+        if productos is None:
+            from catalogo import CATALOGO
+            productos = (modelo.nombre for modelo in CATALOGO.modelos)
+        self.productos = frozenset(productos)
+        self._local = threading.local()
+        # Callback con los segundos de cada operación (métricas de tiempo de DB por petición)
+        self.al_medir: Optional[Callable[[float], None]] = None
+        
+        self.write_behind = write_behind
+        self.write_behind_intervalo = write_behind_intervalo_ms / 1000
+        self.write_behind_max_filas = write_behind_max_filas
+        self.write_behind_durabilidad = write_behind_durabilidad
+        self._reiniciar_write_behind()
+        if write_behind:
+            # El hilo escritor no sobrevive al fork: cada worker arranca el suyo
+            os.register_at_fork(after_in_child=self._reiniciar_write_behind)
+            atexit.register(self.vaciar_cola)
+        
         self.init_database()
     
+    def _abrir_conexion(self) -> sqlite3.Connection:
+        """Abrir una conexión nueva con los PRAGMA de rendimiento aplicados"""
+        conn = sqlite3.connect(self.db_path, cached_statements=self.cached_statements)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(f'PRAGMA synchronous={self.synchronous}')
+        conn.execute(f'PRAGMA mmap_size={int(self.mmap_size)}')
+        conn.execute(f'PRAGMA cache_size={int(self.cache_size)}')
+        return conn
+    
+    @contextmanager
+    def _conexion(self):
+        """Obtener una conexión dentro de una transacción, midiendo su duración si hay `al_medir`"""
+        if self.al_medir is None:
+            with self._conexion_sin_medir() as conn:
+                yield conn
+            return
+        
+        inicio = time.perf_counter()
+        try:
+            with self._conexion_sin_medir() as conn:
+                yield conn
+        finally:
+            self.al_medir(time.perf_counter() - inicio)
+    
+    @contextmanager
+    def _conexion_sin_medir(self):
+        """
+        Obtener una conexión dentro de una transacción
+        
+        Con pool activo, cada hilo reutiliza su propia conexión. La conexión
+        se asocia al PID que la abrió: tras un fork (gunicorn con
+        `preload_app = True`) el worker hijo abre la suya y nunca usa la
+        heredada del proceso maestro.
+        """
+        if not self.pool:
+            conn = self._abrir_conexion()
+            try:
+                with conn:
+                    yield conn
+            finally:
+                conn.close()
+            return
+        
+        pid = os.getpid()
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != pid:
+            conn = self._abrir_conexion()
+            self._local.conn = conn
+            self._local.pid = pid
+        
+        conn.row_factory = None
+        with conn:
+            yield conn
+    
+    def cerrar(self):
+        """Cerrar la conexión del hilo actual (si pertenece a este proceso)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            conn.close()
+        self._local.conn = None
+    
     def init_database(self):
         """Inicializar la base de datos y crear tablas"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._conexion() as conn:
             cursor = conn.cursor()
             
             # Crear tabla de personalizaciones
@@ -35,28 +172,278 @@ class DatabaseManager:
             # Crear índices para mejor rendimiento
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_fecha_creacion ON personalizaciones(fecha_creacion)')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_activa ON personalizaciones(activa)')
+            # Índice de expiración y de paginación por cursor (fecha_creacion, id): el barrido
+            # solo recorre las filas activas ya vencidas y cada página es un rango del índice
+            cursor.execute('DROP INDEX IF EXISTS idx_activa_fecha')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_activa_fecha_id ON personalizaciones(activa, fecha_creacion, id)')
             
             conn.commit()
+            self._inicializar_estadisticas(conn)
     
-    def crear_personalizacion(self, id_personalizacion: str, producto: str, color: str, herrajes: str) -> bool:
+    # Contadores mantenidos por triggers en la misma transacción que cada alta o baja
+    _TRIGGERS_ESTADISTICAS = {
+        'trg_estadisticas_alta': f'''
+            AFTER INSERT ON personalizaciones WHEN NEW.activa = 1
+            BEGIN
+                INSERT INTO estadisticas (dimension, valor, cantidad)
+                VALUES ('total', '', 1), ('color', NEW.color, 1), ('herrajes', NEW.herrajes, 1),
+                       ('producto', {_producto_estadisticas('NEW.producto')}, 1)
+                ON CONFLICT (dimension, valor) DO UPDATE SET cantidad = cantidad + 1;
+                INSERT INTO estadisticas_diarias (dia, creadas) VALUES (date(NEW.fecha_creacion), 1)
+                ON CONFLICT (dia) DO UPDATE SET creadas = creadas + 1;
+            END
+        ''',
+        'trg_estadisticas_baja': f'''
+            AFTER UPDATE OF activa ON personalizaciones WHEN OLD.activa = 1 AND NEW.activa = 0
+            BEGIN
+                UPDATE estadisticas SET cantidad = cantidad - 1
+                WHERE (dimension, valor) IN (VALUES ('total', ''), ('color', OLD.color),
+                                                    ('herrajes', OLD.herrajes),
+                                                    ('producto', {_producto_estadisticas('OLD.producto')}));
+                INSERT INTO estadisticas_diarias (dia, desactivadas) VALUES (date('now'), 1)
+                ON CONFLICT (dia) DO UPDATE SET desactivadas = desactivadas + 1;
+            END
+        ''',
+        'trg_estadisticas_reactivacion': f'''
+            AFTER UPDATE OF activa ON personalizaciones WHEN OLD.activa = 0 AND NEW.activa = 1
+            BEGIN
+                INSERT INTO estadisticas (dimension, valor, cantidad)
+                VALUES ('total', '', 1), ('color', NEW.color, 1), ('herrajes', NEW.herrajes, 1),
+                       ('producto', {_producto_estadisticas('NEW.producto')}, 1)
+                ON CONFLICT (dimension, valor) DO UPDATE SET cantidad = cantidad + 1;
+            END
+        ''',
+        'trg_estadisticas_borrado': f'''
+            AFTER DELETE ON personalizaciones WHEN OLD.activa = 1
+            BEGIN
+                UPDATE estadisticas SET cantidad = cantidad - 1
+                WHERE (dimension, valor) IN (VALUES ('total', ''), ('color', OLD.color),
+                                                    ('herrajes', OLD.herrajes),
+                                                    ('producto', {_producto_estadisticas('OLD.producto')}));
+            END
+        ''',
+    }
+    
+    def _inicializar_estadisticas(self, conn: sqlite3.Connection):
+        """Crear las tablas y triggers de estadísticas y, la primera vez, calcularlas desde cero"""
+        cursor = conn.cursor()
+        # Transacción exclusiva: si varios workers arrancan a la vez, solo uno reconstruye
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS estadisticas (
+                    dimension TEXT NOT NULL,
+                    valor TEXT NOT NULL,
+                    cantidad INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (dimension, valor)
+                )
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS estadisticas_diarias (
+                    dia TEXT PRIMARY KEY,
+                    creadas INTEGER NOT NULL DEFAULT 0,
+                    desactivadas INTEGER NOT NULL DEFAULT 0
+                )
+            ''')
+            # Productos con fila propia: si cambian, los contadores se recalculan
+            cursor.execute('CREATE TABLE IF NOT EXISTS estadisticas_productos (valor TEXT PRIMARY KEY)')
+            cursor.execute('SELECT valor FROM estadisticas_productos')
+            reconstruir = {fila[0] for fila in cursor.fetchall()} != self.productos
+            if reconstruir:
+                cursor.execute('DELETE FROM estadisticas_productos')
+                cursor.executemany('INSERT INTO estadisticas_productos (valor) VALUES (?)',
+                                   [(producto,) for producto in self.productos])
+
+            # Los triggers que faltan o cuya definición cambió se vuelven a crear
+            cursor.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'trg_estadisticas_%'")
+            existentes = dict(cursor.fetchall())
+            for nombre, cuerpo in self._TRIGGERS_ESTADISTICAS.items():
+                # SQLite guarda la sentencia sin el espacio final
+                sql = f'CREATE TRIGGER {nombre} {cuerpo}'.rstrip()
+                if existentes.get(nombre) != sql:
+                    if nombre in existentes:
+                        cursor.execute(f'DROP TRIGGER {nombre}')
+                    cursor.execute(sql)
+                    reconstruir = True
+            if reconstruir:
+                self._reconstruir_estadisticas(cursor)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    
+    def _reconstruir_estadisticas(self, cursor: sqlite3.Cursor):
+        """Recalcular los contadores con un recorrido completo (solo al crearlos o repararlos)"""
+        cursor.execute('DELETE FROM estadisticas')
+        cursor.execute(f'''
+            INSERT INTO estadisticas (dimension, valor, cantidad)
+            SELECT 'total', '', COUNT(*) FROM personalizaciones WHERE activa = 1
+            UNION ALL SELECT 'color', color, COUNT(*) FROM personalizaciones WHERE activa = 1 GROUP BY color
+            UNION ALL SELECT 'herrajes', herrajes, COUNT(*) FROM personalizaciones WHERE activa = 1 GROUP BY herrajes
+            UNION ALL SELECT 'producto', {_producto_estadisticas('producto')}, COUNT(*)
+                      FROM personalizaciones WHERE activa = 1 GROUP BY 2
+        ''')
+        # Las bajas anteriores no tienen fecha: la serie histórica solo recupera las altas
+        cursor.execute('DELETE FROM estadisticas_diarias')
+        cursor.execute('''
+            INSERT INTO estadisticas_diarias (dia, creadas)
+            SELECT date(fecha_creacion), COUNT(*) FROM personalizaciones GROUP BY date(fecha_creacion)
+        ''')
+    
+    def reconstruir_estadisticas(self):
+        """Recalcular todos los contadores desde la tabla de personalizaciones"""
+        with self._conexion() as conn:
+            self._reconstruir_estadisticas(conn.cursor())
+    
+    def _reiniciar_write_behind(self):
+        """Reiniciar el estado de la cola de escritura (al crear el gestor y tras un fork)"""
+        self._cond = threading.Condition()
+        self._lote = _Lote()
+        self._pendientes: Dict[str, tuple] = {}  # id -> (fila, lote)
+        self._escritor: Optional[threading.Thread] = None
+    
+    def _encolar(self, fila: tuple) -> bool:
+        """Añadir una inserción al lote en curso"""
+        with self._cond:
+            if self._escritor is None:
+                self._escritor = threading.Thread(target=self._bucle_escritor,
+                                                  name='db-write-behind', daemon=True)
+                self._escritor.start()
+            
+            lote = self._lote
+            indice = len(lote.filas)
+            lote.filas.append(fila)
+            lote.resultados.append(False)
+            self._pendientes[fila[0]] = (fila, lote)
+            if len(lote.filas) == 1 or len(lote.filas) >= self.write_behind_max_filas:
+                self._cond.notify()
+        
+        if self.write_behind_durabilidad == 'asincrona':
+            return True
+        inicio = time.perf_counter()
+        lote.confirmado.wait()
+        if self.al_medir is not None:
+            self.al_medir(time.perf_counter() - inicio)
+        return lote.resultados[indice]
+    
+    def _bucle_escritor(self):
+        """Hilo escritor: confirma cada lote tras N ms o al llegar a M filas"""
+        while True:
+            with self._cond:
+                while not self._lote.filas:
+                    self._cond.wait()
+                if len(self._lote.filas) < self.write_behind_max_filas:
+                    self._cond.wait(self.write_behind_intervalo)
+                lote = self._lote
+                self._lote = _Lote()
+            
+            self._confirmar_lote(lote)
+    
+    def _confirmar_lote(self, lote: _Lote):
+        """Insertar un lote en una única transacción"""
+        try:
+            self._insertar_filas(lote.filas)
+            lote.resultados = [True] * len(lote.filas)
+        except sqlite3.IntegrityError:
+            # Una fila conflictiva no debe tumbar al resto del lote, pero solo
+            # quien la encoló recibe False (su enlace no existiría)
+            for indice, fila in enumerate(lote.filas):
+                try:
+                    self._insertar_filas([fila])
+                    lote.resultados[indice] = True
+                except Exception as e:
+                    print(f"Error al crear personalización: {e}")
+        except Exception as e:
+            print(f"Error al confirmar lote de personalizaciones: {e}")
+        finally:
+            with self._cond:
+                for fila in lote.filas:
+                    self._pendientes.pop(fila[0], None)
+            lote.confirmado.set()
+    
+    def _insertar_filas(self, filas: List[tuple]):
+        """Insertar filas (id, producto, color, herrajes, fecha) en una transacción"""
+        with self._conexion() as conn:
+            conn.executemany('''
+                INSERT INTO personalizaciones (id, producto, color, herrajes, fecha_creacion)
+                VALUES (?, ?, ?, ?, ?)
+            ''', filas)
+    
+    def vaciar_cola(self):
+        """Confirmar de inmediato las inserciones pendientes del write-behind"""
+        with self._cond:
+            lote = self._lote
+            self._lote = _Lote()
+        if lote.filas:
+            self._confirmar_lote(lote)
+    
+    def _esperar_pendiente(self, id_personalizacion: str):
+        """Asegurar que una inserción encolada esté confirmada antes de modificarla"""
+        pendiente = self._pendientes.get(id_personalizacion)
+        if pendiente is not None:
+            self.vaciar_cola()
+            pendiente[1].confirmado.wait()
+    
+    def crear_personalizacion(self, id_personalizacion: str, producto: str, color: str, herrajes: str,
+                              fecha_creacion: Optional[datetime] = None) -> bool:
         """Crear una nueva personalización"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            fecha = (fecha_creacion or datetime.utcnow()).isoformat(sep=' ')
+            if self.write_behind:
+                return self._encolar((id_personalizacion, producto, color, herrajes, fecha))
+            
+            with self._conexion() as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
-                    INSERT INTO personalizaciones (id, producto, color, herrajes)
-                    VALUES (?, ?, ?, ?)
-                ''', (id_personalizacion, producto, color, herrajes))
+                    INSERT INTO personalizaciones (id, producto, color, herrajes, fecha_creacion)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (id_personalizacion, producto, color, herrajes, fecha))
                 conn.commit()
                 return True
         except Exception as e:
             print(f"Error al crear personalización: {e}")
             return False
     
+    def crear_personalizaciones(self, filas: List[tuple]) -> List[bool]:
+        """
+        Crear varias personalizaciones en una única transacción (executemany)
+        
+        Args:
+            filas: Tuplas (id, producto, color, herrajes, fecha_creacion)
+            
+        Returns:
+            List[bool]: Si cada fila quedó guardada, en el mismo orden
+        """
+        filas = [(id_personalizacion, producto, color, herrajes, (fecha or datetime.utcnow()).isoformat(sep=' '))
+                 for id_personalizacion, producto, color, herrajes, fecha in filas]
+        try:
+            self._insertar_filas(filas)
+            return [True] * len(filas)
+        except sqlite3.IntegrityError:
+            # Una fila conflictiva no debe tumbar al resto del lote
+            guardadas = []
+            for fila in filas:
+                try:
+                    self._insertar_filas([fila])
+                    guardadas.append(True)
+                except Exception as e:
+                    print(f"Error al crear personalización: {e}")
+                    guardadas.append(False)
+            return guardadas
+        except Exception as e:
+            print(f"Error al crear lote de personalizaciones: {e}")
+            return [False] * len(filas)
+    
     def obtener_personalizacion(self, id_personalizacion: str) -> Optional[Dict[str, Any]]:
         """Obtener una personalización por ID"""
+        pendiente = self._pendientes.get(id_personalizacion)
+        if pendiente is not None:
+            # Aún en la cola de write-behind: visible de inmediato en este worker
+            fila = pendiente[0]
+            return dict(zip(('id', 'producto', 'color', 'herrajes', 'fecha_creacion'), fila), activa=1)
+        
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._conexion() as conn:
                 conn.row_factory = sqlite3.Row
                 cursor = conn.cursor()
                 cursor.execute('''
@@ -75,7 +462,7 @@ class DatabaseManager:
     def listar_personalizaciones(self, limite: int = 100) -> List[Dict[str, Any]]:
         """Listar personalizaciones activas"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._conexion() as conn:
                 conn.row_factory = sqlite3.Row
                 cursor = conn.cursor()
                 cursor.execute('''
@@ -90,10 +477,67 @@ class DatabaseManager:
             print(f"Error al listar personalizaciones: {e}")
             return []
     
+    def listar_pagina(self, limite: int, despues: Optional[Tuple[datetime, str]] = None) -> List[Dict[str, Any]]:
+        """
+        Página de personalizaciones activas, de la más reciente a la más antigua
+        
+        Paginación por cursor: en lugar de OFFSET se continúa tras la última
+        fila de la página anterior, así que cada página cuesta lo mismo.
+        
+        Args:
+            limite: Filas por página
+            despues: (fecha_creacion, id) de la última fila ya mostrada
+        """
+        try:
+            with self._conexion() as conn:
+                cursor = conn.cursor()
+                cursor.row_factory = sqlite3.Row
+                if despues is None:
+                    cursor.execute('''
+                        SELECT * FROM personalizaciones
+                        WHERE activa = 1
+                        ORDER BY fecha_creacion DESC, id DESC
+                        LIMIT ?
+                    ''', (limite,))
+                else:
+                    cursor.execute('''
+                        SELECT * FROM personalizaciones
+                        WHERE activa = 1 AND (fecha_creacion, id) < (?, ?)
+                        ORDER BY fecha_creacion DESC, id DESC
+                        LIMIT ?
+                    ''', (despues[0].isoformat(sep=' '), despues[1], limite))
+                return [dict(row) for row in cursor.fetchall()]
+        except Exception as e:
+            print(f"Error al listar personalizaciones: {e}")
+            return []
+    
+    def iterar_personalizaciones(self, tamano_lote: int = 500) -> Iterator[Dict[str, Any]]:
+        """
+        Recorrer todas las personalizaciones activas sin cargarlas en memoria
+        
+        Las filas se leen del cursor de `tamano_lote` en `tamano_lote`; la
+        conexión queda ocupada hasta agotar o cerrar el generador.
+        """
+        with self._conexion() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = sqlite3.Row
+            cursor.execute('''
+                SELECT * FROM personalizaciones
+                WHERE activa = 1
+                ORDER BY fecha_creacion DESC, id DESC
+            ''')
+            while True:
+                filas = cursor.fetchmany(tamano_lote)
+                if not filas:
+                    break
+                for fila in filas:
+                    yield dict(fila)
+    
     def eliminar_personalizacion(self, id_personalizacion: str) -> bool:
         """Eliminar una personalización (marcar como inactiva)"""
+        self._esperar_pendiente(id_personalizacion)
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._conexion() as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
                     UPDATE personalizaciones 
@@ -109,12 +553,12 @@ class DatabaseManager:
     def limpiar_personalizaciones_expiradas(self, dias_expiracion: int = 30) -> int:
         """Limpiar personalizaciones expiradas"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._conexion() as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
                     UPDATE personalizaciones 
                     SET activa = 0 
-                    WHERE fecha_creacion < datetime('now', '-{} days')
+                    WHERE activa = 1 AND fecha_creacion < datetime('now', '-{} days')
                 '''.format(dias_expiracion))
                 conn.commit()
                 return cursor.rowcount
@@ -122,39 +566,71 @@ class DatabaseManager:
             print(f"Error al limpiar personalizaciones: {e}")
             return 0
     
-    def obtener_estadisticas(self) -> Dict[str, Any]:
-        """Obtener estadísticas de la base de datos"""
+    def desactivar_expiradas(self, fecha_limite: datetime) -> List[str]:
+        """
+        Desactivar las personalizaciones creadas antes de `fecha_limite`
+        
+        Returns:
+            List[str]: IDs desactivados (para invalidar cachés)
+        """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._conexion() as conn:
                 cursor = conn.cursor()
-                
-                # Total de personalizaciones
-                cursor.execute('SELECT COUNT(*) FROM personalizaciones WHERE activa = 1')
-                total_activas = cursor.fetchone()[0]
-                
-                # Personalizaciones por color
-                cursor.execute('''
-                    SELECT color, COUNT(*) as cantidad 
-                    FROM personalizaciones 
-                    WHERE activa = 1 
-                    GROUP BY color
-                ''')
-                por_color = dict(cursor.fetchall())
-                
-                # Personalizaciones por herrajes
                 cursor.execute('''
-                    SELECT herrajes, COUNT(*) as cantidad 
-                    FROM personalizaciones 
-                    WHERE activa = 1 
-                    GROUP BY herrajes
-                ''')
-                por_herrajes = dict(cursor.fetchall())
+                    SELECT id FROM personalizaciones 
+                    WHERE activa = 1 AND fecha_creacion < ?
+                ''', (fecha_limite.isoformat(sep=' '),))
+                ids = [fila[0] for fila in cursor.fetchall()]
+                cursor.executemany('''
+                    UPDATE personalizaciones 
+                    SET activa = 0 
+                    WHERE id = ?
+                ''', [(id_personalizacion,) for id_personalizacion in ids])
+                return ids
+        except Exception as e:
+            print(f"Error al limpiar personalizaciones: {e}")
+            return []
+    
+    def obtener_estadisticas(self) -> Dict[str, Any]:
+        """
+        Obtener estadísticas de la base de datos
+        
+        Se leen de los contadores que mantienen los triggers: el coste no
+        depende del número de personalizaciones.
+        """
+        try:
+            with self._conexion() as conn:
+                cursor = conn.cursor()
+                cursor.execute('SELECT dimension, valor, cantidad FROM estadisticas WHERE cantidad > 0')
                 
-                return {
-                    'total_activas': total_activas,
-                    'por_color': por_color,
-                    'por_herrajes': por_herrajes
-                }
+                estadisticas = {'total_activas': 0, 'por_color': {}, 'por_herrajes': {}, 'por_producto': {}}
+                for dimension, valor, cantidad in cursor.fetchall():
+                    if dimension == 'total':
+                        estadisticas['total_activas'] = cantidad
+                    else:
+                        estadisticas[f'por_{dimension}'][valor] = cantidad
+                return estadisticas
         except Exception as e:
             print(f"Error al obtener estadísticas: {e}")
             return {}
+    
+    def obtener_serie_diaria(self, dias: int = 30) -> List[Dict[str, Any]]:
+        """
+        Altas y bajas por día de los últimos `dias` días (UTC)
+        
+        Returns:
+            List[Dict]: {'dia', 'creadas', 'desactivadas'} en orden cronológico (sin los días vacíos)
+        """
+        try:
+            with self._conexion() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT dia, creadas, desactivadas FROM estadisticas_diarias
+                    WHERE dia > date('now', ?)
+                    ORDER BY dia
+                ''', (f'-{int(dias)} days',))
+                return [{'dia': dia, 'creadas': creadas, 'desactivadas': desactivadas}
+                        for dia, creadas, desactivadas in cursor.fetchall()]
+        except Exception as e:
+            print(f"Error al obtener la serie diaria: {e}")
+            return []
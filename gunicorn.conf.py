@@ -1,9 +1,14 @@
 # Configuración de Gunicorn para producción
 
+import gc
+import os
+
 # Configuración del servidor
 bind = "0.0.0.0:10000"
 workers = 2
-worker_class = "sync"
+# Hilos por worker: PersonalizacionManager y los almacenamientos son seguros con hilos
+worker_class = "gthread"
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
 worker_connections = 1000
 timeout = 30
 keepalive = 2
@@ -23,7 +28,40 @@ max_requests = 1000
 max_requests_jitter = 50
 preload_app = True
 
-# Configuración de archivos estáticos
-static_map = {
-    '/static': 'static'
-}
+# Copy-on-write: el recolector queda desactivado mientras el maestro carga la
+# aplicación y se reactiva en cuanto termina (when_ready); el heap se congela
+# (gc.freeze) antes de cada fork, de modo que los workers no escriben en las
+# páginas heredadas al recorrerlas
+GC_FREEZE = os.environ.get('GUNICORN_GC_FREEZE', 'True').lower() == 'true'
+if GC_FREEZE:
+    gc.disable()
+
+
+def _ciclo_vida(server):
+    """CicloVida de la aplicación precargada en el maestro (ver ciclo_vida.py)"""
+    if not server.cfg.preload_app:
+        return None
+    from ciclo_vida import ciclo_vida_de
+    return ciclo_vida_de(server.app.wsgi())
+
+
+def when_ready(server):
+    # Aplicación cargada: el maestro vive tanto como el servidor y no puede
+    # quedarse sin recolector; lo que herede cada worker lo congela pre_fork
+    if GC_FREEZE:
+        gc.enable()
+
+
+def pre_fork(server, worker):
+    ciclo_vida = _ciclo_vida(server)
+    if ciclo_vida is not None:
+        ciclo_vida.antes_de_fork(congelar=GC_FREEZE)
+
+
+def post_fork(server, worker):
+    ciclo_vida = _ciclo_vida(server)
+    if ciclo_vida is not None:
+        ciclo_vida.despues_de_fork()
+
+# Los archivos estáticos los sirve nginx desde static/ (ver DEPLOYMENT.md);
+# sin nginx, Flask los sirve con nombres con huella y caché inmutable (assets.py).
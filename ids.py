@@ -0,0 +1,145 @@
+"""
+Generación de identificadores de personalizaciones para Teteu Cueros
+
+Por defecto los IDs son de 128 bits ordenados por tiempo (estilo ULID):
+48 bits de milisegundos desde la época seguidos de 80 bits aleatorios,
+codificados en base62 con ancho fijo de 22 caracteres. El alfabeto está en
+orden ASCII, así que el orden lexicográfico de los IDs coincide con el de
+creación: las inserciones caen al final del índice de SQLite y los enlaces
+son más cortos que un uuid4. Dentro de un mismo milisegundo la parte
+aleatoria se incrementa en lugar de sortearse (ULID monótono), de modo que
+el orden se mantiene también entre IDs creados por el mismo proceso en
+ráfaga.
+
+Los IDs uuid4 existentes siguen siendo válidos: solo cambia cómo se generan
+los nuevos.
+"""
+
+import os
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Optional, Tuple, Union
+
+ALFABETO_BASE62 = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'
+LONGITUD_BASE62 = 22
+
+FORMATO_UUID = 0
+FORMATO_BASE62 = 1
+
+_VALORES_BASE62 = {caracter: valor for valor, caracter in enumerate(ALFABETO_BASE62)}
+
+
+def codificar_base62(numero: int) -> str:
+    """Codificar un entero de 128 bits en base62 con ancho fijo"""
+    caracteres = []
+    for _ in range(LONGITUD_BASE62):
+        numero, resto = divmod(numero, 62)
+        caracteres.append(ALFABETO_BASE62[resto])
+    return ''.join(reversed(caracteres))
+
+
+def decodificar_base62(texto: str) -> Optional[int]:
+    """Decodificar un ID base62 de ancho fijo (None si no es válido)"""
+    if len(texto) != LONGITUD_BASE62:
+        return None
+    numero = 0
+    for caracter in texto:
+        valor = _VALORES_BASE62.get(caracter)
+        if valor is None:
+            return None
+        numero = numero * 62 + valor
+    return numero if numero < 1 << 128 else None
+
+
+_MAX_ALEATORIO = (1 << 80) - 1
+
+
+def _reiniciar_ulid():
+    """Estado del generador monótono (al importar y en cada proceso hijo tras un fork)"""
+    global _ulid_lock, _ulid_ultimo
+    _ulid_lock = threading.Lock()
+    # (milisegundos, parte aleatoria) del último ID generado por este proceso
+    _ulid_ultimo = (-1, 0)
+
+
+_reiniciar_ulid()
+# Los workers no deben continuar la secuencia del maestro: dos de ellos
+# incrementarían la misma parte aleatoria en el mismo milisegundo
+os.register_at_fork(after_in_child=_reiniciar_ulid)
+
+
+def generar_ulid() -> str:
+    """ID de 128 bits ordenado por tiempo y monótono dentro del proceso, en base62"""
+    global _ulid_ultimo
+    milisegundos = time.time_ns() // 1_000_000
+    with _ulid_lock:
+        ultimo_ms, ultimo_aleatorio = _ulid_ultimo
+        if milisegundos > ultimo_ms:
+            aleatorio = int.from_bytes(os.urandom(10), 'big')
+        else:
+            # Mismo milisegundo (o reloj atrasado): continuar la secuencia anterior
+            milisegundos = ultimo_ms
+            aleatorio = ultimo_aleatorio + 1
+            if aleatorio > _MAX_ALEATORIO:
+                milisegundos += 1
+                aleatorio = int.from_bytes(os.urandom(10), 'big')
+        _ulid_ultimo = (milisegundos, aleatorio)
+    return codificar_base62(((milisegundos & 0xFFFFFFFFFFFF) << 80) | aleatorio)
+
+
+def generar_uuid4() -> str:
+    """ID aleatorio uuid4 (esquema anterior)"""
+    return str(uuid.uuid4())
+
+
+GENERADORES: Dict[str, Callable[[], str]] = {
+    'ulid': generar_ulid,
+    'uuid4': generar_uuid4,
+}
+
+_generador: Callable[[], str] = generar_ulid
+
+
+def establecer_generador(generador: Union[str, Callable[[], str]]):
+    """
+    Elegir el generador de IDs de las nuevas personalizaciones
+
+    Args:
+        generador: Nombre registrado en `GENERADORES` o una función sin argumentos
+    """
+    global _generador
+    if callable(generador):
+        _generador = generador
+        return
+    if generador not in GENERADORES:
+        raise ValueError(f"Generador de IDs desconocido: {generador}")
+    _generador = GENERADORES[generador]
+
+
+def generar_id() -> str:
+    """Generar un ID con el generador configurado"""
+    return _generador()
+
+
+def id_a_bytes(id_personalizacion: str) -> Optional[Tuple[bytes, int]]:
+    """
+    Representación binaria de 16 bytes de un ID
+
+    Returns:
+        (bytes, formato) o None si el ID no es base62 ni uuid
+    """
+    numero = decodificar_base62(id_personalizacion)
+    if numero is not None:
+        return numero.to_bytes(16, 'big'), FORMATO_BASE62
+    try:
+        return uuid.UUID(id_personalizacion).bytes, FORMATO_UUID
+    except (ValueError, AttributeError, TypeError):
+        return None
+
+
+def bytes_a_id(binario: bytes, formato: int) -> str:
+    """Reconstruir el ID textual desde su forma binaria"""
+    if formato == FORMATO_BASE62:
+        return codificar_base62(int.from_bytes(binario, 'big'))
+    return str(uuid.UUID(bytes=binario))
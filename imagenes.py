@@ -0,0 +1,235 @@
+"""
+Índice en memoria de las imágenes de variantes para Teteu Cueros
+"""
+
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+from catalogo import CATALOGO
+from utils import obtener_imagen_por_defecto
+
+
+class IndiceImagenes:
+    """
+    Resuelve (modelo, color, herrajes) a la URL de imagen sin tocar el disco
+
+    El contenido de `static/` se lee una vez al arrancar. Si `intervalo_sondeo`
+    es mayor que cero, como mucho una vez por intervalo se compara el mtime
+    del directorio y se reconstruye el índice cuando cambia (archivos añadidos
+    o eliminados).
+    """
+
+    def __init__(self, static_dir: str, intervalo_sondeo: float = 0):
+        """
+        Args:
+            static_dir: Directorio de archivos estáticos de la aplicación
+            intervalo_sondeo: Segundos entre comprobaciones de cambios (0 = nunca)
+        """
+        self.static_dir = static_dir
+        self.intervalo_sondeo = intervalo_sondeo
+        self._lock = threading.Lock()
+        self._archivos: FrozenSet[str] = frozenset()
+        self._rutas: Dict[Tuple[str, str, str], str] = {}
+        self._mtime: Optional[float] = None
+        self._ultima_comprobacion = 0.0
+        self.recargar()
+
+    def recargar(self):
+        """Volver a leer el directorio y vaciar las rutas resueltas"""
+        try:
+            mtime = os.stat(self.static_dir).st_mtime
+            archivos = frozenset(
+                f"/static/{nombre}" for nombre in os.listdir(self.static_dir)
+                if os.path.isfile(os.path.join(self.static_dir, nombre))
+            )
+        except OSError:
+            mtime, archivos = None, frozenset()
+
+        with self._lock:
+            self._archivos = archivos
+            self._rutas = {}
+            self._mtime = mtime
+            self._ultima_comprobacion = time.monotonic()
+
+    def _refrescar_si_cambio(self):
+        if not self.intervalo_sondeo:
+            return
+        ahora = time.monotonic()
+        if ahora - self._ultima_comprobacion < self.intervalo_sondeo:
+            return
+        self._ultima_comprobacion = ahora
+        try:
+            mtime = os.stat(self.static_dir).st_mtime
+        except OSError:
+            mtime = None
+        if mtime != self._mtime:
+            self.recargar()
+
+    def existe(self, ruta_imagen: str) -> bool:
+        """Equivalente en memoria de `utils.verificar_archivo_imagen`"""
+        self._refrescar_si_cambio()
+        return ruta_imagen in self._archivos
+
+    def ruta_imagen(self, personalizacion) -> str:
+        """
+        URL de la imagen de una personalización, con la imagen por defecto ya aplicada
+
+        Args:
+            personalizacion: Instancia de `models.Personalizacion`
+        """
+        self._refrescar_si_cambio()
+        clave = (CATALOGO.modelo_de(personalizacion.producto).id, personalizacion.color, personalizacion.herrajes)
+
+        ruta = self._rutas.get(clave)
+        if ruta is None:
+            ruta = personalizacion.get_imagen_path()
+            if ruta not in self._archivos:
+                ruta = obtener_imagen_por_defecto(personalizacion.producto)
+            with self._lock:
+                self._rutas[clave] = ruta
+        return ruta
+
+
+# Derivados responsivos generados en tiempo de build (python imagenes.py build)
+DIRECTORIO_DERIVADOS = 'build'
+ANCHOS_DERIVADOS = (240, 360, 480, 720)
+EXTENSIONES_IMAGEN = ('.jpg', '.jpeg', '.png')
+
+
+def construir_derivados(static_dir: str, anchos: Sequence[int] = ANCHOS_DERIVADOS,
+                        calidad: int = 78) -> Dict[str, Any]:
+    """
+    Generar derivados redimensionados de las imágenes de `static/`
+
+    Por cada imagen y ancho (sin ampliar nunca el original) se escribe un
+    WebP y un respaldo (JPEG progresivo, o PNG si la imagen tiene
+    transparencia) con el hash del contenido en el nombre, y un
+    `manifest.json` que los relaciona con la URL original. Se conservan los
+    derivados del build anterior y se borran los más antiguos.
+
+    Requiere Pillow (solo en el build, no en tiempo de ejecución).
+
+    Returns:
+        Dict: Manifiesto generado
+    """
+    try:
+        from PIL import Image
+    except ImportError:
+        raise RuntimeError("Pillow es necesario para generar los derivados: pip install Pillow")
+
+    salida = os.path.join(static_dir, DIRECTORIO_DERIVADOS)
+    os.makedirs(salida, exist_ok=True)
+    # Los derivados del build anterior se conservan: las páginas cacheadas
+    # antes de un despliegue todavía los referencian
+    try:
+        with open(os.path.join(salida, 'manifest.json'), encoding='utf-8') as archivo:
+            anterior = json.load(archivo)
+    except (OSError, ValueError):
+        anterior = {}
+    manifiesto: Dict[str, Any] = {}
+
+    for nombre in sorted(os.listdir(static_dir)):
+        base, extension = os.path.splitext(nombre)
+        ruta = os.path.join(static_dir, nombre)
+        if extension.lower() not in EXTENSIONES_IMAGEN or not os.path.isfile(ruta):
+            continue
+
+        with Image.open(ruta) as original:
+            transparente = original.mode in ('RGBA', 'LA', 'P')
+            original = original.convert('RGBA' if transparente else 'RGB')
+            ancho_original, alto_original = original.size
+            entrada: Dict[str, Any] = {'ancho': ancho_original, 'alto': alto_original,
+                                       'webp': [], 'respaldo': []}
+
+            for ancho in sorted(set(min(a, ancho_original) for a in anchos)):
+                alto = round(alto_original * ancho / ancho_original)
+                reducida = original.resize((ancho, alto), Image.LANCZOS)
+                entrada['webp'].append(_escribir_derivado(
+                    reducida, salida, base, ancho, 'webp', quality=calidad, method=6))
+                if transparente:
+                    entrada['respaldo'].append(_escribir_derivado(
+                        reducida, salida, base, ancho, 'png', optimize=True))
+                else:
+                    entrada['respaldo'].append(_escribir_derivado(
+                        reducida, salida, base, ancho, 'jpeg', quality=calidad,
+                        progressive=True, optimize=True))
+
+        manifiesto[f"/static/{nombre}"] = entrada
+
+    vigentes = {os.path.basename(derivado['url'])
+                for entradas in (anterior, manifiesto) for entrada in entradas.values()
+                for derivado in entrada['webp'] + entrada['respaldo']}
+    for nombre in os.listdir(salida):
+        if nombre not in vigentes and not nombre.startswith('manifest.json'):
+            os.remove(os.path.join(salida, nombre))
+
+    with open(os.path.join(salida, 'manifest.json'), 'w', encoding='utf-8') as archivo:
+        json.dump(manifiesto, archivo, indent=2, sort_keys=True)
+    return manifiesto
+
+
+def _escribir_derivado(imagen, salida: str, base: str, ancho: int, formato: str, **opciones) -> Dict[str, Any]:
+    """Guardar un derivado con el hash de su contenido en el nombre"""
+    from io import BytesIO
+
+    buffer = BytesIO()
+    imagen.save(buffer, format=formato.upper(), **opciones)
+    datos = buffer.getvalue()
+    extension = 'jpg' if formato == 'jpeg' else formato
+    nombre = f"{base}-{ancho}w.{hashlib.sha256(datos).hexdigest()[:10]}.{extension}"
+    with open(os.path.join(salida, nombre), 'wb') as archivo:
+        archivo.write(datos)
+    return {'url': f"/static/{DIRECTORIO_DERIVADOS}/{nombre}", 'ancho': ancho, 'bytes': len(datos)}
+
+
+class ManifiestoImagenes:
+    """Manifiesto de derivados responsivos, cargado una vez al arrancar"""
+
+    def __init__(self, static_dir: str):
+        self.entradas: Dict[str, Any] = {}
+        ruta = os.path.join(static_dir, DIRECTORIO_DERIVADOS, 'manifest.json')
+        try:
+            with open(ruta, encoding='utf-8') as archivo:
+                self.entradas = json.load(archivo)
+        except (OSError, ValueError):
+            # Sin build de imágenes: las plantillas usan los originales
+            pass
+        self._derivados = {url: self._preparar(entrada) for url, entrada in self.entradas.items()}
+
+    @staticmethod
+    def _preparar(entrada: Dict[str, Any]) -> Dict[str, Any]:
+        def srcset(derivados: List[Dict[str, Any]]) -> str:
+            return ', '.join(f"{d['url']} {d['ancho']}w" for d in derivados)
+
+        respaldo = entrada['respaldo']
+        # El src por defecto (navegadores sin srcset) es el segundo ancho más grande
+        src = respaldo[-2]['url'] if len(respaldo) > 1 else respaldo[-1]['url']
+        return {
+            'webp': srcset(entrada['webp']),
+            'respaldo': srcset(respaldo),
+            'src': src
+        }
+
+    def derivados(self, url: str) -> Optional[Dict[str, Any]]:
+        """srcset WebP y de respaldo para una URL de `/static/` (None si no hay derivados)"""
+        return self._derivados.get(url)
+
+    def derivados_de(self, urls: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        """Derivados de varias URLs (solo las que tienen), para enviarlos a main.js"""
+        return {url: self._derivados[url] for url in urls if url in self._derivados}
+
+
+if __name__ == '__main__':
+    if sys.argv[1:] != ['build']:
+        print("Uso: python imagenes.py build")
+        sys.exit(1)
+    directorio = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+    generado = construir_derivados(directorio)
+    for url, entrada in generado.items():
+        print(f"{url}: {len(entrada['webp'])} anchos, "
+              f"{max(d['bytes'] for d in entrada['webp']) // 1024} KiB WebP máx.")
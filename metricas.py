@@ -0,0 +1,390 @@
+"""
+Métricas de la aplicación en formato de texto de Prometheus para Teteu Cueros
+
+Cada proceso acumula en memoria, por endpoint, el número de peticiones por
+método y estado, un histograma de latencia y otro del tiempo pasado en la
+base de datos. Un hilo en segundo plano vuelca ese estado, si cambió, cada
+`intervalo_volcado` segundos a `<directorio>/metricas-<pid>.json`
+(escritura atómica, fuera del camino de la petición), y `/metrics` suma los
+archivos de todos los workers: cualquier worker de gunicorn responde con el
+total, con un retraso máximo de un intervalo para los demás.
+
+Los contadores de un worker reciclado (`max_requests`) siguen contando
+hasta el siguiente arranque: al atender `/metrics` los archivos de los
+procesos terminados se suman a `metricas-finalizados.json` y se borran, así
+que cada consulta lee un archivo por worker vivo más uno. Los contadores
+propios de cada proceso (aciertos y fallos de caché) se pliegan igual y
+nunca retroceden; los valores instantáneos (registros del almacenamiento en
+memoria) solo se suman para los procesos vivos.
+
+`/metrics` solo responde a peticiones desde la propia máquina o, si se
+define un token, a las que lo presentan como `Authorization: Bearer`.
+"""
+
+import atexit
+import glob
+import hmac
+import ipaddress
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from flask import Response, abort, g, has_request_context, request
+
+from ciclo_vida import PRECALENTAMIENTO
+
+try:
+    import fcntl
+except ImportError:
+    # Sin flock (Windows) los archivos de procesos terminados se leen uno a uno
+    fcntl = None
+
+# Límites de los histogramas en segundos
+LIMITES_LATENCIA = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Suma de los contadores de los procesos ya terminados
+ARCHIVO_FINALIZADOS = 'metricas-finalizados.json'
+
+
+def _proceso_vivo(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class Metricas:
+    """Contadores e histogramas del proceso, volcados a disco para agregarlos entre workers"""
+
+    def __init__(self, directorio: Optional[str], intervalo_volcado: float = 1.0):
+        """
+        Args:
+            directorio: Directorio compartido por los workers (None = solo este proceso)
+            intervalo_volcado: Segundos mínimos entre volcados a disco
+        """
+        self.directorio = directorio
+        self.intervalo_volcado = intervalo_volcado
+        self._lock = threading.Lock()
+        self._peticiones: Dict[Tuple[str, str, int], int] = defaultdict(int)
+        self._latencia: Dict[str, List[float]] = {}
+        self._tiempo_db: Dict[str, List[float]] = {}
+        self._cambios = False
+        self._pid_volcado: Optional[int] = None
+        # Valores instantáneos de este proceso (se suman solo entre procesos vivos) y
+        # contadores acumulados (se conservan al terminar el proceso), actualizados
+        # por `al_volcar` justo antes de cada volcado
+        self.valores_proceso: Dict[str, Any] = {}
+        self.contadores_proceso: Dict[str, Any] = {}
+        self.al_volcar: Optional[Callable[[], None]] = None
+
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+            # Restos de una ejecución anterior (ningún proceso suyo sigue vivo): se
+            # empieza de cero. Un worker que arranca junto a otros vivos los conserva
+            archivos = self._archivos()
+            if not any(_proceso_vivo(pid) for _, pid in archivos if pid != os.getpid()):
+                for archivo in [ruta for ruta, _ in archivos] + [os.path.join(directorio, ARCHIVO_FINALIZADOS)]:
+                    try:
+                        os.remove(archivo)
+                    except OSError:
+                        pass
+            atexit.register(self.volcar)
+        os.register_at_fork(after_in_child=self._reiniciar)
+
+    def _reiniciar(self):
+        """El worker hijo empieza con sus propios contadores, su archivo y su hilo de volcado"""
+        self._lock = threading.Lock()
+        self._peticiones = defaultdict(int)
+        self._latencia = {}
+        self._tiempo_db = {}
+        self._cambios = False
+        self._pid_volcado = None
+
+    def _bucle_volcado(self):
+        while True:
+            time.sleep(self.intervalo_volcado)
+            if self._cambios:
+                self.volcar()
+
+    @staticmethod
+    def _observar(histogramas: Dict[str, List[float]], endpoint: str, segundos: float):
+        # [cubetas..., +Inf, suma]
+        histograma = histogramas.get(endpoint)
+        if histograma is None:
+            histograma = histogramas[endpoint] = [0] * (len(LIMITES_LATENCIA) + 1) + [0.0]
+        for indice, limite in enumerate(LIMITES_LATENCIA):
+            if segundos <= limite:
+                histograma[indice] += 1
+                break
+        else:
+            histograma[len(LIMITES_LATENCIA)] += 1
+        histograma[-1] += segundos
+
+    def registrar_peticion(self, endpoint: str, metodo: str, estado: int, segundos: float, segundos_db: float):
+        """Anotar una petición terminada"""
+        with self._lock:
+            self._peticiones[(endpoint, metodo, estado)] += 1
+            self._observar(self._latencia, endpoint, segundos)
+            self._observar(self._tiempo_db, endpoint, segundos_db)
+            self._cambios = True
+            if self.directorio and self._pid_volcado != os.getpid():
+                # Primer uso en este proceso (los hilos no sobreviven al fork)
+                self._pid_volcado = os.getpid()
+                threading.Thread(target=self._bucle_volcado, name='volcado-metricas', daemon=True).start()
+
+    def _estado(self) -> Dict[str, Any]:
+        if self.al_volcar is not None:
+            self.al_volcar()
+        with self._lock:
+            return {
+                'peticiones': [[*clave, cantidad] for clave, cantidad in self._peticiones.items()],
+                'latencia': {endpoint: list(h) for endpoint, h in self._latencia.items()},
+                'tiempo_db': {endpoint: list(h) for endpoint, h in self._tiempo_db.items()},
+                'valores_proceso': dict(self.valores_proceso),
+                'contadores_proceso': dict(self.contadores_proceso),
+            }
+
+    @staticmethod
+    def _escribir(ruta: str, estado: Dict[str, Any]):
+        """Escritura atómica: quien lee ve el archivo anterior o el nuevo completo"""
+        temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temporal, 'w', encoding='utf-8') as archivo:
+                json.dump(estado, archivo)
+            os.replace(temporal, ruta)
+        except OSError:
+            pass
+
+    @staticmethod
+    def _leer(ruta: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(ruta, encoding='utf-8') as archivo:
+                return json.load(archivo)
+        except (OSError, ValueError):
+            return None
+
+    def volcar(self):
+        """Escribir el estado de este proceso en su archivo del directorio compartido"""
+        if not self.directorio:
+            return
+        self._cambios = False
+        self._escribir(os.path.join(self.directorio, f"metricas-{os.getpid()}.json"), self._estado())
+
+    def _archivos(self) -> List[Tuple[str, int]]:
+        archivos = []
+        for ruta in glob.glob(os.path.join(self.directorio, 'metricas-*.json')):
+            try:
+                archivos.append((ruta, int(os.path.basename(ruta)[len('metricas-'):-len('.json')])))
+            except ValueError:
+                pass
+        return archivos
+
+    def _plegar_finalizados(self, muertos: List[str]):
+        """
+        Sumar los archivos de procesos terminados a `ARCHIVO_FINALIZADOS` y borrarlos
+
+        Un solo worker a la vez (flock sin espera): si otro está plegando, esta
+        consulta lee los archivos tal cual y el siguiente `/metrics` los
+        encontrará ya sumados.
+        """
+        with open(os.path.join(self.directorio, '.plegado.lock'), 'a') as cerrojo:
+            try:
+                fcntl.flock(cerrojo, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return
+            ruta_finalizados = os.path.join(self.directorio, ARCHIVO_FINALIZADOS)
+            estados = [estado for estado in map(self._leer, [ruta_finalizados] + muertos) if estado is not None]
+            total = self._sumar(estados)
+            self._escribir(ruta_finalizados, {
+                'peticiones': [[*clave, cantidad] for clave, cantidad in total['peticiones'].items()],
+                'latencia': total['latencia'],
+                'tiempo_db': total['tiempo_db'],
+                'valores_proceso': {},
+                'contadores_proceso': total['contadores_proceso'],
+            })
+            for ruta in muertos:
+                try:
+                    os.remove(ruta)
+                except OSError:
+                    pass
+
+    @staticmethod
+    def _sumar(estados: List[Dict[str, Any]]) -> Dict[str, Any]:
+        total: Dict[str, Any] = {'peticiones': defaultdict(int), 'latencia': {}, 'tiempo_db': {},
+                                 'valores_proceso': defaultdict(float), 'contadores_proceso': defaultdict(float)}
+        for estado in estados:
+            for endpoint, metodo, codigo, cantidad in estado['peticiones']:
+                total['peticiones'][(endpoint, metodo, codigo)] += cantidad
+            for tipo in ('latencia', 'tiempo_db'):
+                for endpoint, histograma in estado[tipo].items():
+                    acumulado = total[tipo].setdefault(endpoint, [0] * len(histograma))
+                    for indice, valor in enumerate(histograma):
+                        acumulado[indice] += valor
+            for tipo in ('valores_proceso', 'contadores_proceso'):
+                for nombre, valor in estado.get(tipo, {}).items():
+                    total[tipo][nombre] += valor
+        return total
+
+    def agregar(self) -> Dict[str, Any]:
+        """Sumar el estado de todos los workers (el de este proceso, siempre al día)"""
+        if not self.directorio:
+            return self._sumar([self._estado()])
+
+        self.volcar()
+        archivos = self._archivos()
+        muertos = [ruta for ruta, pid in archivos if not _proceso_vivo(pid)]
+        if muertos and fcntl is not None:
+            self._plegar_finalizados(muertos)
+            archivos = self._archivos()
+
+        estados = []
+        for ruta, pid in archivos + [(os.path.join(self.directorio, ARCHIVO_FINALIZADOS), None)]:
+            estado = self._leer(ruta)
+            if estado is None:
+                continue
+            if pid is None or not _proceso_vivo(pid):
+                estado['valores_proceso'] = {}
+            estados.append(estado)
+        return self._sumar(estados)
+
+
+def _escapar(valor: Any) -> str:
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _histograma(lineas: List[str], nombre: str, ayuda: str, histogramas: Dict[str, List[float]]):
+    lineas.append(f"# HELP {nombre} {ayuda}")
+    lineas.append(f"# TYPE {nombre} histogram")
+    for endpoint, histograma in sorted(histogramas.items()):
+        etiqueta = f'endpoint="{_escapar(endpoint)}"'
+        acumulado = 0
+        for limite, cantidad in zip(LIMITES_LATENCIA, histograma):
+            acumulado += cantidad
+            lineas.append(f'{nombre}_bucket{{{etiqueta},le="{limite}"}} {acumulado}')
+        acumulado += histograma[len(LIMITES_LATENCIA)]
+        lineas.append(f'{nombre}_bucket{{{etiqueta},le="+Inf"}} {acumulado}')
+        lineas.append(f'{nombre}_sum{{{etiqueta}}} {histograma[-1]:.6f}')
+        lineas.append(f'{nombre}_count{{{etiqueta}}} {acumulado}')
+
+
+def _autorizado(token: Optional[str]) -> bool:
+    """Con token, exigir `Authorization: Bearer <token>`; sin él, solo peticiones desde la propia máquina"""
+    if token:
+        return hmac.compare_digest(request.headers.get('Authorization', '').encode(), f'Bearer {token}'.encode())
+    try:
+        return ipaddress.ip_address(request.remote_addr or '').is_loopback
+    except ValueError:
+        return False
+
+
+def registrar_metricas(app, metricas: Metricas, manager, caches: Dict[str, Any], token: Optional[str] = None):
+    """
+    Instrumentar la aplicación y exponer `/metrics`
+
+    Args:
+        app: Aplicación Flask
+        metricas: Instancia de `Metricas`
+        manager: `PersonalizacionManager` (tamaño del almacenamiento y tiempo de DB)
+        caches: Nombre -> objeto con `estadisticas()` (TTLCache o CachePaginas)
+        token: Token que debe presentar el scraper (None = solo desde la propia máquina)
+    """
+    db = getattr(manager.store, 'db', None)
+    if db is not None:
+        def acumular_tiempo_db(segundos: float):
+            # El hilo escritor del write-behind no tiene petición asociada
+            if has_request_context() and 'tiempo_db' in g:
+                g.tiempo_db += segundos
+        db.al_medir = acumular_tiempo_db
+
+    @app.before_request
+    def iniciar_medicion():
+        if PRECALENTAMIENTO in request.environ:
+            return
+        g.inicio_peticion = time.perf_counter()
+        g.tiempo_db = 0.0
+
+    @app.after_request
+    def registrar_medicion(respuesta):
+        inicio = g.pop('inicio_peticion', None)
+        if inicio is not None:
+            metricas.registrar_peticion(request.endpoint or 'sin_ruta', request.method, respuesta.status_code,
+                                        time.perf_counter() - inicio, g.pop('tiempo_db', 0.0))
+        return respuesta
+
+    def estadisticas_caches() -> Dict[str, Dict[str, Any]]:
+        return {nombre: estadisticas for nombre, estadisticas in
+                ((nombre, cache.estadisticas() if cache is not None else None) for nombre, cache in caches.items())
+                if estadisticas}
+
+    # Cada worker hereda del maestro los aciertos y fallos del precalentamiento:
+    # publica solo los suyos, o cada reciclaje los volvería a sumar
+    base_caches: Dict[str, Dict[str, Any]] = {}
+
+    def fijar_base_caches():
+        base_caches.clear()
+        base_caches.update(estadisticas_caches())
+
+    os.register_at_fork(after_in_child=fijar_base_caches)
+
+    def actualizar_valores_proceso():
+        store = manager.store
+        # Contador O(1): el desglose de memoria (estadisticas_memoria) recorre el almacenamiento
+        if hasattr(store, 'registros'):
+            metricas.valores_proceso['store_registros'] = store.registros()
+        for nombre, estadisticas in estadisticas_caches().items():
+            base = base_caches.get(nombre, {})
+            for tipo in ('aciertos', 'fallos'):
+                metricas.contadores_proceso[f'cache_{tipo}:{nombre}'] = estadisticas[tipo] - base.get(tipo, 0)
+
+    metricas.al_volcar = actualizar_valores_proceso
+
+    @app.route('/metrics')
+    def metrics():
+        """Métricas agregadas de todos los workers en formato de texto de Prometheus"""
+        if not _autorizado(token):
+            abort(404)
+
+        total = metricas.agregar()
+        lineas = [
+            "# HELP teteu_peticiones_total Peticiones atendidas por endpoint, método y estado",
+            "# TYPE teteu_peticiones_total counter",
+        ]
+        for (endpoint, metodo, estado), cantidad in sorted(total['peticiones'].items()):
+            lineas.append(f'teteu_peticiones_total{{endpoint="{_escapar(endpoint)}",metodo="{metodo}",'
+                          f'estado="{estado}"}} {cantidad}')
+        _histograma(lineas, 'teteu_peticion_duracion_segundos', "Latencia de las peticiones por endpoint",
+                    total['latencia'])
+        _histograma(lineas, 'teteu_db_duracion_segundos', "Tiempo de base de datos por petición y endpoint",
+                    total['tiempo_db'])
+
+        valores = total['valores_proceso']
+        registros = valores.get('store_registros')
+        if db is not None:
+            registros = db.obtener_estadisticas().get('total_activas')
+        if registros is not None:
+            lineas += ["# HELP teteu_store_registros Personalizaciones activas en el almacenamiento",
+                       "# TYPE teteu_store_registros gauge",
+                       f"teteu_store_registros {int(registros)}"]
+
+        contadores = total['contadores_proceso']
+        for tipo, ayuda in (('aciertos', 'Aciertos'), ('fallos', 'Fallos')):
+            lineas += [f"# HELP teteu_cache_{tipo}_total {ayuda} de caché por caché",
+                       f"# TYPE teteu_cache_{tipo}_total counter"]
+            for nombre in sorted(caches):
+                if f'cache_{tipo}:{nombre}' in contadores:
+                    lineas.append(f'teteu_cache_{tipo}_total{{cache="{nombre}"}} {int(contadores[f"cache_{tipo}:{nombre}"])}')
+        lineas += ["# HELP teteu_cache_tasa_aciertos Proporción de aciertos por caché",
+                   "# TYPE teteu_cache_tasa_aciertos gauge"]
+        for nombre in sorted(caches):
+            aciertos = contadores.get(f'cache_aciertos:{nombre}', 0)
+            consultas = aciertos + contadores.get(f'cache_fallos:{nombre}', 0)
+            if consultas:
+                lineas.append(f'teteu_cache_tasa_aciertos{{cache="{nombre}"}} {aciertos / consultas:.4f}')
+
+        return Response('\n'.join(lineas) + '\n', mimetype='text/plain; version=0.0.4')
@@ -1,6 +1,8 @@
 from flask import Flask, render_template, request, redirect, url_for
 import uuid
 
+from catalogo import CATALOGO
+
 app = Flask(__name__)
 
 # Almacenamiento en memoria (puedes cambiarlo a base de datos si lo deseas)
@@ -13,9 +15,9 @@ class Personalizacion:
         self.color = color
         self.herrajes = herrajes
 
-# Opciones disponibles
-COLORES = ['negro', 'marron', 'marron claro']
-HERRAJES = ['plata', 'dorado']
+# Opciones disponibles (las mismas que la aplicación principal)
+COLORES = list(CATALOGO.valores_colores)
+HERRAJES = list(CATALOGO.valores_herrajes)
 
 
 # Página principal para seleccionar carteras
@@ -132,7 +134,7 @@ def pagina_principal():
 @app.route('/personalizar_form', methods=['GET'])
 def formulario():
     modelo = request.args.get('modelo', 'Cartera')
-    imagen = "/static/modelo1.jpg" if "Clásica" in modelo else "/static/modelo2.jpg"
+    imagen = CATALOGO.modelo_de(modelo).imagen
     return f'''
     <style>
         body {{
@@ -350,19 +352,8 @@ def ver_personalizacion(id):
     p = personalizaciones.get(id)
     if not p:
         return '<h2>Personalización no encontrada</h2>', 404
-    # Determinar el nombre de archivo de la imagen según modelo, color y herrajes
-    modelo = 'modelo1'
-    if p.producto and 'urbana' in p.producto.lower():
-        modelo = 'modelo2'
-    color_file = 'negro'
-    if p.color == 'marron':
-        color_file = 'marron'
-    elif p.color == 'marron claro':
-        color_file = 'marron_claro'
-    herraje_file = 'plata'
-    if p.herrajes == 'dorado':
-        herraje_file = 'dorado'
-    img_path = f"/static/{modelo}_{color_file}_{herraje_file}.jpg"
+    # Imagen según modelo, color y herrajes
+    img_path = CATALOGO.ruta_imagen(p.producto, p.color, p.herrajes)
     return f'''
     <h2>Tu {p.producto} Personalizada</h2>
     <img src="{img_path}" alt="Cartera personalizada" style="max-width:320px;max-height:340px;border-radius:12px;box-shadow:0 0 10px #aaa;margin-bottom:1em;display:block;">
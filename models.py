@@ -2,14 +2,22 @@
 Modelos de datos para la aplicación Teteu Cueros
 """
 
-import uuid
+import os
+import threading
+import logging
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Iterator, List, Tuple
+
+import ids
+from catalogo import CATALOGO
 
 class Personalizacion:
     """Modelo para representar una personalización de cartera"""
     
-    def __init__(self, producto: str, color: str, herrajes: str, id_personalizacion: Optional[str] = None):
+    __slots__ = ('id', 'producto', 'color', 'herrajes', 'fecha_creacion', 'activa')
+    
+    def __init__(self, producto: str, color: str, herrajes: str, id_personalizacion: Optional[str] = None,
+                 fecha_creacion: Optional[datetime] = None, activa: bool = True):
         """
         Inicializar una nueva personalización
         
@@ -18,13 +26,30 @@ class Personalizacion:
             color: Color seleccionado
             herrajes: Tipo de herrajes seleccionado
             id_personalizacion: ID único (se genera automáticamente si no se proporciona)
+            fecha_creacion: Fecha de creación (por defecto, ahora en UTC)
+            activa: Si la personalización sigue activa
         """
-        self.id = id_personalizacion or str(uuid.uuid4())
+        self.id = id_personalizacion or ids.generar_id()
         self.producto = producto
         self.color = color
         self.herrajes = herrajes
-        self.fecha_creacion = datetime.utcnow()
-        self.activa = True
+        self.fecha_creacion = fecha_creacion or datetime.utcnow()
+        self.activa = activa
+    
+    @classmethod
+    def from_dict(cls, datos: Dict[str, Any]) -> 'Personalizacion':
+        """Reconstruir una personalización desde un diccionario (p. ej. una fila de la base de datos)"""
+        fecha = datos.get('fecha_creacion')
+        if isinstance(fecha, str):
+            fecha = datetime.fromisoformat(fecha)
+        return cls(
+            producto=datos['producto'],
+            color=datos['color'],
+            herrajes=datos['herrajes'],
+            id_personalizacion=datos['id'],
+            fecha_creacion=fecha,
+            activa=bool(datos.get('activa', True))
+        )
     
     def to_dict(self) -> Dict[str, Any]:
         """Convertir personalización a diccionario"""
@@ -39,44 +64,14 @@ class Personalizacion:
     
     def get_imagen_path(self) -> str:
         """Obtener la ruta de la imagen de la personalización"""
-        # Determinar modelo
-        modelo = 'modelo1'
-        if self.producto and 'urbana' in self.producto.lower():
-            modelo = 'modelo2'
-        
-        # Mapear color a nombre de archivo
-        color_file = self._map_color_to_file(self.color)
-        
-        # Mapear herrajes a nombre de archivo
-        herrajes_file = self._map_herrajes_to_file(self.herrajes)
-        
-        return f"/static/{modelo}_{color_file}_{herrajes_file}.jpg"
-    
-    def _map_color_to_file(self, color: str) -> str:
-        """Mapear color a nombre de archivo"""
-        color_map = {
-            'negro': 'negro',
-            'marron': 'marron',
-            'marron claro': 'marron_claro'
-        }
-        return color_map.get(color, 'negro')
-    
-    def _map_herrajes_to_file(self, herrajes: str) -> str:
-        """Mapear herrajes a nombre de archivo"""
-        herrajes_map = {
-            'plata': 'plata',
-            'dorado': 'dorado'
-        }
-        return herrajes_map.get(herrajes, 'plata')
+        return CATALOGO.ruta_imagen(self.producto, self.color, self.herrajes)
     
     def is_valid(self) -> bool:
         """Verificar si la personalización es válida"""
-        from config import Config
-        
         return (
             self.producto and
-            self.color in Config.COLORES_DISPONIBLES and
-            self.herrajes in Config.HERRAJES_DISPONIBLES
+            isinstance(self.color, str) and self.color in CATALOGO.colores_validos and
+            isinstance(self.herrajes, str) and self.herrajes in CATALOGO.herrajes_validos
         )
     
     def __str__(self) -> str:
@@ -85,11 +80,29 @@ class Personalizacion:
     def __repr__(self) -> str:
         return self.__str__()
 
+class CapacidadExcedida(Exception):
+    """El almacenamiento alcanzó su capacidad máxima y la política es rechazar"""
+
+
 class PersonalizacionManager:
-    """Gestor de personalizaciones en memoria"""
+    """Gestor de personalizaciones sobre un almacenamiento intercambiable"""
     
-    def __init__(self):
-        self.personalizaciones: Dict[str, Personalizacion] = {}
+    def __init__(self, store=None, cache=None):
+        """
+        Args:
+            store: Almacenamiento a utilizar (por defecto, en memoria del proceso)
+            cache: `cache.TTLCache` de lectura delante de `obtener_personalizacion` (opcional)
+        """
+        if store is None:
+            from storage import MemoryStore
+            store = MemoryStore()
+        self.store = store
+        self.cache = cache
+        if cache is not None and hasattr(store, 'al_desalojar'):
+            store.al_desalojar = cache.invalidar
+        self._barrido_intervalo: Optional[float] = None
+        self._barrido_detener = threading.Event()
+        self._barrido_hilo: Optional[threading.Thread] = None
     
     def crear_personalizacion(self, producto: str, color: str, herrajes: str) -> Personalizacion:
         """Crear una nueva personalización"""
@@ -98,37 +111,170 @@ class PersonalizacionManager:
         if not personalizacion.is_valid():
             raise ValueError("Datos de personalización inválidos")
         
-        self.personalizaciones[personalizacion.id] = personalizacion
+        if not self.store.guardar(personalizacion):
+            raise RuntimeError("No se pudo guardar la personalización")
         return personalizacion
     
+    def crear_personalizaciones(self, datos: List[Tuple[str, str, str]]) -> List[Tuple[Optional[Personalizacion], Optional[str]]]:
+        """
+        Crear varias personalizaciones de una vez
+        
+        Si el almacenamiento admite `guardar_lote` (SQLite), todas se insertan
+        en una única transacción; si no, se guardan una a una.
+        
+        Args:
+            datos: Tuplas (producto, color, herrajes) ya validadas
+            
+        Returns:
+            List: (personalización, None) o (None, mensaje de error) por elemento, en el mismo orden
+        """
+        resultados: List[Tuple[Optional[Personalizacion], Optional[str]]] = []
+        nuevas = []
+        for producto, color, herrajes in datos:
+            personalizacion = Personalizacion(producto, color, herrajes)
+            if personalizacion.is_valid():
+                nuevas.append(personalizacion)
+                resultados.append((personalizacion, None))
+            else:
+                resultados.append((None, "Datos de personalización inválidos"))
+        
+        if hasattr(self.store, 'guardar_lote'):
+            guardadas = dict(zip((p.id for p in nuevas), self.store.guardar_lote(nuevas)))
+        else:
+            guardadas = {}
+            for personalizacion in nuevas:
+                try:
+                    guardadas[personalizacion.id] = self.store.guardar(personalizacion)
+                except CapacidadExcedida:
+                    guardadas[personalizacion.id] = None
+        
+        for indice, (personalizacion, error) in enumerate(resultados):
+            if personalizacion is None:
+                continue
+            guardada = guardadas.get(personalizacion.id)
+            if guardada is None:
+                resultados[indice] = (None, "Capacidad máxima alcanzada")
+            elif not guardada:
+                resultados[indice] = (None, "No se pudo guardar la personalización")
+        return resultados
+    
     def obtener_personalizacion(self, id_personalizacion: str) -> Optional[Personalizacion]:
         """Obtener una personalización por ID"""
-        return self.personalizaciones.get(id_personalizacion)
+        if self.cache is None:
+            return self.store.obtener(id_personalizacion)
+        
+        personalizacion = self.cache.get(id_personalizacion)
+        if personalizacion is not None:
+            return personalizacion
+        
+        personalizacion = self.store.obtener(id_personalizacion)
+        if personalizacion is not None:
+            ttl = self._ttl_cache(personalizacion)
+            if ttl > 0:
+                self.cache.set(id_personalizacion, personalizacion, ttl)
+        return personalizacion
+    
+    def _ttl_cache(self, personalizacion: Personalizacion) -> float:
+        """Segundos que puede vivir en caché: nunca más allá de su expiración"""
+        from config import Config
+        
+        restante = personalizacion.fecha_creacion + Config.PERSONALIZACION_EXPIRY - datetime.utcnow()
+        return min(self.cache.ttl, restante.total_seconds())
     
     def eliminar_personalizacion(self, id_personalizacion: str) -> bool:
         """Eliminar una personalización"""
-        if id_personalizacion in self.personalizaciones:
-            del self.personalizaciones[id_personalizacion]
-            return True
-        return False
+        if self.cache is None:
+            return self.store.eliminar(id_personalizacion)
+
+        # También después: una lectura que falló en caché mientras tanto pudo
+        # leer la fila del almacenamiento y volver a cachearla
+        self.cache.invalidar(id_personalizacion)
+        eliminada = self.store.eliminar(id_personalizacion)
+        self.cache.invalidar(id_personalizacion)
+        return eliminada
     
     def listar_personalizaciones(self) -> list:
         """Listar todas las personalizaciones"""
-        return list(self.personalizaciones.values())
+        return self.store.listar()
+    
+    def listar_pagina(self, limite: int, despues: Optional[Tuple[datetime, str]] = None) -> List[Personalizacion]:
+        """
+        Página de personalizaciones de la más reciente a la más antigua
+        
+        Args:
+            limite: Personalizaciones por página
+            despues: Cursor (fecha_creacion, id) de la última personalización de la página anterior
+        """
+        return self.store.listar_pagina(limite, despues)
+    
+    def iterar_personalizaciones(self) -> Iterator[Personalizacion]:
+        """Recorrer todas las personalizaciones sin cargarlas a la vez (exportación)"""
+        return self.store.iterar()
+    
+    def obtener_estadisticas(self, dias: int = 30) -> Optional[Dict[str, Any]]:
+        """Totales y serie diaria de los últimos `dias` días (None si el almacenamiento no los mantiene)"""
+        if not hasattr(self.store, 'estadisticas'):
+            return None
+        return self.store.estadisticas(dias)
     
     def limpiar_personalizaciones_expiradas(self):
         """Limpiar personalizaciones expiradas"""
         from config import Config
-        from datetime import datetime, timedelta
         
-        ahora = datetime.utcnow()
-        expiradas = []
-        
-        for id_personalizacion, personalizacion in self.personalizaciones.items():
-            if ahora - personalizacion.fecha_creacion > Config.PERSONALIZACION_EXPIRY:
-                expiradas.append(id_personalizacion)
+        expiradas = self.store.limpiar_expiradas(Config.PERSONALIZACION_EXPIRY)
+        if self.cache is not None:
+            for id_personalizacion in expiradas:
+                self.cache.invalidar(id_personalizacion)
+        return len(expiradas)
+    
+    def iniciar_barrido(self, intervalo: float):
+        """
+        Limpiar las personalizaciones expiradas cada `intervalo` segundos en segundo plano
         
-        for id_personalizacion in expiradas:
-            del self.personalizaciones[id_personalizacion]
+        Los hilos no sobreviven al fork de gunicorn, así que cada worker
+        hijo vuelve a arrancar su propio barrido.
+        """
+        if self._barrido_intervalo is None:
+            os.register_at_fork(after_in_child=self._reanudar_barrido)
+        self._barrido_intervalo = intervalo
+        self._arrancar_hilo_barrido()
+    
+    def detener_barrido(self):
+        """Detener el barrido en segundo plano"""
+        self._barrido_intervalo = None
+        self._barrido_detener.set()
+    
+    def pausar_barrido(self, timeout: float = 5):
+        """
+        Detener el hilo de barrido de este proceso y esperar a que termine
         
-        return len(expiradas)
+        A diferencia de `detener_barrido`, los procesos hijos creados después
+        (workers de gunicorn) siguen arrancando su propio barrido. Se usa en el
+        maestro antes del fork para que ningún hilo tenga cerrojos tomados.
+        """
+        self._barrido_detener.set()
+        hilo = self._barrido_hilo
+        if hilo is not None and hilo is not threading.current_thread():
+            hilo.join(timeout)
+        self._barrido_hilo = None
+    
+    def _reanudar_barrido(self):
+        if self._barrido_intervalo is not None:
+            self._arrancar_hilo_barrido()
+    
+    def _arrancar_hilo_barrido(self):
+        self._barrido_detener = threading.Event()
+        hilo = threading.Thread(target=self._bucle_barrido, args=(self._barrido_detener,),
+                                name='barrido-expiradas', daemon=True)
+        hilo.start()
+        self._barrido_hilo = hilo
+    
+    def _bucle_barrido(self, detener: threading.Event):
+        logger = logging.getLogger(__name__)
+        while not detener.wait(self._barrido_intervalo or 0):
+            try:
+                eliminadas = self.limpiar_personalizaciones_expiradas()
+                if eliminadas:
+                    logger.info(f"Barrido: {eliminadas} personalizaciones expiradas")
+            except Exception as e:
+                logger.error(f"Error en el barrido de expiradas: {str(e)}")
@@ -0,0 +1,91 @@
+"""
+Caché de páginas renderizadas para Teteu Cueros
+"""
+
+import hashlib
+import os
+import threading
+from datetime import datetime
+from typing import Any, Dict, Hashable, Optional
+
+from flask import render_template
+
+from cache import TTLCache
+
+
+class CachePaginas:
+    """
+    Guarda el HTML renderizado por variante (plantilla + clave)
+
+    Las páginas cacheadas solo deben depender de su clave: `/`, el formulario
+    por modelo y `/ver/<id>` por (producto, color, herrajes, imagen). El ID no
+    aparece en el HTML (la página comparte `window.location.href`), así que
+    todas las personalizaciones de la misma variante comparten entrada.
+
+    `version` es el hash del contenido de las plantillas: cambia con cada
+    despliegue que las modifica y sirve también para validadores HTTP. Con
+    `vigilar_plantillas` (modo debug) se comprueban sus mtimes en cada
+    render y la caché se vacía si alguna cambió.
+    """
+
+    def __init__(self, template_dir: str, max_entradas: int = 256, vigilar_plantillas: bool = False):
+        """
+        Args:
+            template_dir: Directorio de plantillas de la aplicación
+            max_entradas: Páginas distintas a conservar (0 desactiva la caché)
+            vigilar_plantillas: Invalidar al cambiar una plantilla (modo debug)
+        """
+        self.template_dir = template_dir
+        self.vigilar_plantillas = vigilar_plantillas
+        self.cache = TTLCache(max_entradas=max_entradas, ttl=float('inf')) if max_entradas > 0 else None
+        self._lock = threading.Lock()
+        self._mtimes: Dict[str, float] = {}
+        self.version = self._calcular_version()
+
+    def _calcular_version(self) -> str:
+        resumen = hashlib.sha256()
+        mtimes = {}
+        for raiz, _, archivos in os.walk(self.template_dir):
+            for nombre in sorted(archivos):
+                ruta = os.path.join(raiz, nombre)
+                mtimes[ruta] = os.stat(ruta).st_mtime
+                resumen.update(nombre.encode())
+                with open(ruta, 'rb') as archivo:
+                    resumen.update(archivo.read())
+        self._mtimes = mtimes
+        # Fecha de la última modificación de plantillas (para Last-Modified)
+        self.fecha_version = datetime.utcfromtimestamp(max(mtimes.values(), default=0))
+        return resumen.hexdigest()[:12]
+
+    def _plantillas_cambiaron(self) -> bool:
+        try:
+            actuales = {
+                os.path.join(raiz, nombre): os.stat(os.path.join(raiz, nombre)).st_mtime
+                for raiz, _, archivos in os.walk(self.template_dir) for nombre in archivos
+            }
+        except OSError:
+            return True
+        return actuales != self._mtimes
+
+    def render(self, clave: Hashable, plantilla: str, **contexto: Any) -> str:
+        """Renderizar `plantilla` o devolver el HTML ya cacheado para `clave`"""
+        if self.cache is None:
+            return render_template(plantilla, **contexto)
+
+        if self.vigilar_plantillas and self._plantillas_cambiaron():
+            with self._lock:
+                self.version = self._calcular_version()
+                self.cache.limpiar()
+
+        clave = (plantilla, clave)
+        html = self.cache.get(clave)
+        if html is None:
+            html = render_template(plantilla, **contexto)
+            self.cache.set(clave, html)
+        return html
+
+    def estadisticas(self) -> Optional[Dict[str, Any]]:
+        """Contadores de aciertos de la caché de páginas"""
+        if self.cache is None:
+            return None
+        return dict(self.cache.estadisticas(), version_plantillas=self.version)
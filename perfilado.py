@@ -0,0 +1,161 @@
+"""
+Perfilado opcional de peticiones y registro de peticiones lentas para Teteu Cueros
+
+Con `PROFILE_SAMPLE_RATE` > 0 se perfila con cProfile esa fracción de las
+peticiones y cada perfil se guarda en `PROFILE_DIR` como archivo `.prof`
+(`python -m pstats archivo.prof` o snakeviz). Cada proceso perfila como
+mucho una petición a la vez; las que coinciden con ella no se perfilan. Con `SLOW_REQUEST_MS` > 0 se
+registra cada petición que supere ese umbral con el desglose de su tiempo:
+almacenamiento, render de plantillas y sistema de archivos (static).
+"""
+
+import cProfile
+import itertools
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from flask import before_render_template, g, has_request_context, request, template_rendered
+
+from ciclo_vida import PRECALENTAMIENTO
+
+SEGMENTOS = ('store', 'plantillas', 'fs')
+
+# Un solo perfil activo por proceso: desde Python 3.12 cProfile usa el
+# identificador de herramienta de `sys.monitoring`, que es global, y un
+# segundo `enable()` en otro hilo falla. Si otra petición se está perfilando,
+# esta se queda sin perfil en lugar de esperar
+_perfilando = threading.Lock()
+
+
+@contextmanager
+def medir(segmento: str):
+    """Sumar la duración del bloque al segmento `segmento` de la petición en curso"""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        if has_request_context() and 'desglose' in g:
+            g.desglose[segmento] += time.perf_counter() - inicio
+
+
+class _StoreMedido:
+    """Envoltorio del almacenamiento que cuenta el tiempo de cada operación como 'store'"""
+
+    _OPERACIONES = frozenset(('guardar', 'guardar_lote', 'obtener', 'eliminar', 'listar',
+                              'listar_pagina', 'limpiar_expiradas', 'estadisticas'))
+
+    def __init__(self, store):
+        object.__setattr__(self, '_store', store)
+
+    def __getattr__(self, nombre):
+        atributo = getattr(self._store, nombre)
+        if nombre not in self._OPERACIONES:
+            return atributo
+
+        def operacion(*args, **kwargs):
+            with medir('store'):
+                return atributo(*args, **kwargs)
+        return operacion
+
+    def __setattr__(self, nombre, valor):
+        setattr(self._store, nombre, valor)
+
+
+def registrar_perfilado(app, manager, fraccion: float, directorio: str, umbral_ms: float):
+    """
+    Instrumentar la aplicación para perfilar y registrar peticiones lentas
+
+    Args:
+        app: Aplicación Flask
+        manager: `PersonalizacionManager` (su almacenamiento se envuelve para medirlo)
+        fraccion: Fracción de peticiones a perfilar con cProfile (0 = ninguna)
+        directorio: Dónde escribir los perfiles `.prof`
+        umbral_ms: Latencia a partir de la cual se registra la petición (0 = nunca)
+    """
+    logger = logging.getLogger(__name__)
+    if fraccion > 0:
+        os.makedirs(directorio, exist_ok=True)
+    secuencia = itertools.count()
+
+    manager.store = _StoreMedido(manager.store)
+
+    static = app.view_functions.get('static')
+    if static is not None:
+        def static_medido(*args, **kwargs):
+            with medir('fs'):
+                return static(*args, **kwargs)
+        app.view_functions['static'] = static_medido
+
+    def inicio_render(sender, template, context, **extra):
+        if 'desglose' in g:
+            g.inicio_render = time.perf_counter()
+
+    def fin_render(sender, template, context, **extra):
+        inicio = g.pop('inicio_render', None)
+        if inicio is not None and 'desglose' in g:
+            g.desglose['plantillas'] += time.perf_counter() - inicio
+
+    before_render_template.connect(inicio_render, app, weak=False)
+    template_rendered.connect(fin_render, app, weak=False)
+
+    @app.before_request
+    def iniciar_perfilado():
+        if PRECALENTAMIENTO in request.environ:
+            return
+        g.inicio_perfilado = time.perf_counter()
+        g.desglose = dict.fromkeys(SEGMENTOS, 0.0)
+        if fraccion > 0 and random.random() < fraccion and _perfilando.acquire(blocking=False):
+            perfil = cProfile.Profile()
+            try:
+                perfil.enable()
+            except ValueError as e:
+                # Otra herramienta (un depurador, coverage) ocupa el identificador de perfilado
+                _perfilando.release()
+                logger.warning(f"No se pudo iniciar el perfil: {str(e)}")
+                return
+            g.perfil = perfil
+
+    def detener_perfil():
+        perfil = g.pop('perfil', None)
+        if perfil is not None:
+            perfil.disable()
+            _perfilando.release()
+        return perfil
+
+    @app.after_request
+    def terminar_perfilado(respuesta):
+        inicio = g.pop('inicio_perfilado', None)
+        if inicio is None:
+            return respuesta
+        milisegundos = (time.perf_counter() - inicio) * 1000
+        desglose = g.pop('desglose')
+        endpoint = request.endpoint or 'sin_ruta'
+
+        archivo = None
+        perfil = detener_perfil()
+        if perfil is not None:
+            archivo = os.path.join(directorio, f"{datetime.utcnow():%Y%m%dT%H%M%S}-{endpoint}-"
+                                               f"{milisegundos:.0f}ms-{os.getpid()}-{next(secuencia)}.prof")
+            try:
+                perfil.dump_stats(archivo)
+            except OSError as e:
+                logger.error(f"No se pudo guardar el perfil: {str(e)}")
+                archivo = None
+
+        if umbral_ms and milisegundos >= umbral_ms:
+            partes = ', '.join(f"{segmento} {desglose[segmento] * 1000:.1f} ms" for segmento in SEGMENTOS)
+            resto = milisegundos - sum(desglose.values()) * 1000
+            logger.warning(f"Petición lenta: {request.method} {request.path} -> {respuesta.status_code} "
+                           f"en {milisegundos:.1f} ms ({partes}, resto {resto:.1f} ms)"
+                           + (f" perfil={archivo}" if archivo else ""))
+        return respuesta
+
+    @app.teardown_request
+    def liberar_perfil(error=None):
+        # Una excepción sin manejar se salta after_request: el perfil no puede quedarse activo
+        detener_perfil()
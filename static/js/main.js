@@ -33,100 +33,130 @@ function initializeHerrajesSelector() {
     }
 }
 
+// URL con huella de un archivo de /static (window.ASSETS lo inyecta base.html)
+function assetUrl(path) {
+    return (window.ASSETS && window.ASSETS[path]) || path;
+}
+
+// Catálogo de modelos, colores y herrajes: manifiesto JSON versionado
+// (window.CATALOGO_URL lo inyecta base.html; la respuesta es inmutable y se cachea)
+let catalogPromise = null;
+
+function loadCatalog() {
+    if (!catalogPromise) {
+        catalogPromise = fetch(window.CATALOGO_URL)
+            .then(response => {
+                if (!response.ok) throw new Error(`Catálogo no disponible: ${response.status}`);
+                return response.json();
+            })
+            .catch(error => {
+                console.error('Error:', error);
+                return null;
+            });
+    }
+    return catalogPromise;
+}
+
+// Opción del catálogo por valor (la primera si el valor no es conocido)
+function findOption(options, value) {
+    return options.find(option => option.valor === value) || options[0];
+}
+
+// Cambiar la imagen mostrada. Si la nueva tiene derivados responsivos
+// (window.IMAGENES, de `python imagenes.py build`) se cambian srcset y
+// <source> por los suyos; si no, se descartan y se carga el original
+function setImageSource(img, path) {
+    const derivados = window.IMAGENES && window.IMAGENES[path];
+    const picture = img.parentElement && img.parentElement.tagName === 'PICTURE' ? img.parentElement : null;
+    
+    if (!derivados) {
+        img.removeAttribute('srcset');
+        if (picture) picture.querySelectorAll('source').forEach(source => source.remove());
+        img.src = assetUrl(path);
+        return;
+    }
+    
+    // Sin `sizes` (la imagen inicial no tenía derivados) el navegador supondría 100vw
+    if (img.getAttribute('sizes')) {
+        if (picture) {
+            let source = picture.querySelector('source[type="image/webp"]');
+            if (!source) {
+                source = document.createElement('source');
+                source.type = 'image/webp';
+                source.sizes = img.getAttribute('sizes');
+                picture.insertBefore(source, img);
+            }
+            source.srcset = derivados.webp;
+        }
+        img.srcset = derivados.respaldo;
+    } else {
+        img.removeAttribute('srcset');
+    }
+    img.src = derivados.src;
+}
+
 // Actualizar preview de color
-function updateColorPreview(color) {
+async function updateColorPreview(color) {
     const colorPreview = document.getElementById('colorPreview');
-    if (!colorPreview) return;
+    const catalogo = await loadCatalog();
+    if (!colorPreview || !catalogo) return;
     
-    const colorMap = {
-        'negro': '/static/colors1.png',
-        'marron': '/static/colors2.png',
-        'marron claro': '/static/colors3.png'
-    };
-    
-    const imagePath = colorMap[color] || '/static/colors1.png';
-    colorPreview.src = imagePath;
+    setImageSource(colorPreview, findOption(catalogo.colores, color).muestra);
 }
 
 // Actualizar preview de herrajes
-function updateHerrajesPreview(herrajes) {
+async function updateHerrajesPreview(herrajes) {
     const herrajesPreview = document.getElementById('herrajesPreview');
-    if (!herrajesPreview) return;
-    
-    const herrajesMap = {
-        'plata': '/static/h1.png',
-        'dorado': '/static/h2.png'
-    };
+    const catalogo = await loadCatalog();
+    if (!herrajesPreview || !catalogo) return;
     
-    const imagePath = herrajesMap[herrajes] || '/static/h1.png';
-    herrajesPreview.src = imagePath;
+    setImageSource(herrajesPreview, findOption(catalogo.herrajes, herrajes).muestra);
 }
 
 // Actualizar imagen de la cartera
-function updateCarteraImage() {
+async function updateCarteraImage() {
     const colorSelect = document.getElementById('colorSelect');
     const herrajesSelect = document.getElementById('herrajesSelect');
     const carteraImg = document.getElementById('carteraImg');
+    const catalogo = await loadCatalog();
     
-    if (!colorSelect || !herrajesSelect || !carteraImg) return;
-    
-    const color = colorSelect.value;
-    const herrajes = herrajesSelect.value;
+    if (!colorSelect || !herrajesSelect || !carteraImg || !catalogo) return;
     
-    // Mapear valores a nombres de archivo
-    const colorFile = mapColorToFile(color);
-    const herrajesFile = mapHerrajesToFile(herrajes);
-    
-    // Determinar modelo
-    const modelo = getCurrentModel();
-    
-    // Construir ruta de imagen
-    const imagePath = `/static/${modelo}_${colorFile}_${herrajesFile}.jpg`;
+    // Ruta de la variante precalculada en el catálogo
+    const modelo = getCurrentModel(catalogo);
+    const color = findOption(catalogo.colores, colorSelect.value).valor;
+    const herrajes = findOption(catalogo.herrajes, herrajesSelect.value).valor;
+    const imagePath = catalogo.imagenes[`${modelo.id}|${color}|${herrajes}`] || modelo.imagen;
     
     // Actualizar imagen con efecto de transición
     carteraImg.style.opacity = '0.5';
-    carteraImg.src = imagePath;
-    
     carteraImg.onload = function() {
         carteraImg.style.opacity = '1';
     };
     
     carteraImg.onerror = function() {
         // Si la imagen no existe, mostrar imagen por defecto
-        carteraImg.src = `/static/${modelo}.jpg`;
+        carteraImg.onerror = null;
+        setImageSource(carteraImg, modelo.imagen);
         carteraImg.style.opacity = '1';
     };
+    
+    setImageSource(carteraImg, imagePath);
 }
 
-// Mapear color a nombre de archivo
-function mapColorToFile(color) {
-    const colorMap = {
-        'negro': 'negro',
-        'marron': 'marron',
-        'marron claro': 'marron_claro'
-    };
-    return colorMap[color] || 'negro';
-}
-
-// Mapear herrajes a nombre de archivo
-function mapHerrajesToFile(herrajes) {
-    const herrajesMap = {
-        'plata': 'plata',
-        'dorado': 'dorado'
-    };
-    return herrajesMap[herrajes] || 'plata';
+// Nombre del producto elegido (parámetro `modelo` de la URL)
+function getCurrentProductName() {
+    const urlParams = new URLSearchParams(window.location.search);
+    return urlParams.get('modelo') || 'Cartera';
 }
 
-// Obtener modelo actual
-function getCurrentModel() {
-    // Obtener modelo de la URL o del contexto
-    const urlParams = new URLSearchParams(window.location.search);
-    const modelo = urlParams.get('modelo') || '';
-    
-    if (modelo.toLowerCase().includes('urbana')) {
-        return 'modelo2';
-    }
-    return 'modelo1';
+// Modelo del catálogo para el producto actual (por palabra clave, como en el servidor)
+function getCurrentModel(catalogo) {
+    const producto = getCurrentProductName().toLowerCase();
+    const modelo = catalogo.modelos.find(
+        candidato => candidato.palabras_clave.some(palabra => producto.includes(palabra))
+    );
+    return modelo || catalogo.modelos[0];
 }
 
 // Inicializar formulario
@@ -151,7 +181,7 @@ async function handleFormSubmit(e) {
         
         // Validar datos
         const formData = new FormData(form);
-        const validationResult = validateFormData(formData);
+        const validationResult = validateFormData(formData, await loadCatalog());
         
         if (!validationResult.isValid) {
             showError(validationResult.message);
@@ -160,8 +190,8 @@ async function handleFormSubmit(e) {
         }
         
         // Enviar datos
-        const modelo = getCurrentModel();
-        const response = await fetch(`/personalizar?modelo=${encodeURIComponent(modelo)}`, {
+        const producto = getCurrentProductName();
+        const response = await fetch(`/personalizar?modelo=${encodeURIComponent(producto)}`, {
             method: 'POST',
             body: formData
         });
@@ -186,13 +216,13 @@ async function handleFormSubmit(e) {
     }
 }
 
-// Validar datos del formulario
-function validateFormData(formData) {
+// Validar datos del formulario (sin catálogo solo se exige un valor: el servidor valida igualmente)
+function validateFormData(formData, catalogo) {
     const color = formData.get('color');
     const herrajes = formData.get('herrajes');
     
-    const validColors = ['negro', 'marron', 'marron claro'];
-    const validHerrajes = ['plata', 'dorado'];
+    const validColors = catalogo ? catalogo.colores.map(option => option.valor) : [color];
+    const validHerrajes = catalogo ? catalogo.herrajes.map(option => option.valor) : [herrajes];
     
     if (!color || !validColors.includes(color)) {
         return {
@@ -0,0 +1,646 @@
+"""
+Almacenamientos de personalizaciones para Teteu Cueros
+"""
+
+import bisect
+import heapq
+import sys
+import threading
+from array import array
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from operator import attrgetter
+from typing import Any, Callable, Optional, Dict, Iterable, Iterator, List, Tuple
+
+import ids
+from models import Personalizacion, CapacidadExcedida
+
+
+POLITICAS_CAPACIDAD = ('antiguas', 'lru', 'rechazar')
+
+
+def tamano_aproximado(personalizacion: Personalizacion) -> int:
+    """Bytes aproximados que ocupa una personalización en memoria (objeto y atributos)"""
+    tamano = sys.getsizeof(personalizacion)
+    atributos = getattr(personalizacion, '__dict__', None)
+    if atributos is not None:
+        tamano += sys.getsizeof(atributos)
+    for valor in (personalizacion.id, personalizacion.producto, personalizacion.color,
+                  personalizacion.herrajes, personalizacion.fecha_creacion):
+        tamano += sys.getsizeof(valor)
+    return tamano
+
+
+def _pagina_en_memoria(personalizaciones: Iterable[Personalizacion], limite: int,
+                      despues: Optional[Tuple[datetime, str]]) -> List[Personalizacion]:
+    """Página por cursor (fecha_creacion, id) descendente sobre un recorrido en memoria"""
+    clave = attrgetter('fecha_creacion', 'id')
+    if despues is not None:
+        personalizaciones = (p for p in personalizaciones if clave(p) < despues)
+    return heapq.nlargest(limite, personalizaciones, key=clave)
+
+
+def _iterar_por_paginas(listar_pagina: Callable[[int, Optional[Tuple[datetime, str]]], List[Personalizacion]],
+                        tamano_lote: int = 500) -> Iterator[Personalizacion]:
+    """Recorrer un almacenamiento en memoria pidiendo páginas por cursor (nunca todo de una vez)"""
+    despues = None
+    while True:
+        pagina = listar_pagina(tamano_lote, despues)
+        yield from pagina
+        if len(pagina) < tamano_lote:
+            return
+        despues = (pagina[-1].fecha_creacion, pagina[-1].id)
+
+
+class MemoryStore:
+    """
+    Almacenamiento en memoria del proceso (no se comparte entre workers)
+
+    Seguro con hilos (workers gthread): las escrituras toman un único lock y
+    las lecturas no lo toman, así que `/ver/<id>` nunca espera. Con la
+    política 'lru' la lectura solo reordena si el lock está libre; si no, se
+    omite ese toque (LRU aproximado) en lugar de bloquear.
+    """
+
+    # Entrada del diccionario + tupla del montículo de expiración por registro
+    _SOBRECARGA_INDICES = 100 + sys.getsizeof((None, None))
+
+    def __init__(self, max_registros: Optional[int] = None, politica: str = 'antiguas'):
+        """
+        Args:
+            max_registros: Capacidad máxima (None = sin límite)
+            politica: Qué hacer al llenarse: 'antiguas' (desalojar la más antigua),
+                'lru' (desalojar la menos vista) o 'rechazar' (`CapacidadExcedida`)
+        """
+        if politica not in POLITICAS_CAPACIDAD:
+            raise ValueError(f"Política de capacidad desconocida: {politica}")
+
+        self.max_registros = max_registros
+        self.politica = politica
+        # Orden de inserción (o de último acceso con 'lru'): el primero es el próximo a desalojar
+        self.personalizaciones: "OrderedDict[str, Personalizacion]" = OrderedDict()
+        # Montículo (fecha_creacion, id): la limpieza solo visita lo ya expirado.
+        # Las bajas no lo tocan; sus entradas se descartan al salir del montículo.
+        self._expiracion: List[Tuple[datetime, str]] = []
+        self.bytes_totales = 0
+        self.desalojos = 0
+        self.rechazos = 0
+        self.al_desalojar: Optional[Callable[[str], None]] = None
+        self._lock = threading.Lock()
+
+    def guardar(self, personalizacion: Personalizacion) -> bool:
+        """Guardar una personalización respetando la capacidad máxima"""
+        with self._lock:
+            if self.max_registros is not None and personalizacion.id not in self.personalizaciones:
+                while len(self.personalizaciones) >= self.max_registros:
+                    if self.politica == 'rechazar':
+                        self.rechazos += 1
+                        raise CapacidadExcedida(f"Se alcanzó el máximo de {self.max_registros} personalizaciones")
+                    id_desalojado, _ = self._quitar(next(iter(self.personalizaciones)))
+                    self.desalojos += 1
+                    if self.al_desalojar is not None:
+                        self.al_desalojar(id_desalojado)
+
+            self._quitar(personalizacion.id)
+            self.personalizaciones[personalizacion.id] = personalizacion
+            self.bytes_totales += tamano_aproximado(personalizacion)
+            heapq.heappush(self._expiracion, (personalizacion.fecha_creacion, personalizacion.id))
+            self._compactar_expiracion()
+            return True
+
+    def _quitar(self, id_personalizacion: str) -> Tuple[str, Optional[Personalizacion]]:
+        """Quitar un registro y descontar su memoria"""
+        personalizacion = self.personalizaciones.pop(id_personalizacion, None)
+        if personalizacion is not None:
+            self.bytes_totales -= tamano_aproximado(personalizacion)
+        return id_personalizacion, personalizacion
+
+    def _compactar_expiracion(self):
+        """Reconstruir el montículo si acumula demasiadas entradas de registros ya eliminados"""
+        if len(self._expiracion) > 2 * len(self.personalizaciones) + 1024:
+            self._expiracion = [(p.fecha_creacion, p.id) for p in self.personalizaciones.values()]
+            heapq.heapify(self._expiracion)
+
+    def obtener(self, id_personalizacion: str) -> Optional[Personalizacion]:
+        """Obtener una personalización por ID"""
+        personalizacion = self.personalizaciones.get(id_personalizacion)
+        if personalizacion is not None and self.politica == 'lru' and self._lock.acquire(blocking=False):
+            try:
+                self.personalizaciones.move_to_end(id_personalizacion)
+            except KeyError:
+                # Eliminada entre la lectura y el reordenamiento
+                pass
+            finally:
+                self._lock.release()
+        return personalizacion
+
+    def eliminar(self, id_personalizacion: str) -> bool:
+        """Eliminar una personalización"""
+        with self._lock:
+            return self._quitar(id_personalizacion)[1] is not None
+
+    def registros(self) -> int:
+        """Número de personalizaciones guardadas (sin recorrerlas)"""
+        return len(self.personalizaciones)
+
+    def listar(self) -> List[Personalizacion]:
+        """Listar todas las personalizaciones"""
+        with self._lock:
+            return list(self.personalizaciones.values())
+
+    def listar_pagina(self, limite: int, despues: Optional[Tuple[datetime, str]] = None) -> List[Personalizacion]:
+        """Página de personalizaciones de la más reciente a la más antigua"""
+        # Se recorre el diccionario sin copiarlo: el lock solo frena a los escritores
+        with self._lock:
+            return _pagina_en_memoria(self.personalizaciones.values(), limite, despues)
+
+    def iterar(self) -> Iterator[Personalizacion]:
+        """Recorrer todas las personalizaciones por páginas, de la más reciente a la más antigua"""
+        return _iterar_por_paginas(self.listar_pagina)
+
+    def limpiar_expiradas(self, expiracion: timedelta) -> List[str]:
+        """Eliminar las personalizaciones más antiguas que `expiracion` y devolver sus IDs"""
+        limite = datetime.utcnow() - expiracion
+        expiradas = []
+
+        with self._lock:
+            while self._expiracion and self._expiracion[0][0] < limite:
+                fecha, id_personalizacion = heapq.heappop(self._expiracion)
+                personalizacion = self.personalizaciones.get(id_personalizacion)
+                if personalizacion is not None and personalizacion.fecha_creacion == fecha:
+                    self._quitar(id_personalizacion)
+                    expiradas.append(id_personalizacion)
+
+        return expiradas
+
+    def estadisticas_memoria(self) -> Dict[str, Any]:
+        """Uso de memoria aproximado para monitorización"""
+        registros = len(self.personalizaciones)
+        total = self.bytes_totales + registros * self._SOBRECARGA_INDICES
+        return {
+            'registros': registros,
+            'max_registros': self.max_registros,
+            'politica': self.politica,
+            'bytes_totales': total,
+            'bytes_por_registro': round(total / registros) if registros else 0,
+            'desalojos': self.desalojos,
+            'rechazos': self.rechazos
+        }
+
+
+class _Codificador:
+    """
+    Tabla de valores repetidos codificados como enteros pequeños
+
+    Cada valor distinto se guarda una sola vez. Los valores no se liberan al
+    quitar una fila: `ColumnarStore._compactar` construye la tabla nueva
+    solo con los de las filas vivas, así que su tamaño queda acotado por el
+    de las columnas aunque el valor venga del cliente (`producto`).
+    """
+
+    def __init__(self, valores: Tuple[str, ...] = ()):
+        self.valores: List[str] = []
+        self._codigos: Dict[str, int] = {}
+        for valor in valores:
+            self.codigo(valor)
+
+    def codigo(self, valor: str) -> int:
+        codigo = self._codigos.get(valor)
+        if codigo is None:
+            codigo = len(self.valores)
+            self.valores.append(valor)
+            self._codigos[valor] = codigo
+        return codigo
+
+    def bytes_totales(self) -> int:
+        """Memoria aproximada de la tabla (lista, diccionario y cadenas)"""
+        return (sys.getsizeof(self.valores) + sys.getsizeof(self._codigos)
+                + sum(sys.getsizeof(valor) for valor in self.valores))
+
+
+_EPOCA = datetime(1970, 1, 1)
+
+
+class _Tabla:
+    """
+    Columnas de un `ColumnarStore`
+
+    Las escrituras añaden filas al final y marcan bajas; la compactación no
+    reescribe una tabla en uso sino que construye otra y la publica de una
+    vez, así que un lector que tomó la referencia siempre ve columnas
+    coherentes entre sí.
+    """
+
+    __slots__ = ('ids', 'producto', 'color', 'herraje', 'fecha', 'viva', 'indice', 'productos', 'cabecera',
+                 'fecha_maxima', 'retraso')
+
+    def __init__(self):
+        self.ids = bytearray()
+        self.producto = array('I')
+        self.color = array('B')
+        self.herraje = array('B')
+        self.fecha = array('q')
+        self.viva = bytearray()
+        self.indice: Dict[bytes, int] = {}
+        # Los productos llegan del cliente: cada tabla guarda solo los de sus filas
+        self.productos = _Codificador()
+        self.cabecera = 0
+        # Las filas van casi ordenadas por fecha (los hilos la asignan antes de
+        # tomar el lock): `retraso` es lo más que una fila queda por detrás de
+        # la fecha máxima de las anteriores, y acota cuánto recorrer al paginar
+        self.fecha_maxima = -(1 << 63)
+        self.retraso = 0
+
+
+class ColumnarStore:
+    """
+    Almacenamiento en memoria compacto, en columnas
+
+    Cada registro ocupa un ID binario de 16 bytes (más uno de formato), tres códigos enteros para
+    producto/color/herrajes (tablas de valores distintos) y una marca de tiempo
+    en microsegundos desde la época. Los objetos `Personalizacion` solo se
+    materializan al consultarlos.
+
+    Las filas se añaden en orden de creación: expirar o desalojar la más
+    antigua avanza un puntero de cabecera, y las filas muertas se compactan
+    cuando superan la mitad de la tabla.
+
+    Las lecturas no toman ningún lock: leen de la tabla publicada en ese
+    momento. Una fila se escribe en todas sus columnas antes de entrar en el
+    índice, y la compactación construye la tabla nueva fuera del lock de
+    escritura y solo lo toma para incorporar lo escrito entretanto y
+    publicarla, así que `/ver/<id>` nunca espera a una reescritura O(n).
+    """
+
+    # Clave por fila: 16 bytes del ID + 1 byte de formato (base62 o uuid heredado)
+    _ANCHO_ID = 17
+    # Filas por debajo de las cuales no merece la pena compactar
+    _MIN_COMPACTAR = 1024
+
+    def __init__(self, max_registros: Optional[int] = None, politica: str = 'antiguas'):
+        """
+        Args:
+            max_registros: Capacidad máxima (None = sin límite)
+            politica: 'antiguas' o 'rechazar' (el orden por filas no permite 'lru')
+        """
+        from catalogo import CATALOGO
+
+        if politica not in ('antiguas', 'rechazar'):
+            raise ValueError(f"Política de capacidad no soportada por el almacenamiento columnar: {politica}")
+
+        self.max_registros = max_registros
+        self.politica = politica
+        self.desalojos = 0
+        self.rechazos = 0
+        self.al_desalojar: Optional[Callable[[str], None]] = None
+
+        self._colores = _Codificador(CATALOGO.valores_colores)
+        self._herrajes = _Codificador(CATALOGO.valores_herrajes)
+        self._tabla = _Tabla()
+        self._vivas = 0
+        self._lock = threading.Lock()
+        # Una sola compactación a la vez; mientras dura, las bajas se anotan para aplicarlas a la tabla nueva
+        self._lock_compactacion = threading.Lock()
+        self._bajas_durante_compactacion: Optional[List[bytes]] = None
+
+    @staticmethod
+    def _id_a_bytes(id_personalizacion: str) -> Optional[bytes]:
+        binario = ids.id_a_bytes(id_personalizacion)
+        if binario is None:
+            return None
+        return binario[0] + bytes((binario[1],))
+
+    @staticmethod
+    def _bytes_a_id(clave: bytes) -> str:
+        return ids.bytes_a_id(clave[:16], clave[16])
+
+    @staticmethod
+    def _microsegundos(fecha: datetime) -> int:
+        diferencia = fecha - _EPOCA
+        return (diferencia.days * 86400 + diferencia.seconds) * 1000000 + diferencia.microseconds
+
+    @classmethod
+    def _fila_id(cls, tabla: _Tabla, fila: int) -> bytes:
+        return bytes(tabla.ids[fila * cls._ANCHO_ID:(fila + 1) * cls._ANCHO_ID])
+
+    def _materializar(self, tabla: _Tabla, fila: int) -> Personalizacion:
+        return Personalizacion(
+            producto=tabla.productos.valores[tabla.producto[fila]],
+            color=self._colores.valores[tabla.color[fila]],
+            herrajes=self._herrajes.valores[tabla.herraje[fila]],
+            id_personalizacion=self._bytes_a_id(self._fila_id(tabla, fila)),
+            fecha_creacion=_EPOCA + timedelta(microseconds=tabla.fecha[fila])
+        )
+
+    @staticmethod
+    def _anadir_fila(tabla: _Tabla, clave: bytes, producto: str, color: int, herraje: int, fecha: int):
+        """Escribir una fila en todas las columnas y, por último, publicarla en el índice"""
+        if fecha < tabla.fecha_maxima:
+            tabla.retraso = max(tabla.retraso, tabla.fecha_maxima - fecha)
+        else:
+            tabla.fecha_maxima = fecha
+        tabla.ids += clave
+        tabla.producto.append(tabla.productos.codigo(producto))
+        tabla.color.append(color)
+        tabla.herraje.append(herraje)
+        tabla.fecha.append(fecha)
+        tabla.viva.append(1)
+        tabla.indice[clave] = len(tabla.fecha) - 1
+
+    def guardar(self, personalizacion: Personalizacion) -> bool:
+        """Guardar una personalización respetando la capacidad máxima"""
+        clave = self._id_a_bytes(personalizacion.id)
+        if clave is None:
+            raise ValueError(f"ID no soportado por el almacenamiento columnar: {personalizacion.id}")
+        fecha = self._microsegundos(personalizacion.fecha_creacion)
+
+        with self._lock:
+            tabla = self._tabla
+            self._quitar(tabla, clave)
+            if self.max_registros is not None:
+                while self._vivas >= self.max_registros:
+                    if self.politica == 'rechazar':
+                        self.rechazos += 1
+                        raise CapacidadExcedida(f"Se alcanzó el máximo de {self.max_registros} personalizaciones")
+                    id_desalojado = self._fila_id(tabla, self._primera_viva(tabla))
+                    self._quitar(tabla, id_desalojado)
+                    self.desalojos += 1
+                    if self.al_desalojar is not None:
+                        self.al_desalojar(self._bytes_a_id(id_desalojado))
+
+            self._anadir_fila(tabla, clave, personalizacion.producto,
+                              self._colores.codigo(personalizacion.color),
+                              self._herrajes.codigo(personalizacion.herrajes), fecha)
+            self._vivas += 1
+
+        self._compactar()
+        return True
+
+    def _quitar(self, tabla: _Tabla, clave: bytes) -> bool:
+        fila = tabla.indice.pop(clave, None)
+        if fila is None:
+            return False
+        tabla.viva[fila] = 0
+        self._vivas -= 1
+        if self._bajas_durante_compactacion is not None:
+            self._bajas_durante_compactacion.append(clave)
+        return True
+
+    @staticmethod
+    def _primera_viva(tabla: _Tabla) -> int:
+        """Avanzar la cabecera hasta la fila viva más antigua"""
+        while tabla.cabecera < len(tabla.viva) and not tabla.viva[tabla.cabecera]:
+            tabla.cabecera += 1
+        return tabla.cabecera
+
+    def obtener(self, id_personalizacion: str) -> Optional[Personalizacion]:
+        """Obtener una personalización por ID (sin lock; se materializa al vuelo)"""
+        clave = self._id_a_bytes(id_personalizacion)
+        if clave is None:
+            return None
+        tabla = self._tabla
+        fila = tabla.indice.get(clave)
+        if fila is None:
+            return None
+        return self._materializar(tabla, fila)
+
+    def eliminar(self, id_personalizacion: str) -> bool:
+        """Eliminar una personalización"""
+        clave = self._id_a_bytes(id_personalizacion)
+        if clave is None:
+            return False
+        with self._lock:
+            if not self._quitar(self._tabla, clave):
+                return False
+        self._compactar()
+        return True
+
+    def registros(self) -> int:
+        """Número de personalizaciones vivas (sin recorrer las columnas)"""
+        return self._vivas
+
+    def listar(self) -> List[Personalizacion]:
+        """Listar todas las personalizaciones"""
+        tabla = self._tabla
+        return [self._materializar(tabla, fila) for fila in range(tabla.cabecera, len(tabla.viva)) if tabla.viva[fila]]
+
+    def listar_pagina(self, limite: int, despues: Optional[Tuple[datetime, str]] = None) -> List[Personalizacion]:
+        """
+        Página de personalizaciones de la más reciente a la más antigua
+
+        Recorre las filas hacia atrás desde el cursor (búsqueda binaria en la
+        columna de fechas) y se detiene en cuanto ninguna fila anterior puede
+        entrar en la página: solo se materializan las `limite` devueltas.
+        """
+        if limite <= 0:
+            return []
+        tabla = self._tabla
+        # `retraso` se lee después del número de filas: cubre todas las que se recorren
+        fin = len(tabla.viva)
+        retraso = tabla.retraso
+        cursor = None
+        if despues is not None:
+            cursor = (self._microsegundos(despues[0]), despues[1])
+            # Ninguna fila posterior a una con fecha > cursor + retraso puede ser anterior al cursor
+            fin = bisect.bisect_right(tabla.fecha, cursor[0] + retraso, tabla.cabecera, fin)
+
+        # Montículo de mínimos (fecha, id, fila) con las `limite` mejores vistas
+        candidatas: List[Tuple[int, str, int]] = []
+        for fila in range(fin - 1, tabla.cabecera - 1, -1):
+            fecha = tabla.fecha[fila]
+            if len(candidatas) == limite and fecha + retraso < candidatas[0][0]:
+                break
+            if not tabla.viva[fila]:
+                continue
+            candidata = (fecha, self._bytes_a_id(self._fila_id(tabla, fila)), fila)
+            if cursor is not None and candidata[:2] >= cursor:
+                continue
+            if len(candidatas) < limite:
+                heapq.heappush(candidatas, candidata)
+            elif candidata > candidatas[0]:
+                heapq.heapreplace(candidatas, candidata)
+
+        return [self._materializar(tabla, fila) for _, _, fila in sorted(candidatas, reverse=True)]
+
+    def iterar(self) -> Iterator[Personalizacion]:
+        """Recorrer todas las personalizaciones por páginas, de la más reciente a la más antigua"""
+        return _iterar_por_paginas(self.listar_pagina)
+
+    def limpiar_expiradas(self, expiracion: timedelta) -> List[str]:
+        """Eliminar las personalizaciones más antiguas que `expiracion` y devolver sus IDs"""
+        limite_us = self._microsegundos(datetime.utcnow() - expiracion)
+        expiradas = []
+
+        with self._lock:
+            tabla = self._tabla
+            while tabla.cabecera < len(tabla.fecha) and (
+                    not tabla.viva[tabla.cabecera] or tabla.fecha[tabla.cabecera] < limite_us):
+                if tabla.viva[tabla.cabecera]:
+                    clave = self._fila_id(tabla, tabla.cabecera)
+                    self._quitar(tabla, clave)
+                    expiradas.append(self._bytes_a_id(clave))
+                tabla.cabecera += 1
+
+        self._compactar()
+        return expiradas
+
+    def _conviene_compactar(self, tabla: _Tabla) -> bool:
+        total = len(tabla.viva)
+        return total >= self._MIN_COMPACTAR and self._vivas * 2 <= total
+
+    def _copiar_filas(self, origen: _Tabla, destino: _Tabla, filas: Iterable[int]):
+        """Copiar las filas vivas de `origen` al final de `destino`"""
+        for fila in filas:
+            if origen.viva[fila]:
+                self._anadir_fila(destino, self._fila_id(origen, fila),
+                                  origen.productos.valores[origen.producto[fila]],
+                                  origen.color[fila], origen.herraje[fila], origen.fecha[fila])
+
+    def _compactar(self):
+        """
+        Reescribir las columnas sin filas muertas cuando estas superan la mitad
+
+        La tabla nueva se construye sin el lock de escritura; después, con el
+        lock, se le aplican las bajas ocurridas entretanto, se le añaden las
+        filas escritas entretanto y se publica.
+        """
+        if not self._conviene_compactar(self._tabla) or not self._lock_compactacion.acquire(blocking=False):
+            return
+        try:
+            with self._lock:
+                tabla = self._tabla
+                if not self._conviene_compactar(tabla):
+                    return
+                copiadas = len(tabla.viva)
+                desde = tabla.cabecera
+                self._bajas_durante_compactacion = []
+
+            # Ordenadas por fecha: la tabla nueva empieza sin retraso
+            nueva = _Tabla()
+            self._copiar_filas(tabla, nueva, sorted(range(desde, copiadas), key=tabla.fecha.__getitem__))
+
+            with self._lock:
+                # Las bajas se aplican antes de copiar las filas nuevas: una baja
+                # seguida de un alta con el mismo ID conserva el alta
+                for clave in self._bajas_durante_compactacion:
+                    fila = nueva.indice.pop(clave, None)
+                    if fila is not None:
+                        nueva.viva[fila] = 0
+                self._bajas_durante_compactacion = None
+                self._copiar_filas(tabla, nueva, range(copiadas, len(tabla.viva)))
+                self._tabla = nueva
+        finally:
+            self._lock_compactacion.release()
+
+    def estadisticas_memoria(self) -> Dict[str, Any]:
+        """Uso de memoria aproximado para monitorización"""
+        tabla = self._tabla
+        columnas = (tabla.ids, tabla.producto, tabla.color, tabla.herraje, tabla.fecha, tabla.viva)
+        total = sum(sys.getsizeof(columna) for columna in columnas)
+        total += sys.getsizeof(tabla.indice) + sum(sys.getsizeof(clave) for clave in tabla.indice)
+        total += sum(codificador.bytes_totales() for codificador in (tabla.productos, self._colores, self._herrajes))
+        return {
+            'registros': self._vivas,
+            'max_registros': self.max_registros,
+            'politica': self.politica,
+            'bytes_totales': total,
+            'bytes_por_registro': round(total / self._vivas) if self._vivas else 0,
+            'desalojos': self.desalojos,
+            'rechazos': self.rechazos
+        }
+
+
+class SQLiteStore:
+    """Almacenamiento compartido entre workers sobre `database.DatabaseManager`"""
+
+    def __init__(self, db_manager):
+        """
+        Args:
+            db_manager: Instancia de `database.DatabaseManager`
+        """
+        self.db = db_manager
+
+    def guardar(self, personalizacion: Personalizacion) -> bool:
+        """Guardar una personalización"""
+        return self.db.crear_personalizacion(
+            personalizacion.id,
+            personalizacion.producto,
+            personalizacion.color,
+            personalizacion.herrajes,
+            fecha_creacion=personalizacion.fecha_creacion
+        )
+
+    def guardar_lote(self, personalizaciones: List[Personalizacion]) -> List[bool]:
+        """Guardar varias personalizaciones en una sola transacción"""
+        return self.db.crear_personalizaciones([
+            (p.id, p.producto, p.color, p.herrajes, p.fecha_creacion) for p in personalizaciones
+        ])
+
+    def obtener(self, id_personalizacion: str) -> Optional[Personalizacion]:
+        """Obtener una personalización activa por ID (búsqueda por clave primaria)"""
+        fila = self.db.obtener_personalizacion(id_personalizacion)
+        if fila is None:
+            return None
+        return Personalizacion.from_dict(fila)
+
+    def eliminar(self, id_personalizacion: str) -> bool:
+        """Eliminar (desactivar) una personalización"""
+        return self.db.eliminar_personalizacion(id_personalizacion)
+
+    def listar(self) -> List[Personalizacion]:
+        """Listar las personalizaciones activas más recientes"""
+        return [Personalizacion.from_dict(fila) for fila in self.db.listar_personalizaciones()]
+
+    def listar_pagina(self, limite: int, despues: Optional[Tuple[datetime, str]] = None) -> List[Personalizacion]:
+        """Página de personalizaciones activas por cursor (rango del índice, sin OFFSET)"""
+        return [Personalizacion.from_dict(fila) for fila in self.db.listar_pagina(limite, despues)]
+
+    def iterar(self) -> Iterator[Personalizacion]:
+        """Recorrer todas las personalizaciones activas leyendo del cursor por lotes"""
+        return (Personalizacion.from_dict(fila) for fila in self.db.iterar_personalizaciones())
+
+    def limpiar_expiradas(self, expiracion: timedelta) -> List[str]:
+        """Desactivar las personalizaciones más antiguas que `expiracion` y devolver sus IDs"""
+        return self.db.desactivar_expiradas(datetime.utcnow() - expiracion)
+
+    def estadisticas(self, dias: int = 30) -> Dict[str, Any]:
+        """Totales actuales y serie diaria, leídos de los contadores incrementales"""
+        return {
+            'totales': self.db.obtener_estadisticas(),
+            'serie_diaria': self.db.obtener_serie_diaria(dias)
+        }
+
+
+def crear_store(app_config) -> object:
+    """
+    Crear el almacenamiento indicado por la configuración
+
+    Args:
+        app_config: Configuración de Flask (`app.config`)
+
+    Returns:
+        Almacenamiento listo para usar por `PersonalizacionManager`
+    """
+    backend = app_config.get('STORAGE_BACKEND', 'memory')
+
+    if backend == 'sqlite':
+        from database import DatabaseManager
+        return SQLiteStore(DatabaseManager(
+            app_config['DATABASE_PATH'],
+            pool=app_config.get('DB_POOL', True),
+            synchronous=app_config.get('DB_SYNCHRONOUS', 'NORMAL'),
+            mmap_size=app_config.get('DB_MMAP_SIZE', 64 * 1024 * 1024),
+            cache_size=app_config.get('DB_CACHE_SIZE', -8000),
+            write_behind=app_config.get('DB_WRITE_BEHIND', False),
+            write_behind_intervalo_ms=app_config.get('DB_WRITE_BEHIND_INTERVALO_MS', 5),
+            write_behind_max_filas=app_config.get('DB_WRITE_BEHIND_MAX_FILAS', 200),
+            write_behind_durabilidad=app_config.get('DB_WRITE_BEHIND_DURABILIDAD', 'grupo')
+        ))
+    if backend == 'memory':
+        return MemoryStore(max_registros=app_config.get('MAX_PERSONALIZACIONES'),
+                           politica=app_config.get('PERSONALIZACION_EVICTION_POLICY', 'antiguas'))
+    if backend == 'columnar':
+        return ColumnarStore(max_registros=app_config.get('MAX_PERSONALIZACIONES'),
+                             politica=app_config.get('PERSONALIZACION_EVICTION_POLICY', 'antiguas'))
+
+    raise ValueError(f"Backend de almacenamiento desconocido: {backend}")
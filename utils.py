@@ -4,8 +4,18 @@ Utilidades para la aplicación Teteu Cueros
 
 import os
 import logging
-from typing import Dict, Any, Optional
-from flask import request, flash, redirect, url_for, render_template
+import stat
+from datetime import datetime, timezone
+from typing import Callable, Dict, Any, Optional, Tuple
+from flask import request, flash, redirect, url_for, render_template, make_response
+from jinja2 import FileSystemBytecodeCache
+
+from catalogo import CATALOGO
+
+# Campos obligatorios y textos de error de validar_datos_personalizacion
+_CAMPOS_REQUERIDOS = ('color', 'herrajes')
+_LISTA_COLORES = ', '.join(CATALOGO.valores_colores)
+_LISTA_HERRAJES = ', '.join(CATALOGO.valores_herrajes)
 
 def setup_logging():
     """Configurar logging para la aplicación"""
@@ -25,23 +35,20 @@ def validar_datos_personalizacion(data: Dict[str, Any]) -> tuple[bool, Optional[
     Returns:
         tuple: (es_valido, mensaje_error)
     """
-    from config import Config
-    
     # Verificar campos requeridos
-    campos_requeridos = ['color', 'herrajes']
-    for campo in campos_requeridos:
+    for campo in _CAMPOS_REQUERIDOS:
         if not data.get(campo):
             return False, f"El campo {campo} es requerido"
     
-    # Validar color
+    # Validar color (un valor JSON no hashable, como una lista, tampoco es válido)
     color = data.get('color')
-    if color not in Config.COLORES_DISPONIBLES:
-        return False, f"Color '{color}' no es válido. Colores disponibles: {', '.join(Config.COLORES_DISPONIBLES)}"
+    if not isinstance(color, str) or color not in CATALOGO.colores_validos:
+        return False, f"Color '{color}' no es válido. Colores disponibles: {_LISTA_COLORES}"
     
     # Validar herrajes
     herrajes = data.get('herrajes')
-    if herrajes not in Config.HERRAJES_DISPONIBLES:
-        return False, f"Herrajes '{herrajes}' no son válidos. Herrajes disponibles: {', '.join(Config.HERRAJES_DISPONIBLES)}"
+    if not isinstance(herrajes, str) or herrajes not in CATALOGO.herrajes_validos:
+        return False, f"Herrajes '{herrajes}' no son válidos. Herrajes disponibles: {_LISTA_HERRAJES}"
     
     return True, None
 
@@ -96,9 +103,7 @@ def obtener_imagen_por_defecto(modelo: str) -> str:
     Returns:
         str: Ruta de la imagen por defecto
     """
-    if 'urbana' in modelo.lower():
-        return '/static/modelo2.jpg'
-    return '/static/modelo1.jpg'
+    return CATALOGO.modelo_de(modelo).imagen
 
 def sanitizar_input(texto: str) -> str:
     """
@@ -113,12 +118,124 @@ def sanitizar_input(texto: str) -> str:
     if not texto:
         return ""
     
-    # Remover caracteres peligrosos
-    caracteres_peligrosos = ['<', '>', '"', "'", '&']
-    for char in caracteres_peligrosos:
-        texto = texto.replace(char, '')
+    # Remover caracteres peligrosos. Encadenar replace es más rápido que recorrer
+    # una lista o str.translate con las cadenas cortas de un formulario
+    return texto.replace('<', '').replace('>', '').replace('"', '').replace("'", '').replace('&', '').strip()
+
+def respuesta_condicional(etag: str, ultima_modificacion: datetime, generar_html: Callable[[], str],
+                          cache_control: Optional[str] = None, vary: Optional[str] = None):
+    """
+    Responder con validadores HTTP y 304 Not Modified sin renderizar si el cliente ya tiene la página
+    
+    Args:
+        etag: ETag fuerte de la representación
+        ultima_modificacion: Fecha de última modificación (UTC, sin zona)
+        generar_html: Función que produce el cuerpo solo si hace falta
+        cache_control: Valor de Cache-Control (opcional)
+        vary: Valor de Vary (opcional)
+        
+    Returns:
+        Response: 200 con el cuerpo o 304 vacío
+    """
+    # Las fechas HTTP tienen resolución de segundos
+    ultima_modificacion = ultima_modificacion.replace(microsecond=0, tzinfo=timezone.utc)
+    
+    # If-None-Match tiene prioridad sobre If-Modified-Since (RFC 9110)
+    if request.if_none_match:
+        no_modificado = request.if_none_match.contains(etag)
+    else:
+        no_modificado = bool(request.if_modified_since and request.if_modified_since >= ultima_modificacion)
+    
+    if no_modificado:
+        respuesta = make_response('', 304)
+    else:
+        respuesta = make_response(generar_html())
+    
+    respuesta.set_etag(etag)
+    respuesta.last_modified = ultima_modificacion
+    if cache_control:
+        respuesta.headers['Cache-Control'] = cache_control
+    if vary:
+        respuesta.headers['Vary'] = vary
+    return respuesta
+
+def codificar_cursor(personalizacion) -> str:
+    """
+    Cursor opaco de paginación tras una personalización
     
-    return texto.strip()
+    Args:
+        personalizacion: Última personalización de la página actual
+        
+    Returns:
+        str: Cursor para el parámetro `despues` de la página siguiente
+    """
+    return f"{personalizacion.fecha_creacion.isoformat()}_{personalizacion.id}"
+
+def decodificar_cursor(texto: Optional[str]) -> Optional[Tuple[datetime, str]]:
+    """
+    Interpretar un cursor de paginación
+    
+    Args:
+        texto: Valor del parámetro `despues`
+        
+    Returns:
+        tuple: (fecha_creacion, id) o None si falta o no es válido (primera página)
+    """
+    if not texto or '_' not in texto:
+        return None
+    fecha, id_personalizacion = texto.split('_', 1)
+    try:
+        return datetime.fromisoformat(fecha), id_personalizacion
+    except ValueError:
+        return None
+
+def crear_cache_bytecode(directorio: Optional[str]):
+    """
+    Caché de bytecode de plantillas en disco, en un directorio seguro
+    
+    Jinja ejecuta el bytecode que encuentra en el directorio, así que nadie
+    más que el usuario del proceso debe poder escribir en él. Sin directorio,
+    Jinja usa uno propio por usuario (0700, comprobando su dueño). Uno
+    configurado se crea con permisos 0700 y se descarta si pertenece a otro
+    usuario o lo pueden escribir otros.
+    
+    Args:
+        directorio: Ruta configurada (None = la de Jinja; '' = sin caché)
+        
+    Returns:
+        FileSystemBytecodeCache o None si la caché queda desactivada
+    """
+    if directorio is None:
+        return FileSystemBytecodeCache()
+    if not directorio:
+        return None
+    try:
+        os.makedirs(directorio, mode=0o700, exist_ok=True)
+        estado = os.lstat(directorio)
+    except OSError as e:
+        logging.getLogger(__name__).warning(f"Caché de bytecode desactivada: {str(e)}")
+        return None
+    if (not stat.S_ISDIR(estado.st_mode) or estado.st_uid != os.geteuid()
+            or estado.st_mode & (stat.S_IWGRP | stat.S_IWOTH)):
+        logging.getLogger(__name__).warning(
+            f"Caché de bytecode desactivada: {directorio} no es un directorio propio y privado")
+        return None
+    return FileSystemBytecodeCache(directorio)
+
+def precalentar_plantillas(app) -> int:
+    """
+    Compilar de antemano todas las plantillas de la aplicación
+    
+    Args:
+        app: Aplicación Flask
+        
+    Returns:
+        int: Número de plantillas compiladas
+    """
+    nombres = app.jinja_env.list_templates()
+    for nombre in nombres:
+        app.jinja_env.get_template(nombre)
+    return len(nombres)
 
 def formatear_precio(precio: float) -> str:
     """